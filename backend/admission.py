@@ -0,0 +1,217 @@
+"""Admission control and per-client rate limiting for the API.
+
+`AdmissionMiddleware` sorts each API request into a class (cheap reads, heavy
+reads such as lists, search and export, and writes) and runs it only while
+its class has a free slot. Requests beyond the limit wait in a bounded queue;
+a request that finds the queue full, or is still waiting after the class's
+deadline, gets an immediate 503 with Retry-After instead of piling up on the
+event loop while Mongo is slow. Slots are handed to waiters in arrival order.
+
+`RateLimitMiddleware` gives every client IP a token bucket and answers 429
+with Retry-After once it is empty. The IP is the ASGI client address, which
+uvicorn takes from X-Forwarded-For only for proxies in FORWARDED_ALLOW_IPS
+(see serve.py). Behind a proxy that is not listed, every request seems to
+come from the proxy and all clients share one bucket; listing untrusted
+addresses lets clients pick their own IP and dodge the limit.
+
+Both are per worker: with N workers the limits add up N times. Queue depth,
+in-flight counts and rejections are exported at /metrics.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, Optional, Tuple
+
+import orjson
+
+from metrics import REGISTRY, Counter, Gauge
+
+
+ADMISSION_REJECTIONS = REGISTRY.register(Counter(
+    "admission_rejections_total", "Requests refused by admission control and rate limiting", ("class", "reason")))
+
+
+class ClassLimiter:
+    """At most `limit` concurrent requests, `queue` waiting up to `timeout` seconds each."""
+
+    def __init__(self, limit: int, queue: int, timeout: float):
+        self.active = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self.configure(limit, queue, timeout)
+
+    def configure(self, limit: int, queue: int, timeout: float):
+        self.limit, self.queue, self.timeout = limit, queue, timeout
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot; returns None when admitted, else the reason for refusing."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.queue:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+            return None
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return None  # Handed a slot just as the deadline passed
+            waiter.cancel()
+            return "timeout"
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # The client went away after being handed a slot
+            waiter.cancel()
+            raise
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def release(self):
+        # Hand the slot straight to the oldest live waiter, so `active` stays put
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.timeout))
+
+
+# Shared by the middleware and the /metrics gauge; main.py sets the limits
+LIMITERS = {
+    "cheap": ClassLimiter(256, 512, 1.0),
+    "heavy": ClassLimiter(32, 64, 2.0),
+    "write": ClassLimiter(64, 128, 2.0),
+}
+
+
+def _limiter_stats() -> Dict[Tuple[str, ...], float]:
+    samples = {}
+    for name, limiter in LIMITERS.items():
+        samples[(name, "active")] = limiter.active
+        samples[(name, "waiting")] = limiter.waiting
+    return samples
+
+
+REGISTRY.register(Gauge(
+    "admission_requests", "Requests holding or waiting for an admission slot", _limiter_stats, ("class", "state")))
+
+
+def _reject(status: int, detail: str, retry_after: int) -> Tuple[dict, dict]:
+    body = orjson.dumps({"detail": detail})
+    start = {
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ],
+    }
+    return start, {"type": "http.response.body", "body": body}
+
+
+def _matches(path: str, paths: Iterable[str]) -> bool:
+    # A path ending in "/" matches everything under it
+    return any(path == p or (p.endswith("/") and path.startswith(p)) for p in paths)
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying `limiters` ("cheap", "heavy", "write") to requests under `prefix`.
+
+    GETs of `heavy_paths` are heavy, other GETs cheap, everything else but
+    OPTIONS a write. `exempt_paths` (long-lived streams) are never limited.
+    """
+
+    def __init__(self, app, limiters: Dict[str, ClassLimiter], heavy_paths, exempt_paths=(), prefix: str = "/api/"):
+        self.app = app
+        self.limiters = limiters
+        self.heavy_paths = tuple(heavy_paths)
+        self.exempt_paths = tuple(exempt_paths)
+        self.prefix = prefix
+
+    def classify(self, scope) -> Optional[str]:
+        path, method = scope["path"], scope["method"]
+        if not path.startswith(self.prefix) or method == "OPTIONS" or _matches(path, self.exempt_paths):
+            return None
+        if method not in ("GET", "HEAD"):
+            return "write"
+        return "heavy" if _matches(path, self.heavy_paths) else "cheap"
+
+    async def __call__(self, scope, receive, send):
+        route_class = self.classify(scope) if scope["type"] == "http" else None
+        limiter = self.limiters.get(route_class)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        reason = await limiter.acquire()
+        if reason is not None:
+            ADMISSION_REJECTIONS.inc(route_class, reason)
+            for message in _reject(503, "Server busy, retry later", limiter.retry_after()):
+                await send(message)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+
+class TokenBuckets:
+    """One bucket of `burst` tokens per client refilled at `rate` per second; the
+    `max_clients` most recently seen clients are tracked."""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate, self.burst, self.max_clients = rate, burst, max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, client: str) -> Optional[float]:
+        """Spend a token; returns None if there was one, else seconds until there is."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        admitted = tokens >= 1
+        if admitted:
+            tokens -= 1
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return None if admitted else (1 - tokens) / self.rate
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware answering 429 to clients that ran out of tokens.
+
+    Clients are told apart by `scope["client"]`, so per-client limiting needs
+    uvicorn to trust the proxy in front (FORWARDED_ALLOW_IPS).
+    """
+
+    def __init__(self, app, buckets: TokenBuckets, exempt_paths=(), prefix: str = "/api/"):
+        self.app = app
+        self.buckets = buckets
+        self.exempt_paths = tuple(exempt_paths)
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not scope["path"].startswith(self.prefix)
+                or scope["method"] == "OPTIONS" or _matches(scope["path"], self.exempt_paths)):
+            await self.app(scope, receive, send)
+            return
+        client = scope.get("client")
+        wait = self.buckets.take(client[0] if client else "")
+        if wait is not None:
+            ADMISSION_REJECTIONS.inc("client", "rate_limited")
+            for message in _reject(429, "Too many requests", max(1, math.ceil(wait))):
+                await send(message)
+            return
+        await self.app(scope, receive, send)
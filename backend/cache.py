@@ -0,0 +1,242 @@
+"""In-process response cache and single-flight coalescing for the hot read routes.
+
+`CacheMiddleware` stores complete 200 responses of the configured GET paths,
+keyed by path and normalized query string, in a `ResponseCache` bounded by
+entry count and body bytes (LRU eviction) with a TTL. Any mutating request
+under /api clears the cache when it starts and again when it finishes, and a
+GET only stores its response if no write started or finished while it ran,
+so a response built from pre-write data is never cached after the write.
+
+Each worker has its own cache. Writes handled by other workers reach it
+through the change feed (see events.py), which calls `invalidate` for every
+event; the TTL bounds staleness if the feed is down. Under SQLite there is
+no change feed and `SqliteStore.watch_commits` calls `invalidate` instead.
+
+Identical GETs that arrive while the same response is being computed wait
+for it instead of sending their own queries, so a burst of page loads costs
+one Mongo query and one serialization per distinct request. This also covers
+the moments right after a write, when the cache is empty.
+
+Responses get a strong ETag (a hash of the body). A request whose
+If-None-Match matches gets a 304 with no body, whether or not the response
+came from the cache.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from metrics import REGISTRY, Counter, Gauge
+
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Per-entry overhead counted against the byte bound besides the body
+ENTRY_OVERHEAD = 512
+
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "http_cache_requests_total", "Cacheable requests by result (hit, coalesced, miss, not_modified)", ("result",)))
+
+
+def make_etag(body: bytes) -> bytes:
+    return b'"' + hashlib.blake2b(body, digest_size=16).hexdigest().encode() + b'"'
+
+
+def etag_matches(if_none_match: Optional[bytes], etag: bytes) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == b"*":
+        return True
+    return etag in (tag.strip().removeprefix(b"W/") for tag in if_none_match.split(b","))
+
+
+class CacheEntry:
+    __slots__ = ("status", "headers", "body", "etag", "route", "expires", "size")
+
+    def __init__(self, status, headers, body, etag, route, expires):
+        self.status, self.headers, self.body, self.etag = status, headers, body, etag
+        self.route, self.expires = route, expires
+        self.size = len(body) + ENTRY_OVERHEAD
+
+
+class ResponseCache:
+    """LRU of responses with a TTL, bounded by entry count and total bytes."""
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024):
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; see CacheMiddleware
+        self.generation = 0
+        self.configure(ttl, max_entries, max_bytes)
+
+    def configure(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl, self.max_entries, self.max_bytes = ttl, max_entries, max_bytes
+        # A single response may take at most this share of the cache
+        self.max_entry_bytes = max_bytes // 16
+        self.invalidate()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CacheEntry, generation: int):
+        if entry.size > self.max_entry_bytes:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        self._bytes -= self._entries.pop(key).size
+
+    def invalidate(self, *args):
+        """Drop every entry. Accepts and ignores change-feed event arguments."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return {("entries",): len(self._entries), ("bytes",): self._bytes}
+
+
+RESPONSE_CACHE = ResponseCache()
+
+REGISTRY.register(Gauge(
+    "http_cache_size", "Response cache size in entries and bytes", RESPONSE_CACHE.stats, ("unit",)))
+
+
+def cache_key(scope) -> str:
+    query = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+    return scope["path"] + "?" + urlencode(sorted(query))
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value
+    return None
+
+
+class CacheMiddleware:
+    """Pure ASGI middleware serving `paths` from `cache`, invalidated by writes under `write_prefix`.
+
+    With `store` off nothing is kept after a response is sent; with `coalesce`
+    on, identical requests that arrive while one is being computed wait for it
+    and share its response (single flight).
+    """
+
+    def __init__(self, app, cache: ResponseCache, paths, write_prefix: str = "/api/",
+                 store: bool = True, coalesce: bool = True):
+        self.app = app
+        self.cache = cache
+        self.paths = set(paths)
+        self.write_prefix = write_prefix
+        self.store = store
+        self.coalesce = coalesce
+        # key -> (cache generation, future of the CacheEntry being computed)
+        self._inflight: Dict[str, Tuple[int, asyncio.Future]] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] not in SAFE_METHODS:
+            if scope["path"].startswith(self.write_prefix):
+                self.cache.invalidate()
+                try:
+                    await self.app(scope, receive, send)
+                finally:
+                    self.cache.invalidate()
+                return
+        if scope["method"] != "GET" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        key = cache_key(scope)
+        if_none_match = _header(scope, b"if-none-match")
+        entry = self.cache.get(key) if self.store else None
+        if entry is not None:
+            scope["route"] = entry.route  # Route label for MetricsMiddleware
+            await self._send_entry(send, entry, if_none_match, "hit")
+            return
+
+        generation = self.cache.generation
+        flight = self._inflight.get(key) if self.coalesce else None
+        # Only join a flight that started after the last write
+        if flight is not None and flight[0] == generation:
+            try:
+                entry = await asyncio.shield(flight[1])
+            except Exception:
+                entry = None  # The leader failed; compute our own response
+            if entry is not None:
+                scope["route"] = entry.route
+                await self._send_entry(send, entry, if_none_match, "coalesced")
+                return
+
+        future = None
+        if self.coalesce:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = (generation, future)
+        try:
+            entry = await self._compute(scope, receive)
+        except BaseException as exc:
+            if future is not None:
+                future.set_exception(exc if isinstance(exc, Exception) else RuntimeError("Request cancelled"))
+                future.exception()  # Mark retrieved when nobody joined
+            raise
+        finally:
+            if future is not None and self._inflight.get(key, (None, None))[1] is future:
+                del self._inflight[key]
+        if future is not None:
+            future.set_result(entry)
+
+        if self.store and entry.status == 200:
+            self.cache.put(key, entry, generation)
+        await self._send_entry(send, entry, if_none_match if entry.status == 200 else None, "miss")
+
+    async def _compute(self, scope, receive) -> CacheEntry:
+        start: Dict[str, Any] = {}
+        chunks: List[bytes] = []
+
+        async def buffer(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, buffer)
+
+        body = b"".join(chunks)
+        etag = make_etag(body)
+        headers = [(k, v) for k, v in start.get("headers", []) if k not in (b"etag", b"cache-control")]
+        headers += [(b"etag", etag), (b"cache-control", b"no-cache")]
+        return CacheEntry(start["status"], headers, body, etag, scope.get("route"), time.monotonic() + self.cache.ttl)
+
+    async def _send_entry(self, send, entry: CacheEntry, if_none_match, result: str):
+        if etag_matches(if_none_match, entry.etag):
+            CACHE_REQUESTS.inc("not_modified")
+            headers = [(k, v) for k, v in entry.headers if k not in (b"content-length", b"content-type")]
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        CACHE_REQUESTS.inc(result)
+        await send({"type": "http.response.start", "status": entry.status, "headers": entry.headers})
+        await send({"type": "http.response.body", "body": entry.body})
@@ -0,0 +1,97 @@
+"""Compressed storage of large idea bodies in Mongo.
+
+With CONTENT_COMPRESSION set to "zlib" or "zstd", an idea `content` of at
+least CONTENT_COMPRESS_MIN_BYTES UTF-8 bytes is stored as BSON binary. The
+binary subtype records the codec. Shorter bodies, and every body when
+compression is off, stay strings. Reads accept both forms in any mode, so
+compression can be turned on or off at any time and `manage.py
+compress-content` converts existing documents whenever convenient.
+
+Bodies are unpacked only where `content` is actually returned: the single
+idea route, lists, search and /sync with the full view or `fields=content`,
+and export. Summary views and the change feed never read it. Search and
+snippets use `content_text`, which stays plain text.
+
+WiredTiger already compresses blocks on disk. What this changes is the size
+of documents in the cache and on the wire. zstd needs the optional
+`zstandard` package.
+"""
+import zlib
+from typing import Any, AsyncIterator, Dict, Optional, Union
+
+from bson.binary import Binary
+
+try:
+    import zstandard
+except ImportError:  # Optional: only needed for the "zstd" codec
+    zstandard = None
+
+
+# User-defined BSON binary subtypes (0x80-0xff), one per codec
+ZLIB_SUBTYPE = 0x80
+ZSTD_SUBTYPE = 0x81
+CODECS = {"zlib": ZLIB_SUBTYPE, "zstd": ZSTD_SUBTYPE}
+
+_codec: Optional[str] = None
+_min_bytes = 2048
+
+
+def configure(codec: Optional[str], min_bytes: int):
+    """Compress new bodies of at least `min_bytes` with `codec`; None or "off" stores text."""
+    global _codec, _min_bytes
+    codec = None if codec in (None, "", "off") else codec
+    if codec is not None and codec not in CODECS:
+        raise ValueError(f"Unknown content codec: {codec}")
+    if codec == "zstd" and zstandard is None:
+        raise RuntimeError("The zstd content codec needs the zstandard package")
+    _codec, _min_bytes = codec, min_bytes
+
+
+def pack(content: Any) -> Any:
+    """`content` as it should be stored: binary if it is a long enough string, else unchanged."""
+    if _codec is None or not isinstance(content, str):
+        return content
+    raw = content.encode()
+    if len(raw) < _min_bytes:
+        return content
+    if _codec == "zstd":
+        return Binary(zstandard.ZstdCompressor().compress(raw), ZSTD_SUBTYPE)
+    return Binary(zlib.compress(raw), ZLIB_SUBTYPE)
+
+
+def unpack(value: Any) -> Any:
+    """The text of a stored `content`, whichever form it was stored in."""
+    if not isinstance(value, Binary):
+        return value
+    if value.subtype == ZLIB_SUBTYPE:
+        return zlib.decompress(value).decode()
+    if value.subtype == ZSTD_SUBTYPE:
+        if zstandard is None:
+            raise RuntimeError("Reading zstd-compressed content needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(value).decode()
+    raise ValueError(f"Unknown content encoding (binary subtype {value.subtype})")
+
+
+def pack_fields(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a document or `$set` with its `content` packed."""
+    if "content" not in fields:
+        return fields
+    return {**fields, "content": pack(fields["content"])}
+
+
+def unpack_fields(doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Unpack `content` of a document read from Mongo, in place."""
+    if doc is not None and isinstance(doc.get("content"), Binary):
+        doc["content"] = unpack(doc["content"])
+    return doc
+
+
+async def unpack_each(docs: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    async for doc in docs:
+        yield unpack_fields(doc)
+
+
+def stored_size(value: Union[str, bytes, None]) -> int:
+    if value is None:
+        return 0
+    return len(value) if isinstance(value, bytes) else len(value.encode())
@@ -0,0 +1,162 @@
+"""Helpers for turning idea HTML into searchable plain text and list previews.
+
+`derive_content_fields` parses the HTML once at write time and returns every
+field stored next to `content`. Writes call it through `derive_fields` /
+`derive_many`, which hand large documents to a process pool so parsing does
+not block the event loop; the pool is started per worker in `lifespan`.
+"""
+import asyncio
+import html
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Sequence
+
+
+BLOCK_TAGS = {
+    "address", "article", "blockquote", "br", "div", "h1", "h2", "h3", "h4", "h5", "h6",
+    "hr", "li", "ol", "p", "pre", "section", "table", "td", "th", "tr", "ul",
+}
+SKIP_TAGS = {"script", "style"}
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+SPACE_RE = re.compile(r"\s+")
+EXCERPT_LENGTH = 200
+LINK_SCHEMES = ("http://", "https://", "mailto:")
+# Bump when derive_content_fields changes; `manage.py rederive` updates older documents
+DERIVED_VERSION = 2
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.links = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            href = (dict(attrs).get("href") or "").strip()
+            if href.lower().startswith(LINK_SCHEMES) and href not in self.links:
+                self.links.append(href)
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+
+def _parse(content: str) -> _TextExtractor:
+    parser = _TextExtractor()
+    parser.feed(content or "")
+    parser.close()
+    return parser
+
+
+def html_to_text(content: str) -> str:
+    """Strip markup from rich-text content, keeping block boundaries as spaces."""
+    return SPACE_RE.sub(" ", "".join(_parse(content).parts)).strip()
+
+
+def make_excerpt(text: str, length: int = EXCERPT_LENGTH) -> str:
+    """First `length` characters of plain text, cut at a word boundary."""
+    if len(text) <= length:
+        return text
+    cut = text.rfind(" ", 0, length)
+    return text[:cut if cut > 0 else length].rstrip() + "…"
+
+
+def derive_content_fields(content: str) -> Dict[str, Any]:
+    """Fields stored next to `content` at write time: plain text for search,
+    list preview, word count and outbound links."""
+    parser = _parse(content)
+    text = SPACE_RE.sub(" ", "".join(parser.parts)).strip()
+    return {
+        "content_text": text,
+        "excerpt": make_excerpt(text),
+        "word_count": len(WORD_RE.findall(text)),
+        "links": parser.links,
+        "derived_version": DERIVED_VERSION,
+    }
+
+
+# Documents smaller than this are parsed inline; the round trip to a pool
+# process costs more than parsing them.
+INLINE_LIMIT = 4096
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def start_pool(workers: int):
+    """Start the derivation process pool; 0 parses everything inline."""
+    global _pool
+    if workers > 0 and _pool is None:
+        # spawn, not fork: the API process already runs Motor's threads
+        _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def stop_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def derive_fields(content: str) -> Dict[str, Any]:
+    if _pool is None or len(content or "") < INLINE_LIMIT:
+        return derive_content_fields(content)
+    return await asyncio.get_running_loop().run_in_executor(_pool, derive_content_fields, content)
+
+
+async def derive_many(contents: Sequence[str]) -> List[Dict[str, Any]]:
+    """Derived fields for several documents, large ones spread over the pool."""
+    return list(await asyncio.gather(*(derive_fields(content) for content in contents)))
+
+
+def search_terms(search: str) -> List[str]:
+    """Words of a `$text` search string, ignoring negated terms."""
+    terms = []
+    for chunk in search.split():
+        if chunk.startswith("-"):
+            continue
+        terms.extend(word.lower() for word in WORD_RE.findall(chunk))
+    return terms
+
+
+def highlight_snippet(text: str, terms: List[str], width: int = 160) -> str:
+    """HTML-escaped window of `text` around the first match, with matches in <mark>."""
+    if not text:
+        return ""
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE) if terms else None
+    match = pattern.search(text) if pattern else None
+
+    start = 0
+    if match and match.start() > width // 3:
+        start = text.rfind(" ", 0, match.start() - width // 3) + 1
+    end = min(len(text), start + width)
+    if end < len(text):
+        cut = text.rfind(" ", start, end)
+        if cut > start:
+            end = cut
+    window = text[start:end]
+
+    if pattern:
+        pieces, last = [], 0
+        for found in pattern.finditer(window):
+            pieces.append(html.escape(window[last:found.start()]))
+            pieces.append(f"<mark>{html.escape(found.group(0))}</mark>")
+            last = found.end()
+        pieces.append(html.escape(window[last:]))
+        snippet = "".join(pieces)
+    else:
+        snippet = html.escape(window)
+
+    return f"{'…' if start > 0 else ''}{snippet}{'…' if end < len(text) else ''}"
@@ -0,0 +1,180 @@
+"""Incrementally maintained counters behind GET /api/stats.
+
+Every write path reports the idea documents it changed as (before, after)
+pairs; the resulting per-state deltas are applied with a single `$inc` on one
+counters document, so reading the stats is a primary-key lookup. `reconcile`
+recounts everything with one aggregation and can overwrite drifted counters.
+
+Per-category idea counts are kept the same way, one `category:<id>` document
+per category in the same collection.
+"""
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from queries import live_filter
+from tags import apply_tag_deltas, tag_deltas
+from tiering import COLD
+
+
+STATS_DOC_ID = "stats"
+CATEGORY_DOC_PREFIX = "category:"
+COUNTER_FIELDS = ("active_ideas", "archived_ideas", "total_categories")
+
+IdeaChange = Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+def idea_state(doc: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Counter an idea document contributes to, or None if it is missing or deleted."""
+    if not doc or doc.get("deleted"):
+        return None
+    return "archived_ideas" if doc.get("is_archived") else "active_ideas"
+
+
+def idea_deltas(changes: Iterable[IdeaChange]) -> Counter:
+    deltas = Counter()
+    for before, after in changes:
+        old, new = idea_state(before), idea_state(after)
+        if old != new:
+            if old:
+                deltas[old] -= 1
+            if new:
+                deltas[new] += 1
+    return deltas
+
+
+async def apply_deltas(db, deltas: Dict[str, int]):
+    deltas = {field: value for field, value in deltas.items() if value}
+    if deltas:
+        await db.counters.update_one({"_id": STATS_DOC_ID}, {"$inc": deltas}, upsert=True)
+
+
+def category_counter_id(category_id: str) -> str:
+    return CATEGORY_DOC_PREFIX + category_id
+
+
+def category_deltas(changes: Iterable[IdeaChange]) -> Counter:
+    """Per-(category_id, counter) deltas; ideas without a category are not tracked."""
+    deltas = Counter()
+    for before, after in changes:
+        for doc, sign in ((before, -1), (after, 1)):
+            state = idea_state(doc)
+            if state and doc.get("category_id"):
+                deltas[(doc["category_id"], state)] += sign
+    return deltas
+
+
+async def apply_category_deltas(db, deltas: Dict[Tuple[str, str], int]):
+    by_category: Dict[str, Dict[str, int]] = {}
+    for (category_id, field), value in deltas.items():
+        if value:
+            by_category.setdefault(category_id, {})[field] = value
+    if by_category:
+        await db.counters.bulk_write([
+            UpdateOne({"_id": category_counter_id(category_id)}, {"$inc": fields}, upsert=True)
+            for category_id, fields in by_category.items()
+        ], ordered=False)
+
+
+async def record_idea_changes(db, changes: Iterable[IdeaChange]):
+    """Apply a write's stats, per-category and tag facet deltas (see tags.py)."""
+    changes = list(changes)
+    await apply_deltas(db, idea_deltas(changes))
+    await apply_category_deltas(db, category_deltas(changes))
+    await apply_tag_deltas(db, tag_deltas(changes))
+
+
+async def record_category_change(db, delta: int):
+    await apply_deltas(db, {"total_categories": delta})
+
+
+def format_stats(counters: Dict[str, int]) -> Dict[str, int]:
+    active = counters.get("active_ideas", 0)
+    archived = counters.get("archived_ideas", 0)
+    return {
+        "total_ideas": active + archived,
+        "active_ideas": active,
+        "archived_ideas": archived,
+        "total_categories": counters.get("total_categories", 0),
+    }
+
+
+async def count_actual(db) -> Dict[str, int]:
+    """Recount every counter from the collections in one `$facet` aggregation."""
+    pipeline = [
+        {"$match": live_filter()},
+        {"$unionWith": {"coll": COLD, "pipeline": [{"$match": live_filter()}]}},
+        {"$project": {"_id": 0, "counter": {"$cond": ["$is_archived", "archived_ideas", "active_ideas"]}}},
+        {"$unionWith": {"coll": "categories", "pipeline": [
+            {"$match": live_filter()},
+            {"$project": {"_id": 0, "counter": {"$literal": "total_categories"}}},
+        ]}},
+        {"$facet": {
+            field: [{"$match": {"counter": field}}, {"$count": "n"}] for field in COUNTER_FIELDS
+        }},
+    ]
+    result = (await db.ideas.aggregate(pipeline).to_list(1))[0]
+    return {field: result[field][0]["n"] if result[field] else 0 for field in COUNTER_FIELDS}
+
+
+async def read_counters(db) -> Optional[Dict[str, int]]:
+    doc = await db.counters.find_one({"_id": STATS_DOC_ID})
+    if doc is None:
+        return None
+    return {field: doc.get(field, 0) for field in COUNTER_FIELDS}
+
+
+async def reconcile(db, fix: bool = True) -> Tuple[Optional[Dict[str, int]], Dict[str, int]]:
+    """Return (stored, actual) counters, overwriting the stored ones when `fix` is set.
+
+    Writes that land while the aggregation runs can leave the rebuilt counters
+    slightly off; run it again with fix=False to confirm they match.
+    """
+    stored = await read_counters(db)
+    actual = await count_actual(db)
+    if fix and stored != actual:
+        await db.counters.update_one({"_id": STATS_DOC_ID}, {"$set": actual}, upsert=True)
+    return stored, actual
+
+
+async def rebuild_category_counters(db) -> int:
+    """Recount the per-category counters with one aggregation; returns how many categories have ideas."""
+    pipeline = [
+        {"$match": {**live_filter(), "category_id": {"$ne": None}}},
+        {"$unionWith": {"coll": COLD, "pipeline": [{"$match": {**live_filter(), "category_id": {"$ne": None}}}]}},
+        {"$group": {
+            "_id": "$category_id",
+            "active_ideas": {"$sum": {"$cond": ["$is_archived", 0, 1]}},
+            "archived_ideas": {"$sum": {"$cond": ["$is_archived", 1, 0]}},
+        }},
+    ]
+    counts = {category_counter_id(row["_id"]): row async for row in db.ideas.aggregate(pipeline)}
+    # Upserted and pruned, like tags.rebuild_tag_counts, so workers migrating
+    # at the same time cannot collide on `_id`
+    if counts:
+        await db.counters.bulk_write([
+            UpdateOne({"_id": _id}, {"$set": {
+                "active_ideas": row["active_ideas"], "archived_ideas": row["archived_ideas"],
+            }}, upsert=True)
+            for _id, row in counts.items()
+        ], ordered=False)
+    await db.counters.delete_many({"_id": {"$regex": "^" + CATEGORY_DOC_PREFIX, "$nin": list(counts)}})
+    return len(counts)
+
+
+async def ensure_counters(db):
+    """Build the counters on startup for a database that predates them.
+
+    This must run before the first write, otherwise that write's upsert would
+    create a counters document holding only its own delta.
+    """
+    if await read_counters(db) is None:
+        await reconcile(db)
+
+
+async def read_stats(db) -> Dict[str, int]:
+    counters = await read_counters(db)
+    if counters is None:
+        _, counters = await reconcile(db)
+    return format_stats(counters)
@@ -0,0 +1,238 @@
+"""Server-Sent Events change feed served at /api/events.
+
+Each worker runs one source task that turns database changes into events and
+fans them out to its connected clients through `HUB`. The source is a MongoDB
+change stream when the deployment supports one (replica set or sharded
+cluster); on a standalone server it falls back to polling the `updated_at`
+indexes. Events come from the database rather than from the routes, so clients
+see writes made through any worker or by `manage.py`.
+
+Clients receive `idea` and `category` events as `{"op": "upsert", "doc": ...}`
+or `{"op": "delete", "id": ...}`, and `stats` events with the full stats. A
+`ready` event is sent on every (re)connect and `resync` when events may have
+been lost; on either the client reloads what it shows, or asks /api/sync for
+what changed since the last `watermark` event. Those are sent on connect and
+whenever the stream is idle, in place of a keepalive comment.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from pymongo.errors import OperationFailure, PyMongoError
+
+from counters import STATS_DOC_ID, format_stats, read_counters
+from metrics import REGISTRY, Gauge
+from sync import current_watermark
+
+
+logger = logging.getLogger(__name__)
+
+EVENT_NAMES = {"ideas": "idea", "categories": "category"}
+RETRY_DELAY = 5.0
+# How far behind the watermark each poll looks again, for writes stamped by
+# one worker that commit after a later-stamped write from another
+POLL_LAG = timedelta(seconds=5)
+# Large fields stripped from change events before they leave the server
+CHANGE_PIPELINE = [
+    {"$match": {"ns.coll": {"$in": [*EVENT_NAMES, "counters"]}}},
+    {"$project": {"updateDescription": 0, "fullDocument.content": 0, "fullDocument.content_text": 0}},
+]
+
+Event = Tuple[str, Dict[str, Any]]
+
+
+def format_event(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+RESYNC = format_event("resync", {})
+
+
+class EventHub:
+    """Fans events out to the clients connected to this worker.
+
+    The source task only runs while at least one client or in-process
+    listener (such as the response cache) is subscribed. A client that falls
+    `queue_size` events behind has its backlog replaced by a single `resync`.
+    """
+
+    def __init__(self, queue_size: int = 1000):
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.listeners: List[Callable[[str, Any], Any]] = []
+        self.source: Optional[Callable[["EventHub"], Any]] = None
+        self._task = None
+
+    def configure(self, source: Callable[["EventHub"], Any], queue_size: Optional[int] = None):
+        self.source = source
+        if queue_size:
+            self.queue_size = queue_size
+
+    def _start(self):
+        if self.source and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self.source(self))
+
+    def listen(self, callback: Callable[[str, Any], Any]):
+        """Call `callback(event, data)` for every event published from now on."""
+        self.listeners.append(callback)
+        self._start()
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(self.queue_size)
+        self.subscribers.add(queue)
+        self._start()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers and not self.listeners and self._task:
+            self._task.cancel()
+            self._task = None
+
+    def publish(self, event: str, data):
+        for callback in self.listeners:
+            callback(event, data)
+        if not self.subscribers:
+            return
+        message = format_event(event, data)
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    async def stream(self, keepalive: float = 15.0) -> AsyncIterator[bytes]:
+        """Messages for one client, with a `watermark` event every `keepalive` idle seconds.
+
+        A watermark is only sent once the queue is empty, so every change
+        before it has been delivered.
+        """
+        queue = self.subscribe()
+        try:
+            yield format_event("ready", {"watermark": current_watermark(EVENT_NAMES)})
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield format_event("watermark", {"watermark": current_watermark(EVENT_NAMES)})
+        finally:
+            self.unsubscribe(queue)
+
+    async def close(self):
+        self.listeners.clear()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+HUB = EventHub()
+
+REGISTRY.register(Gauge(
+    "events_subscribers", "Clients connected to /api/events", lambda: {(): len(HUB.subscribers)}))
+
+
+def document_event(collection: str, doc: Dict[str, Any], fields: Dict[str, List[str]]) -> Event:
+    event = EVENT_NAMES[collection]
+    if doc.get("deleted"):
+        return event, {"op": "delete", "id": doc["id"]}
+    return event, {"op": "upsert", "doc": {field: doc[field] for field in fields[collection] if field in doc}}
+
+
+def change_event(change: Dict[str, Any], fields: Dict[str, List[str]]) -> Optional[Event]:
+    collection = change.get("ns", {}).get("coll")
+    doc = change.get("fullDocument")
+    if doc is None:
+        if collection == "ideas" and change.get("operationType") == "delete":
+            # Only tiering removes ideas: a move to the cold tier, or a purge
+            # of one whose soft delete was already sent (see tiering.py)
+            return None
+        if collection == "counters" and change.get("operationType") == "delete":
+            # Category counters of a deleted category, or pruned by a rebuild;
+            # the stats document is only ever updated
+            return None
+        # Other hard deletes, drops and invalidations carry no document to send
+        return "resync", {}
+    if collection == "counters":
+        if doc.get("_id") != STATS_DOC_ID:
+            return None
+        return "stats", format_stats(doc)
+    return document_event(collection, doc, fields)
+
+
+async def watch_changes(hub: EventHub, db, fields: Dict[str, List[str]]):
+    """Publish events from a database change stream, reopening it after failures.
+
+    Raises OperationFailure if the stream cannot be opened in the first place,
+    which is how a standalone server reports that change streams are unsupported.
+    """
+    opened = False
+    while True:
+        try:
+            async with db.watch(CHANGE_PIPELINE, full_document="updateLookup") as stream:
+                opened = True
+                async for change in stream:
+                    event = change_event(change, fields)
+                    if event:
+                        hub.publish(*event)
+        except OperationFailure:
+            if not opened:
+                raise
+            logger.exception("Change stream failed; reopening")
+        except PyMongoError:
+            logger.exception("Change stream failed; reopening")
+        # Anything written while the stream was down is missing from the feed
+        hub.publish("resync", {})
+        await asyncio.sleep(RETRY_DELAY)
+
+
+async def poll_changes(hub: EventHub, db, fields: Dict[str, List[str]], interval: float = 1.0, lag: timedelta = POLL_LAG):
+    """Publish events by polling `updated_at` and the counters document.
+
+    Each poll re-reads a `lag` window behind the newest timestamp seen and skips
+    documents already sent with the same `updated_at`.
+    """
+    watermark = datetime.utcnow()
+    sent = {collection: {} for collection in fields}
+    stats = await read_counters(db)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            since = watermark - lag
+            for collection, output_fields in fields.items():
+                projection = {field: 1 for field in output_fields + ["id", "updated_at", "deleted"]}
+                projection["_id"] = 0
+                seen = sent[collection]
+                cursor = db[collection].find({"updated_at": {"$gt": since}}, projection).sort("updated_at", 1)
+                async for doc in cursor:
+                    if seen.get(doc["id"]) == doc["updated_at"]:
+                        continue
+                    seen[doc["id"]] = doc["updated_at"]
+                    watermark = max(watermark, doc["updated_at"])
+                    hub.publish(*document_event(collection, doc, fields))
+                sent[collection] = {doc_id: updated for doc_id, updated in seen.items() if updated > watermark - lag}
+
+            counters = await read_counters(db)
+            if counters is not None and counters != stats:
+                stats = counters
+                hub.publish("stats", format_stats(counters))
+        except PyMongoError:
+            logger.exception("Polling for changes failed")
+            hub.publish("resync", {})
+
+
+async def run_source(hub: EventHub, db, fields: Dict[str, List[str]], mode: str = "auto", interval: float = 1.0):
+    """Feed `hub` from a change stream ("changestream"), polling ("poll"), or
+    a change stream with polling as the fallback ("auto")."""
+    if mode != "poll":
+        try:
+            await watch_changes(hub, db, fields)
+            return
+        except OperationFailure as exc:
+            if mode == "changestream":
+                raise
+            logger.info("Change streams unavailable (%s); polling every %ss", exc, interval)
+    await poll_changes(hub, db, fields, interval)
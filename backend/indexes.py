@@ -0,0 +1,210 @@
+"""Index declarations for the ideas and categories collections.
+
+`ensure_indexes` is run at startup so every route query is served by an index,
+and `check_query_plans` explains each route's query shape and reports any that
+fall back to a full collection scan.
+
+List indexes are partial on `deleted: false`, so soft-deleted documents take no
+space in them; queries must use the equality from queries.live_filter() to be
+eligible.
+"""
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from pagination import encode_cursor, keyset_filter, keyset_sort
+from queries import LIVE, idea_list_query, live_filter
+from sync import SYNC_SORT, sync_after
+
+
+# Stemming language for the search index; "none" tokenizes without stemming,
+# which suits mixed Russian/English notes.
+SEARCH_LANGUAGE = os.environ.get('SEARCH_LANGUAGE', 'none')
+
+
+IDEA_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    IndexModel(
+        [("created_at", DESCENDING), ("id", DESCENDING)],
+        name="live_created_at_id_desc", partialFilterExpression=LIVE,
+    ),
+    IndexModel(
+        [("is_archived", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+        name="live_archived_created_at_id", partialFilterExpression=LIVE,
+    ),
+    IndexModel(
+        [("category_id", ASCENDING), ("is_archived", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+        name="live_category_archived_created_at_id", partialFilterExpression=LIVE,
+    ),
+    # GET /ideas?category_id= without `archived`: the index above would leave
+    # the sort to memory, since is_archived sits between the filter and it
+    IndexModel(
+        [("category_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+        name="live_category_created_at_id", partialFilterExpression=LIVE,
+    ),
+    # Not partial: $text requires a usable text index, including while the
+    # deleted_flag migration is still running and queries use the legacy $or.
+    IndexModel(
+        [("title", TEXT), ("tags", TEXT), ("content_text", TEXT)],
+        name="search_text",
+        weights={"title": 10, "tags": 5, "content_text": 1},
+        default_language=SEARCH_LANGUAGE,
+    ),
+    # Multikey: GET /ideas?tag=
+    IndexModel(
+        [("tags", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+        name="live_tags_created_at_id", partialFilterExpression=LIVE,
+    ),
+    # Change feed polling and /sync; not partial, since deletions are changes too
+    IndexModel([("updated_at", ASCENDING), ("id", ASCENDING)], name="updated_at_id"),
+]
+
+# Tiering (see tiering.py): archived and deleted ideas by age, for the mover
+# and the purge. Partial, so the active ideas take no space in them.
+ARCHIVED_UPDATED_AT = IndexModel(
+    [("updated_at", ASCENDING)], name="archived_updated_at", partialFilterExpression={"is_archived": True},
+)
+DELETED_UPDATED_AT = IndexModel(
+    [("updated_at", ASCENDING)], name="deleted_updated_at", partialFilterExpression={"deleted": True},
+)
+
+CATEGORY_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    IndexModel(
+        [("created_at", ASCENDING), ("id", ASCENDING)],
+        name="live_created_at_id", partialFilterExpression=LIVE,
+    ),
+    IndexModel([("updated_at", ASCENDING), ("id", ASCENDING)], name="updated_at_id"),
+]
+
+# Buckets of tags.py; `key` is the lowercased tag for prefix autocomplete
+TAG_COUNT_INDEXES = [
+    IndexModel([("key", ASCENDING), ("category_id", ASCENDING), ("archived", ASCENDING)], name="key_category_archived"),
+]
+
+# Unfinished jobs with an expired lease, claimed at startup (see jobs.py)
+JOB_INDEXES = [
+    IndexModel(
+        [("lease_until", ASCENDING)], name="unfinished_lease",
+        partialFilterExpression={"status": {"$in": ["pending", "running"]}},
+    ),
+]
+
+INDEXES = {
+    "ideas": IDEA_INDEXES + [ARCHIVED_UPDATED_AT, DELETED_UPDATED_AT],
+    "ideas_archive": IDEA_INDEXES + [DELETED_UPDATED_AT],
+    "categories": CATEGORY_INDEXES,
+    "tag_counts": TAG_COUNT_INDEXES,
+    "jobs": JOB_INDEXES,
+}
+
+INDEX_NOT_FOUND = 27
+
+# Indexes replaced by the declarations above. They still serve the legacy
+# soft-delete filter, so they are only dropped once the deleted_flag migration
+# has been applied (see migrations.finish_deleted_flag).
+OBSOLETE_INDEXES = {
+    "ideas": [
+        "created_at_desc", "archived_created_at", "category_archived_created_at",
+        "created_at_id_desc", "archived_created_at_id", "category_archived_created_at_id", "deleted",
+        "updated_at",
+    ],
+    "categories": ["created_at_id", "deleted", "updated_at"],
+}
+
+
+async def ensure_indexes(db):
+    """Create the declared indexes. Existing indexes with the same spec are left alone."""
+    for collection, indexes in INDEXES.items():
+        await db[collection].create_indexes(indexes)
+
+
+async def drop_obsolete_indexes(db):
+    for collection, names in OBSOLETE_INDEXES.items():
+        existing = await db[collection].index_information()
+        for name in names:
+            if name in existing:
+                try:
+                    await db[collection].drop_index(name)
+                except OperationFailure as exc:
+                    if exc.code != INDEX_NOT_FOUND:  # Another worker dropped it first
+                        raise
+
+
+# Query shapes issued by the routes in main.py as (route, operation, collection,
+# filter, sort). Built through queries.py so they follow the soft-delete filter
+# the routes currently use. Keep this in sync when a route's query changes.
+SAMPLE_ID = "00000000-0000-0000-0000-000000000000"
+SAMPLE_DATE = datetime(2024, 1, 1)
+SAMPLE_CURSOR = encode_cursor({"created_at": SAMPLE_DATE, "id": SAMPLE_ID})
+PAGE_SORT = keyset_sort(DESCENDING)
+
+
+def route_queries() -> List[Tuple[str, str, str, Dict[str, Any], List[Tuple[str, int]]]]:
+    def page(query, direction=DESCENDING):
+        return {**query, "$and": [keyset_filter(SAMPLE_CURSOR, direction)]}
+
+    return [
+        ("GET /categories", "find", "categories", live_filter(), keyset_sort(ASCENDING)),
+        ("GET /categories?cursor", "find", "categories", page(live_filter(), ASCENDING), keyset_sort(ASCENDING)),
+        ("DELETE /categories/{id}", "find", "categories", {"id": SAMPLE_ID}, []),
+        ("GET /ideas", "find", "ideas", idea_list_query(), PAGE_SORT),
+        ("GET /ideas?cursor", "find", "ideas", page(idea_list_query()), PAGE_SORT),
+        ("GET /ideas?archived", "find", "ideas", idea_list_query(archived=False), PAGE_SORT),
+        ("GET /ideas?archived (cold tier)", "find", "ideas_archive", idea_list_query(archived=True), PAGE_SORT),
+        ("GET /ideas?category_id", "find", "ideas", idea_list_query(category_id=SAMPLE_ID), PAGE_SORT),
+        ("GET /ideas?archived&category_id", "find", "ideas",
+         idea_list_query(archived=False, category_id=SAMPLE_ID), PAGE_SORT),
+        ("GET /ideas?tag", "find", "ideas", idea_list_query(tag="idea"), PAGE_SORT),
+        ("GET /ideas?search", "find", "ideas", idea_list_query(search="idea"), []),
+        ("GET /ideas/{id}", "find", "ideas", live_filter(id=SAMPLE_ID), []),
+        ("GET /ideas/{id} (cold tier)", "find", "ideas_archive", live_filter(id=SAMPLE_ID), []),
+        ("PUT /ideas/{id}", "find", "ideas", {"id": SAMPLE_ID}, []),
+        ("DELETE /ideas/{id}", "find", "ideas", {"id": SAMPLE_ID}, []),
+        ("PATCH /ideas/{id}/archive", "find", "ideas", {"id": SAMPLE_ID}, []),
+        ("GET /stats", "find", "counters", {"_id": "stats"}, []),
+        ("GET /tags?prefix", "find", "tag_counts", {"count": {"$gt": 0}, "key": {"$regex": "^id"}}, []),
+        ("GET /events (polling)", "find", "ideas", {"updated_at": {"$gt": SAMPLE_DATE}}, [("updated_at", ASCENDING)]),
+        ("GET /events (polling)", "find", "categories", {"updated_at": {"$gt": SAMPLE_DATE}}, [("updated_at", ASCENDING)]),
+        ("GET /sync", "find", "ideas", live_filter(), SYNC_SORT),
+        ("GET /sync?since", "find", "ideas", sync_after((SAMPLE_DATE, SAMPLE_ID)), SYNC_SORT),
+        ("GET /sync?since", "find", "categories", sync_after((SAMPLE_DATE, SAMPLE_ID)), SYNC_SORT),
+        ("GET /sync?since (cold tier)", "find", "ideas_archive", sync_after((SAMPLE_DATE, SAMPLE_ID)), SYNC_SORT),
+        ("tiering move", "find", "ideas", {"is_archived": True, "updated_at": {"$lt": SAMPLE_DATE}}, [("updated_at", ASCENDING)]),
+        ("tiering move", "find", "ideas", {"deleted": True, "updated_at": {"$lt": SAMPLE_DATE}}, [("updated_at", ASCENDING)]),
+        ("tiering purge", "find", "ideas_archive", {"deleted": True, "updated_at": {"$lt": SAMPLE_DATE}}, []),
+    ]
+
+
+def _plan_stages(plan) -> List[str]:
+    """Collect every `stage` name in an explain plan tree."""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+async def explain_query(db, operation, collection, query, sort):
+    cursor = db[collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    explained = await cursor.explain()
+    return explained["queryPlanner"]["winningPlan"]
+
+
+async def check_query_plans(db):
+    """Explain every route query. Returns a list of (route, stages, ok) tuples."""
+    results = []
+    for route, operation, collection, query, sort in route_queries():
+        stages = _plan_stages(await explain_query(db, operation, collection, query, sort))
+        results.append((route, stages, "COLLSCAN" not in stages))
+    return results
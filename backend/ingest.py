@@ -0,0 +1,108 @@
+"""Group commit for idea creates, enabled with INGEST_BATCHING.
+
+POST /api/ideas hands its document to `IDEA_WRITER`, which collects the
+documents of concurrent requests and writes them with one `insert_many` (and
+one counters update) once `max_batch` are queued or `max_delay` seconds after
+the first one arrived. Every request waits for its batch's write before it
+responds, so a response still means the idea was written with the client's
+write concern; a document that fails to insert fails only its own request.
+
+Under light traffic a create waits up to `max_delay` longer than before; under
+bursts many creates share each round trip.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pymongo.errors import BulkWriteError, WriteError
+
+from counters import record_idea_changes
+from metrics import REGISTRY, Gauge, Histogram
+
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+INGEST_BATCH_SIZE = REGISTRY.register(Histogram(
+    "ingest_batch_size", "Ideas written per group-commit insert_many", buckets=BATCH_SIZE_BUCKETS))
+
+Pending = Tuple[Dict[str, Any], asyncio.Future]
+
+
+class GroupCommitWriter:
+    """Batches idea inserts from concurrent requests into `insert_many` calls."""
+
+    def __init__(self, max_batch: int = 100, max_delay: float = 0.002):
+        self._pending: List[Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._writes: Set[asyncio.Task] = set()
+        self._writing = 0
+        self.configure(max_batch, max_delay)
+
+    def configure(self, max_batch: int, max_delay: float):
+        self.max_batch, self.max_delay = max_batch, max_delay
+
+    async def insert(self, db, doc: Dict[str, Any]):
+        """Queue `doc` and return once its batch is written; raises what its insert raised."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((doc, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush(db)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush, db)
+        # The batch is written even if this request goes away
+        await asyncio.shield(future)
+
+    def _flush(self, db):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._write(db, batch))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def _write(self, db, batch: List[Pending]):
+        self._writing += len(batch)
+        INGEST_BATCH_SIZE.observe(len(batch))
+        failed: Dict[int, Dict[str, Any]] = {}
+        try:
+            try:
+                await db.ideas.insert_many([doc for doc, _ in batch], ordered=False)
+            except BulkWriteError as exc:
+                failed = {error["index"]: error for error in exc.details.get("writeErrors", [])}
+            await record_idea_changes(db, [(None, doc) for i, (doc, _) in enumerate(batch) if i not in failed])
+        except Exception as exc:
+            for _, future in batch:
+                _resolve(future, exc)
+            return
+        finally:
+            self._writing -= len(batch)
+        for i, (_, future) in enumerate(batch):
+            error = failed.get(i)
+            _resolve(future, WriteError(error.get("errmsg"), error.get("code"), error) if error else None)
+
+    async def drain(self, db):
+        """Write whatever is queued and wait for every batch in flight (shutdown)."""
+        self._flush(db)
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    def stats(self) -> Dict[Tuple[str, ...], float]:
+        return {("queued",): len(self._pending), ("writing",): self._writing}
+
+
+def _resolve(future: asyncio.Future, error: Optional[BaseException]):
+    if future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+        future.exception()  # Mark retrieved in case the request is gone
+
+
+IDEA_WRITER = GroupCommitWriter()
+
+REGISTRY.register(Gauge(
+    "ingest_queue_depth", "Ideas waiting for or being written by a group commit", IDEA_WRITER.stats, ("state",)))
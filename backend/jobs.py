@@ -0,0 +1,171 @@
+"""Background jobs tracked in the `jobs` collection.
+
+A job document records its type, parameters, status (pending, running, done,
+failed) and progress, and is what GET /api/jobs/{id} reports. The worker that
+creates a job runs it straight away and renews a lease while it works; if that
+worker dies, the next worker to start claims the job once the lease has
+expired and runs it again from the start, so handlers must be idempotent.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+
+from counters import category_counter_id, record_idea_changes
+from queries import live_filter
+from tiering import COLD, HOT
+
+
+logger = logging.getLogger(__name__)
+
+JOB_LEASE = timedelta(seconds=60)
+CASCADE_BATCH_SIZE = 500
+CASCADE_PAUSE = 0.05
+# What the counters and tag facets need of an idea, and its version for the update guard
+CASCADE_FIELDS = {"_id": 1, "category_id": 1, "is_archived": 1, "deleted": 1, "tags": 1, "version": 1}
+
+Report = Callable[[int, Optional[int]], Awaitable[None]]
+HANDLERS: Dict[str, Callable[[Any, Dict[str, Any], Report], Awaitable[None]]] = {}
+_tasks = set()
+
+
+def handler(job_type: str):
+    def register(fn):
+        HANDLERS[job_type] = fn
+        return fn
+    return register
+
+
+def job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": job["_id"],
+        "type": job["type"],
+        "params": job["params"],
+        "status": job["status"],
+        "processed": job.get("processed", 0),
+        "total": job.get("total"),
+        "error": job.get("error"),
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "finished_at": job.get("finished_at"),
+    }
+
+
+async def create_job(db, job_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    job = {
+        "_id": str(uuid.uuid4()),
+        "type": job_type,
+        "params": params,
+        "status": "pending",
+        "processed": 0,
+        "total": None,
+        "created_at": now,
+        "updated_at": now,
+        "lease_until": now + JOB_LEASE,
+    }
+    await db.jobs.insert_one(job)
+    return job
+
+
+async def get_job(db, job_id: str) -> Optional[Dict[str, Any]]:
+    return await db.jobs.find_one({"_id": job_id})
+
+
+async def run_job(db, job: Dict[str, Any]):
+    async def update(fields):
+        now = datetime.utcnow()
+        await db.jobs.update_one({"_id": job["_id"]}, {"$set": {**fields, "updated_at": now, "lease_until": now + JOB_LEASE}})
+
+    async def report(processed: int, total: Optional[int] = None):
+        await update({"processed": processed, **({"total": total} if total is not None else {})})
+
+    await update({"status": "running"})
+    try:
+        await HANDLERS[job["type"]](db, job["params"], report)
+    except asyncio.CancelledError:
+        raise  # Shutdown: the lease runs out and another worker resumes the job
+    except Exception as exc:
+        logger.exception("Job %s (%s) failed", job["_id"], job["type"])
+        await update({"status": "failed", "error": str(exc), "finished_at": datetime.utcnow()})
+    else:
+        await update({"status": "done", "finished_at": datetime.utcnow()})
+
+
+def start_job(db, job: Dict[str, Any]):
+    task = asyncio.create_task(run_job(db, job))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def resume_jobs(db) -> int:
+    """Claim and start every unfinished job whose lease has expired."""
+    resumed = 0
+    while True:
+        now = datetime.utcnow()
+        job = await db.jobs.find_one_and_update(
+            {"status": {"$in": ["pending", "running"]}, "lease_until": {"$lt": now}},
+            {"$set": {"lease_until": now + JOB_LEASE}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if job is None:
+            return resumed
+        logger.info("Resuming job %s (%s)", job["_id"], job["type"])
+        start_job(db, job)
+        resumed += 1
+
+
+def cancel_jobs():
+    for task in list(_tasks):
+        task.cancel()
+
+
+@handler("category_cascade")
+async def cascade_category(db, params: Dict[str, Any], report: Report):
+    """Move the live ideas of a deleted category to `reassign_to`, or clear their category.
+
+    Works in batches of CASCADE_BATCH_SIZE ideas, each one unordered
+    `bulk_write` guarded by the versions read, so the counters only get the
+    updates that applied, from the state they applied to. Ideas written in
+    between are picked up again by the next batch. Ideas are matched through
+    the partial category index; soft-deleted ideas keep their old reference.
+    The cold tier goes first, so an idea restored to the hot tier meanwhile
+    is still reached.
+    """
+    category_id, target = params["category_id"], params.get("reassign_to")
+    query = live_filter(category_id=category_id)
+    processed = 0
+    total = sum([await db[tier].count_documents(query) for tier in (COLD, HOT)])
+    await report(processed, total)
+    for tier in (COLD, HOT):
+        collection = db[tier]
+        while True:
+            batch = await collection.find(query, CASCADE_FIELDS).limit(CASCADE_BATCH_SIZE).to_list(CASCADE_BATCH_SIZE)
+            if not batch:
+                break
+            now = datetime.utcnow()
+            # Version 0 is an idea written before versions existed (see storage.version_filter)
+            result = await collection.bulk_write([
+                UpdateOne(
+                    {**query, "_id": doc["_id"], "version": doc.get("version") or None},
+                    {"$set": {"category_id": target, "updated_at": now}, "$inc": {"version": 1}},
+                )
+                for doc in batch
+            ], ordered=False)
+            applied = batch
+            if result.matched_count < len(batch):
+                # The ones that applied carry the next version and this batch's `updated_at`
+                moved = {
+                    doc["_id"] for doc in await collection.find({"$or": [
+                        {"_id": doc["_id"], "version": doc.get("version", 0) + 1, "updated_at": now} for doc in batch
+                    ]}, {"_id": 1}).to_list(None)
+                }
+                applied = [doc for doc in batch if doc["_id"] in moved]
+            await record_idea_changes(db, [(doc, {**doc, "category_id": target}) for doc in applied])
+            processed += len(applied)
+            await report(processed)
+            await asyncio.sleep(CASCADE_PAUSE)
+    await db.counters.delete_one({"_id": category_counter_id(category_id)})
@@ -0,0 +1,58 @@
+"""Leases in the `leases` collection, so one worker at a time runs shared background work.
+
+A lease document records its holder and when it runs out. `claim_lease`
+takes a free or expired lease, or extends one this process already holds;
+`hold_lease` keeps it renewed while the work runs and gives it up after.
+If the holder dies, the lease expires and another worker takes over, so the
+work under a lease must be safe to start again.
+"""
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+
+LEASE = timedelta(seconds=60)
+# Holder id of this process
+WORKER_ID = str(uuid.uuid4())
+
+
+async def claim_lease(db, name: str, duration: timedelta = LEASE) -> bool:
+    now = datetime.utcnow()
+    try:
+        # A lease held by another worker does not match, and the upsert then
+        # fails on its `_id`
+        await db.leases.update_one(
+            {"_id": name, "$or": [{"holder": WORKER_ID}, {"lease_until": {"$lt": now}}]},
+            {"$set": {"holder": WORKER_ID, "lease_until": now + duration}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def release_lease(db, name: str):
+    await db.leases.delete_one({"_id": name, "holder": WORKER_ID})
+
+
+async def _renew(db, name: str, duration: timedelta):
+    while True:
+        await asyncio.sleep(duration.total_seconds() / 3)
+        await claim_lease(db, name, duration)
+
+
+@asynccontextmanager
+async def hold_lease(db, name: str, duration: timedelta = LEASE):
+    """Yield whether the lease was claimed; a claimed lease is renewed until the block exits."""
+    if not await claim_lease(db, name, duration):
+        yield False
+        return
+    renewer = asyncio.create_task(_renew(db, name, duration))
+    try:
+        yield True
+    finally:
+        renewer.cancel()
+        await release_lease(db, name)
@@ -1,26 +1,212 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 import uuid
-from datetime import datetime
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from functools import partial
+
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from admission import LIMITERS, AdmissionMiddleware, RateLimitMiddleware, TokenBuckets
+from cache import RESPONSE_CACHE, CacheMiddleware
+from compression import configure as configure_compression, pack, pack_fields, unpack_each
+from content import derive_fields, derive_many, highlight_snippet, search_terms, start_pool, stop_pool
+from counters import ensure_counters, record_category_change, record_idea_changes
+from events import HUB, run_source
+from indexes import ensure_indexes
+from ingest import IDEA_WRITER
+from jobs import cancel_jobs, get_job, job_view, resume_jobs
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, MetricsMiddleware, MongoCommandMetrics
+from migrations import (
+    DELETED_FLAG, finish_deleted_flag, is_applied, migrate_category_counts, migrate_category_updated_at,
+    migrate_deleted_flag, migrate_derived_content,
+)
+from pagination import NEXT_CURSOR_HEADER
+from queries import live_filter
+from storage import MongoStore, Store, VersionConflict, next_version, version_filter
+from storage_sqlite import SqliteStore
+from sync import WatermarkExpired, changes_since
+from tags import ensure_tag_counts, tag_facets
+from tiering import COLD, HOT, restore, run_tiering, stream_tiers
+from transfer import FORMATS, export_stream, import_records, read_records
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Instrumentation (route latency and Mongo command timing at /metrics)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+
+# Worker processes per API worker that parse large idea HTML off the event loop
+DERIVE_WORKERS = int(os.environ.get('DERIVE_WORKERS', '2'))
+
+# Change feed at /api/events: "auto" uses a change stream when the deployment
+# supports one and polls `updated_at` otherwise; "changestream" or "poll" force one
+EVENTS_SOURCE = os.environ.get('EVENTS_SOURCE', 'auto')
+EVENTS_POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL', '1.0'))
+EVENTS_KEEPALIVE = float(os.environ.get('EVENTS_KEEPALIVE', '15'))
+EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE', '1000'))
+
+# Response cache for the hot read routes (see cache.py)
+CACHE_ENABLED = os.environ.get('CACHE_ENABLED', 'true').lower() == 'true'
+RESPONSE_CACHE.configure(
+    ttl=float(os.environ.get('CACHE_TTL', '30')),
+    max_entries=int(os.environ.get('CACHE_MAX_ENTRIES', '1024')),
+    max_bytes=int(os.environ.get('CACHE_MAX_BYTES', str(32 * 1024 * 1024))),
+)
+CACHED_PATHS = ["/api/categories", "/api/stats", "/api/ideas", "/api/tags"]
+# Identical concurrent reads of CACHED_PATHS share one query (single flight)
+COALESCE_READS = os.environ.get('COALESCE_READS', 'true').lower() == 'true'
+
+# Admission control (see admission.py): concurrent requests per class and
+# worker, how many may queue for a slot and how long, in seconds, before a 503
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'true').lower() == 'true'
+for name, limiter in LIMITERS.items():
+    prefix = f'ADMISSION_{name.upper()}'
+    limiter.configure(
+        limit=int(os.environ.get(f'{prefix}_LIMIT', limiter.limit)),
+        queue=int(os.environ.get(f'{prefix}_QUEUE', limiter.queue)),
+        timeout=float(os.environ.get(f'{prefix}_TIMEOUT', limiter.timeout)),
+    )
+# Lists, search, sync and export; other GETs are cheap, everything else a write
+HEAVY_PATHS = ["/api/ideas", "/api/sync", "/api/export/"]
+# Long-lived streams would hold a slot for as long as the client stays connected
+UNLIMITED_PATHS = ["/api/events"]
+# Per-client token bucket, requests per second per worker (0 disables)
+RATE_LIMIT_RPS = float(os.environ.get('RATE_LIMIT_RPS', '0'))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', str(max(1.0, RATE_LIMIT_RPS * 2))))
+
+# Group commit for POST /ideas (see ingest.py): concurrent creates are written
+# with one insert_many once INGEST_MAX_BATCH are queued or INGEST_MAX_DELAY_MS
+# after the first
+INGEST_BATCHING = os.environ.get('INGEST_BATCHING', 'false').lower() == 'true'
+IDEA_WRITER.configure(
+    max_batch=int(os.environ.get('INGEST_MAX_BATCH', '100')),
+    max_delay=float(os.environ.get('INGEST_MAX_DELAY_MS', '2')) / 1000,
+)
+
+# Compressed storage of large idea bodies (see compression.py): "zlib", "zstd"
+# (needs the zstandard package) or "off"; bodies of at least
+# CONTENT_COMPRESS_MIN_BYTES are stored as binary. Mongo engine only.
+configure_compression(
+    os.environ.get('CONTENT_COMPRESSION', 'off'),
+    int(os.environ.get('CONTENT_COMPRESS_MIN_BYTES', '2048')),
+)
+
+# Hot/cold tiering (see tiering.py): archived and deleted ideas not written for
+# TIERING_AFTER_DAYS move to the `ideas_archive` collection, and soft-deleted
+# ideas are purged after PURGE_DELETED_AFTER_DAYS (0 keeps them forever)
+TIERING_ENABLED = os.environ.get('TIERING_ENABLED', 'false').lower() == 'true'
+TIERING_AFTER = timedelta(days=float(os.environ.get('TIERING_AFTER_DAYS', '7')))
+TIERING_INTERVAL = float(os.environ.get('TIERING_INTERVAL', '300'))
+PURGE_DELETED_AFTER_DAYS = float(os.environ.get('PURGE_DELETED_AFTER_DAYS', '0'))
+PURGE_DELETED_AFTER = timedelta(days=PURGE_DELETED_AFTER_DAYS) if PURGE_DELETED_AFTER_DAYS > 0 else None
+
+# Storage engine behind the core category and idea routes (see storage.py):
+# "mongo", or "sqlite" for an embedded database at SQLITE_PATH (":memory:"
+# keeps it in memory). The change feed, /sync, tags, batch, jobs and
+# import/export need Mongo and answer 501 under SQLite.
+STORAGE_ENGINE = os.environ.get('STORAGE_ENGINE', 'mongo')
+if STORAGE_ENGINE not in ("mongo", "sqlite"):
+    raise ValueError(f"Unknown STORAGE_ENGINE: {STORAGE_ENGINE}")
+SQLITE_PATH = os.environ.get('SQLITE_PATH', str(ROOT_DIR / 'ideas.sqlite3'))
+
+# MongoDB connection. The client is created per worker process in `lifespan`,
+# after any fork, so every worker gets its own connection pool.
+mongo_url = os.environ.get('MONGO_URL')
+MONGO_CLIENT_OPTIONS = {
+    option: int(os.environ[variable])
+    for variable, option in {
+        'MONGO_MAX_POOL_SIZE': 'maxPoolSize',
+        'MONGO_MIN_POOL_SIZE': 'minPoolSize',
+        'MONGO_MAX_IDLE_TIME_MS': 'maxIdleTimeMS',
+        'MONGO_CONNECT_TIMEOUT_MS': 'connectTimeoutMS',
+        'MONGO_SOCKET_TIMEOUT_MS': 'socketTimeoutMS',
+        'MONGO_SERVER_SELECTION_TIMEOUT_MS': 'serverSelectionTimeoutMS',
+        'MONGO_WAIT_QUEUE_TIMEOUT_MS': 'waitQueueTimeoutMS',
+    }.items()
+    if os.environ.get(variable)
+}
+client = None
+db = None
+store: Optional[Store] = None
+
+def create_mongo_client():
+    listeners = [MongoCommandMetrics()] if METRICS_ENABLED else []
+    return AsyncIOMotorClient(mongo_url, event_listeners=listeners, **MONGO_CLIENT_OPTIONS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db, store
+    start_pool(DERIVE_WORKERS)
+    if STORAGE_ENGINE == "sqlite":
+        store = SqliteStore(SQLITE_PATH)
+        await store.start()
+        # Writes handled by other workers sharing the file invalidate this worker's cache
+        watcher = None
+        if CACHE_ENABLED and SQLITE_PATH != ":memory:":
+            watcher = asyncio.create_task(store.watch_commits(RESPONSE_CACHE.invalidate, EVENTS_POLL_INTERVAL))
+        yield
+        if watcher:
+            watcher.cancel()
+        await store.close()
+        stop_pool()
+        return
+    client = create_mongo_client()
+    db = client[os.environ['DB_NAME']]
+    store = MongoStore(db, INGEST_BATCHING)
+    await ensure_indexes(db)
+    await ensure_counters(db)
+    await ensure_tag_counts(db)
+    await migrate_category_updated_at(db)
+    await migrate_category_counts(db)
+    # Until every document has an explicit `deleted` flag, reads use the legacy
+    # filter and the backfill runs in the background while the API serves.
+    migration = None
+    if await is_applied(db, DELETED_FLAG):
+        await finish_deleted_flag(db)
+    else:
+        migration = asyncio.create_task(migrate_deleted_flag(db))
+    # Ideas stored before the current derived fields get them in the background too
+    rederive = asyncio.create_task(migrate_derived_content(db))
+    HUB.configure(
+        partial(run_source, db=db, fields=EVENT_FIELDS, mode=EVENTS_SOURCE, interval=EVENTS_POLL_INTERVAL),
+        EVENTS_QUEUE_SIZE,
+    )
+    if CACHE_ENABLED:
+        # Writes handled by other workers invalidate this worker's cache
+        RESPONSE_CACHE.invalidate()
+        HUB.listen(RESPONSE_CACHE.invalidate)
+    # Jobs left behind by a worker that stopped mid-way
+    await resume_jobs(db)
+    tiering = None
+    if TIERING_ENABLED or PURGE_DELETED_AFTER:
+        tiering = asyncio.create_task(run_tiering(
+            db, TIERING_AFTER if TIERING_ENABLED else None, PURGE_DELETED_AFTER, TIERING_INTERVAL))
+    yield
+    if migration:
+        migration.cancel()
+    rederive.cancel()
+    if tiering:
+        tiering.cancel()
+    await IDEA_WRITER.drain(db)
+    cancel_jobs()
+    await HUB.close()
+    client.close()
+    stop_pool()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -32,6 +218,7 @@ class Category(BaseModel):
     name: str
     color: str = "#6366f1"  # Default purple color
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class CategoryCreate(BaseModel):
     name: str
@@ -46,6 +233,39 @@ class Idea(BaseModel):
     is_archived: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    version: int = 1  # Incremented by every write; the ETag of GET /ideas/{id}
+
+# List items carry only the fields that were requested (see IDEA_VIEWS and `fields=`)
+class IdeaListItem(BaseModel):
+    id: Optional[str] = None
+    title: Optional[str] = None
+    content: Optional[str] = None
+    excerpt: Optional[str] = None  # Plain-text preview computed at write time
+    category_id: Optional[str] = None
+    tags: Optional[List[str]] = None
+    is_archived: Optional[bool] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    word_count: Optional[int] = None
+    links: Optional[List[str]] = None
+    version: Optional[int] = None
+    score: Optional[float] = None
+    snippet: Optional[str] = None  # Highlighted plain-text excerpt, only set for searches
+
+IDEA_VIEWS = {
+    "full": ["id", "title", "content", "category_id", "tags", "is_archived", "created_at", "updated_at", "version"],
+    "summary": [
+        "id", "title", "excerpt", "word_count", "category_id", "tags", "is_archived", "created_at", "updated_at",
+        "version",
+    ],
+}
+IDEA_LIST_FIELDS = set(IDEA_VIEWS["full"]) | set(IDEA_VIEWS["summary"]) | {"links"}
+CATEGORY_FIELDS = ["id", "name", "color", "created_at"]
+# What change-feed events carry: the same shapes the list routes return
+EVENT_FIELDS = {
+    "ideas": IDEA_VIEWS["summary"],
+    "categories": CATEGORY_FIELDS,
+}
 
 class IdeaCreate(BaseModel):
     title: str
@@ -60,133 +280,462 @@ class IdeaUpdate(BaseModel):
     tags: Optional[List[str]] = None
     is_archived: Optional[bool] = None
 
+MAX_BATCH_SIZE = 1000
+
+class IdeaBatchOperation(BaseModel):
+    op: Literal["create", "update", "archive", "unarchive", "delete"]
+    id: Optional[str] = None  # Required for every op except create
+    idea: Optional[IdeaCreate] = None  # Payload for create
+    changes: Optional[IdeaUpdate] = None  # Payload for update
+
+class IdeaBatchRequest(BaseModel):
+    operations: List[IdeaBatchOperation] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class IdeaBatchItemResult(BaseModel):
+    index: int
+    op: str
+    id: Optional[str] = None
+    status: Literal["created", "updated", "not_found", "invalid", "failed"]
+    error: Optional[str] = None
+
+class IdeaBatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[IdeaBatchItemResult]
+
+# Write helpers shared by the single-item and batch routes. `derived` is what
+# content.derive_fields returned for the new content.
+def new_idea_document(idea: IdeaCreate, derived: Dict):
+    idea_obj = Idea(**idea.dict())
+    return idea_obj, {**idea_obj.dict(), **derived, "deleted": False}
+
+def idea_update_fields(idea_update: IdeaUpdate, derived: Optional[Dict] = None) -> Dict:
+    update_dict = {k: v for k, v in idea_update.dict().items() if v is not None}
+    update_dict["updated_at"] = datetime.utcnow()
+    if "content" in update_dict:
+        update_dict.update(derived)
+    return update_dict
+
+# Response helpers
+def fast_json(content, next_cursor: Optional[str] = None) -> ORJSONResponse:
+    """Serialize Mongo documents straight to JSON bytes.
+
+    Documents are written through the models above, so read routes trust them
+    and skip both `Model(**doc)` and FastAPI's response_model validation.
+    Queries must project away `_id`.
+    """
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return ORJSONResponse(content, headers=headers)
+
+def select_fields(doc, fields):
+    return {field: doc[field] for field in fields if field in doc}
+
+def require_mongo():
+    """Dependency of the routes that only the Mongo engine supports."""
+    if STORAGE_ENGINE != "mongo":
+        raise HTTPException(status_code=501, detail=f"Not supported by the {STORAGE_ENGINE} storage engine")
+
+MONGO_ONLY = [Depends(require_mongo)]
+
+# Optimistic concurrency: GET /ideas/{id} returns the idea's version as its
+# ETag, and writes sent with If-Match apply only if it is still current
+def version_etag(version: Optional[int]) -> str:
+    return f'"{version or 0}"'
+
+def if_match_version(if_match: Optional[str]) -> Optional[int]:
+    """The version an If-Match header names; None when there is none or it is `*`."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=412, detail="If-Match does not name a version of this idea")
+
+IF_MATCH = Header(None, description="ETag from GET /ideas/{id}; the write fails with 412 if the idea changed since")
+
 # Category endpoints
 @api_router.post("/categories", response_model=Category)
 async def create_category(category: CategoryCreate):
     category_dict = category.dict()
     category_obj = Category(**category_dict)
-    await db.categories.insert_one(category_obj.dict())
+    await store.insert_category({**category_obj.dict(), "deleted": False})
     return category_obj
 
 @api_router.get("/categories", response_model=List[Category])
-async def get_categories():
-    categories = await db.categories.find({"$or": [{"deleted": {"$exists": False}}, {"deleted": False}]}).to_list(1000)
-    return [Category(**cat) for cat in categories]
+async def get_categories(
+    limit: int = Query(200, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    with_stats: bool = Query(False, description="Include active_ideas, archived_ideas and idea_count")
+):
+    try:
+        categories, next_cursor = await store.list_categories(CATEGORY_FIELDS, limit, cursor, with_stats)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return fast_json(categories, next_cursor)
 
 @api_router.delete("/categories/{category_id}")
-async def delete_category(category_id: str):
-    result = await db.categories.update_one(
-        {"id": category_id}, 
-        {"$set": {"deleted": True}}
-    )
-    if result.matched_count == 0:
+async def delete_category(
+    category_id: str,
+    reassign_to: Optional[str] = Query(None, description="Category to move the ideas to; by default they are left uncategorized")
+):
+    if reassign_to is not None:
+        if reassign_to == category_id:
+            raise HTTPException(status_code=400, detail="Cannot reassign ideas to the deleted category")
+        if not await store.category_exists(reassign_to):
+            raise HTTPException(status_code=404, detail="Target category not found")
+    # Mongo moves the ideas in a background job and returns its `job_id`
+    result = await store.delete_category(category_id, reassign_to)
+    if result is None:
         raise HTTPException(status_code=404, detail="Category not found")
-    return {"message": "Category deleted"}
+    return {"message": "Category deleted", **result}
+
+@api_router.get("/jobs/{job_id}", dependencies=MONGO_ONLY)
+async def get_job_status(job_id: str):
+    job = await get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return fast_json(job_view(job))
 
 # Idea endpoints
 @api_router.post("/ideas", response_model=Idea)
 async def create_idea(idea: IdeaCreate):
-    idea_dict = idea.dict()
-    idea_obj = Idea(**idea_dict)
-    await db.ideas.insert_one(idea_obj.dict())
+    idea_obj, idea_doc = new_idea_document(idea, await derive_fields(idea.content))
+    await store.insert_idea(idea_doc)
     return idea_obj
 
-@api_router.get("/ideas", response_model=List[Idea])
+@api_router.get("/ideas", response_model=List[IdeaListItem], response_model_exclude_unset=True)
 async def get_ideas(
     archived: Optional[bool] = None,
     category_id: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    tag: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    view: Literal["full", "summary"] = "full",
+    fields: Optional[str] = Query(None, description="Comma-separated subset of fields to return")
 ):
-    query = {"$or": [{"deleted": {"$exists": False}}, {"deleted": False}]}
-    
-    if archived is not None:
-        query["is_archived"] = archived
+    if fields:
+        output_fields = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = set(output_fields) - IDEA_LIST_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    else:
+        output_fields = IDEA_VIEWS[view]
+    # id and created_at are always read because the page cursor is built from them
+    trim = not {"id", "created_at"} <= set(output_fields)
     
-    if category_id:
-        query["category_id"] = category_id
-        
     if search:
-        query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"content": {"$regex": search, "$options": "i"}},
-            {"tags": {"$regex": search, "$options": "i"}}
-        ]
+        # Ranked full-text search over title, tags and the HTML-stripped content.
+        # Results are the top `limit` hits by relevance and are not paginated.
+        ideas = await store.search_ideas(search, output_fields, limit, archived, category_id, tag)
+        terms = search_terms(search)
+        for idea in ideas:
+            idea["snippet"] = highlight_snippet(idea.pop("content_text", ""), terms)
+        if trim:
+            ideas = [select_fields(idea, output_fields + ["score", "snippet"]) for idea in ideas]
+        return fast_json(ideas)
     
-    ideas = await db.ideas.find(query).sort("created_at", -1).to_list(1000)
-    return [Idea(**idea) for idea in ideas]
+    try:
+        ideas, next_cursor = await store.list_ideas(output_fields, limit, cursor, archived, category_id, tag)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if trim:
+        ideas = [select_fields(idea, output_fields) for idea in ideas]
+    return fast_json(ideas, next_cursor)
 
 @api_router.get("/ideas/{idea_id}", response_model=Idea)
 async def get_idea(idea_id: str):
-    idea = await db.ideas.find_one({"id": idea_id, "$or": [{"deleted": {"$exists": False}}, {"deleted": False}]})
+    idea = await store.get_idea(idea_id, IDEA_VIEWS["full"])
     if not idea:
         raise HTTPException(status_code=404, detail="Idea not found")
-    return Idea(**idea)
+    response = fast_json(idea)
+    response.headers["ETag"] = version_etag(idea.get("version"))
+    return response
 
 @api_router.put("/ideas/{idea_id}", response_model=Idea)
-async def update_idea(idea_id: str, idea_update: IdeaUpdate):
-    update_dict = {k: v for k, v in idea_update.dict().items() if v is not None}
-    update_dict["updated_at"] = datetime.utcnow()
+async def update_idea(idea_id: str, idea_update: IdeaUpdate, response: Response, if_match: Optional[str] = IF_MATCH):
+    expected_version = if_match_version(if_match)
+    derived = await derive_fields(idea_update.content) if idea_update.content is not None else None
+    update_dict = idea_update_fields(idea_update, derived)
     
-    result = await db.ideas.update_one(
-        {"id": idea_id}, 
-        {"$set": update_dict}
-    )
+    idea = await store.update_idea(idea_id, update_dict, expected_version)
     
-    if result.matched_count == 0:
+    if idea is None:
         raise HTTPException(status_code=404, detail="Idea not found")
     
-    updated_idea = await db.ideas.find_one({"id": idea_id})
-    return Idea(**updated_idea)
+    response.headers["ETag"] = version_etag(idea["version"])
+    return Idea(**idea)
 
 @api_router.delete("/ideas/{idea_id}")
-async def delete_idea(idea_id: str):
-    result = await db.ideas.update_one(
-        {"id": idea_id}, 
-        {"$set": {"deleted": True}}
-    )
-    if result.matched_count == 0:
+async def delete_idea(idea_id: str, if_match: Optional[str] = IF_MATCH):
+    if not await store.delete_idea(idea_id, if_match_version(if_match)):
         raise HTTPException(status_code=404, detail="Idea not found")
     return {"message": "Idea deleted"}
 
 # Archive/unarchive idea
 @api_router.patch("/ideas/{idea_id}/archive")
-async def toggle_archive_idea(idea_id: str):
-    idea = await db.ideas.find_one({"id": idea_id})
-    if not idea:
+async def toggle_archive_idea(idea_id: str, response: Response, if_match: Optional[str] = IF_MATCH):
+    idea = await store.toggle_archive(idea_id, if_match_version(if_match))
+    if idea is None:
         raise HTTPException(status_code=404, detail="Idea not found")
     
-    new_status = not idea.get("is_archived", False)
-    await db.ideas.update_one(
-        {"id": idea_id}, 
-        {"$set": {"is_archived": new_status, "updated_at": datetime.utcnow()}}
-    )
-    
-    return {"message": f"Idea {'archived' if new_status else 'unarchived'}"}
+    response.headers["ETag"] = version_etag(idea["version"])
+    return {
+        "message": f"Idea {'archived' if idea['is_archived'] else 'unarchived'}",
+        "is_archived": idea["is_archived"],
+        "version": idea["version"],
+    }
+
+# Batch operations: one unordered bulk_write per request, with per-item results
+@api_router.post("/ideas/batch", response_model=IdeaBatchResponse, dependencies=MONGO_ONLY)
+async def batch_ideas(batch: IdeaBatchRequest):
+    results = [
+        IdeaBatchItemResult(index=i, op=operation.op, id=operation.id, status="updated")
+        for i, operation in enumerate(batch.operations)
+    ]
+
+    def reject(i, status, error=None):
+        results[i].status = status
+        results[i].error = error
+
+    # Current state of every referenced idea, fetched in one round trip for the counters and tag facets
+    referenced = {operation.id for operation in batch.operations if operation.id}
+    prefetch = {"_id": 0, "id": 1, "is_archived": 1, "deleted": 1, "category_id": 1, "tags": 1, "version": 1}
+    existing = {
+        doc["id"]: doc
+        for doc in await db.ideas.find({"id": {"$in": list(referenced)}}, prefetch).to_list(None)
+    }
+    # Ideas in the cold tier are moved back before they are written
+    missing = referenced - existing.keys()
+    if missing and await restore(db, missing):
+        existing.update(
+            (doc["id"], doc) for doc in await db.ideas.find({"id": {"$in": list(missing)}}, prefetch).to_list(None)
+        )
+
+    # Parse every new body up front, large ones in parallel on the derivation pool
+    contents = {
+        i: operation.idea.content if operation.op == "create" else operation.changes.content
+        for i, operation in enumerate(batch.operations)
+        if (operation.op == "create" and operation.idea is not None)
+        or (operation.op == "update" and operation.changes is not None and operation.changes.content is not None)
+    }
+    derived = dict(zip(contents, await derive_many(list(contents.values()))))
 
-# Stats endpoint
+    requests, request_items, changes = [], [], {}
+    seen = set()
+    for i, operation in enumerate(batch.operations):
+        if operation.op == "create":
+            if operation.idea is None:
+                reject(i, "invalid", "create requires 'idea'")
+                continue
+            idea_obj, idea_doc = new_idea_document(operation.idea, derived[i])
+            results[i].id = idea_obj.id
+            results[i].status = "created"
+            requests.append(InsertOne(pack_fields(idea_doc)))
+            changes[i] = (None, idea_doc)
+        else:
+            if not operation.id:
+                reject(i, "invalid", f"{operation.op} requires 'id'")
+                continue
+            if operation.id in seen:
+                reject(i, "invalid", "id appears more than once in this batch")
+                continue
+            seen.add(operation.id)
+            before = existing.get(operation.id)
+            if before is None:
+                reject(i, "not_found", "Idea not found")
+                continue
+            if operation.op == "update":
+                if operation.changes is None:
+                    reject(i, "invalid", "update requires 'changes'")
+                    continue
+                update_dict = idea_update_fields(operation.changes, derived.get(i))
+            elif operation.op == "delete":
+                update_dict = {"deleted": True, "updated_at": datetime.utcnow()}
+            else:
+                update_dict = {"is_archived": operation.op == "archive", "updated_at": datetime.utcnow()}
+            # Guarded by the prefetched version, so the deltas below stay exact under concurrent writes
+            requests.append(UpdateOne(
+                {"id": operation.id, **version_filter(before.get("version", 0))},
+                {"$set": pack_fields(update_dict), "$inc": {"version": 1}},
+            ))
+            changes[i] = (before, {**before, **update_dict})
+        request_items.append(i)
+
+    if requests:
+        try:
+            matched = (await db.ideas.bulk_write(requests, ordered=False)).matched_count
+        except BulkWriteError as exc:
+            matched = exc.details.get("nMatched", 0)
+            for error in exc.details.get("writeErrors", []):
+                i = request_items[error["index"]]
+                reject(i, "failed", error.get("errmsg"))
+                changes.pop(i, None)
+        guarded = [i for i in request_items if i in changes and changes[i][0] is not None]
+        if matched < len(guarded):
+            # Some ideas were written between the prefetch and the update: the ones
+            # that applied carry the next version and this write's `updated_at`
+            applied = {
+                doc["id"] for doc in await db.ideas.find({"$or": [
+                    {"id": changes[i][0]["id"], "version": next_version(changes[i][0]),
+                     "updated_at": changes[i][1]["updated_at"]}
+                    for i in guarded
+                ]}, {"_id": 0, "id": 1}).to_list(None)
+            }
+            for i in guarded:
+                if changes[i][0]["id"] not in applied:
+                    reject(i, "failed", "Idea was modified concurrently; retry")
+                    changes.pop(i)
+        await record_idea_changes(db, changes.values())
+
+    failed = sum(result.status not in ("created", "updated") for result in results)
+    return IdeaBatchResponse(succeeded=len(results) - failed, failed=failed, results=results)
+
+# Stats endpoint, served from the counters maintained by the write paths above
 @api_router.get("/stats")
 async def get_stats():
-    total_ideas = await db.ideas.count_documents({"$or": [{"deleted": {"$exists": False}}, {"deleted": False}]})
-    active_ideas = await db.ideas.count_documents({"is_archived": False, "$or": [{"deleted": {"$exists": False}}, {"deleted": False}]})
-    archived_ideas = await db.ideas.count_documents({"is_archived": True, "$or": [{"deleted": {"$exists": False}}, {"deleted": False}]})
-    total_categories = await db.categories.count_documents({"$or": [{"deleted": {"$exists": False}}, {"deleted": False}]})
-    
-    return {
-        "total_ideas": total_ideas,
-        "active_ideas": active_ideas,
-        "archived_ideas": archived_ideas,
-        "total_categories": total_categories
-    }
+    return await store.stats()
+
+# Tag facets and autocomplete (see tags.py)
+@api_router.get("/tags", dependencies=MONGO_ONLY)
+async def get_tags(
+    category_id: Optional[str] = None,
+    archived: Optional[bool] = None,
+    prefix: Optional[str] = Query(None, description="Case-insensitive tag prefix, for autocomplete"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    return fast_json(await tag_facets(db, category_id, archived, prefix, limit))
+
+# Incremental sync (see sync.py)
+@api_router.get("/sync", dependencies=MONGO_ONLY)
+async def sync_changes(
+    since: Optional[str] = Query(None, description="Watermark from a previous /sync response or /events"),
+    limit: int = Query(500, ge=1, le=1000, description="Maximum changes per collection"),
+    view: Literal["full", "summary"] = "summary"
+):
+    fields = {"ideas": IDEA_VIEWS[view], "categories": CATEGORY_FIELDS}
+    try:
+        return fast_json(await changes_since(
+            db, since, fields, limit, tiers={"ideas": [HOT, COLD]}, max_age=PURGE_DELETED_AFTER))
+    except WatermarkExpired:
+        raise HTTPException(status_code=410, detail="Watermark expired; reload everything")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid watermark")
+
+# Change feed (see events.py)
+@api_router.get("/events", dependencies=MONGO_ONLY)
+async def stream_events():
+    return StreamingResponse(
+        HUB.stream(EVENTS_KEEPALIVE),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Export / import
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '1000'))
+EXPORT_FIELDS = {
+    "ideas": IDEA_VIEWS["full"],
+    "categories": CATEGORY_FIELDS,
+}
+
+def is_true(value) -> bool:
+    return value is True or str(value).lower() in ("true", "1")
+
+@api_router.get("/export/{collection}", dependencies=MONGO_ONLY)
+async def export_collection(
+    collection: Literal["ideas", "categories"],
+    format: Literal["ndjson", "csv"] = "ndjson",
+    include_deleted: bool = False
+):
+    fields = EXPORT_FIELDS[collection] + (["deleted"] if include_deleted else [])
+    projection = {field: 1 for field in fields}
+    projection["_id"] = 0
+    query = {} if include_deleted else live_filter()
+    if collection == "ideas":
+        cursor = unpack_each(stream_tiers(db, query, projection, EXPORT_BATCH_SIZE))
+    else:
+        cursor = db[collection].find(query, projection).batch_size(EXPORT_BATCH_SIZE)
+    return StreamingResponse(
+        export_stream(cursor, format, fields, EXPORT_BATCH_SIZE),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{collection}.{format}"'},
+    )
+
+def import_response(summary):
+    if "aborted" in summary:
+        raise HTTPException(status_code=400, detail=summary)
+    return summary
+
+@api_router.post("/import/ideas", dependencies=MONGO_ONLY)
+async def import_ideas(request: Request, format: Literal["ndjson", "csv"] = "ndjson"):
+    def to_document(record):
+        idea = Idea(**record)  # Keeps id and timestamps from the export when present
+        return {**idea.dict(), "deleted": is_true(record.get("deleted"))}
+
+    async def prepare(docs):
+        for doc, derived in zip(docs, await derive_many([doc["content"] for doc in docs])):
+            doc.update(derived)
+            doc["content"] = pack(doc["content"])
+
+    async def on_inserted(docs):
+        await record_idea_changes(db, [(None, doc) for doc in docs])
+
+    records = read_records(request.stream(), format, nullable=("category_id",))
+    return import_response(
+        await import_records(db.ideas, records, to_document, IMPORT_BATCH_SIZE, on_inserted, prepare=prepare)
+    )
+
+@api_router.post("/import/categories", dependencies=MONGO_ONLY)
+async def import_categories(request: Request, format: Literal["ndjson", "csv"] = "ndjson"):
+    def to_document(record):
+        return {**Category(**record).dict(), "deleted": is_true(record.get("deleted"))}
+
+    async def on_inserted(docs):
+        await record_category_change(db, sum(not doc.get("deleted") for doc in docs))
+
+    records = read_records(request.stream(), format)
+    return import_response(await import_records(db.categories, records, to_document, IMPORT_BATCH_SIZE, on_inserted))
 
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.exception_handler(VersionConflict)
+async def version_conflict_handler(request: Request, exc: VersionConflict):
+    return ORJSONResponse(
+        {"detail": "Idea was modified since it was read", "version": exc.version},
+        status_code=412,
+        headers={"ETag": version_etag(exc.version)},
+    )
+
+# Inside the cache, so cache hits and coalesced reads never wait for a slot
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, limiters=LIMITERS, heavy_paths=HEAVY_PATHS, exempt_paths=UNLIMITED_PATHS)
+
+if CACHE_ENABLED or COALESCE_READS:
+    app.add_middleware(
+        CacheMiddleware, cache=RESPONSE_CACHE, paths=CACHED_PATHS, store=CACHE_ENABLED, coalesce=COALESCE_READS
+    )
+
+if RATE_LIMIT_RPS > 0:
+    app.add_middleware(
+        RateLimitMiddleware, buckets=TokenBuckets(RATE_LIMIT_RPS, RATE_LIMIT_BURST), exempt_paths=UNLIMITED_PATHS
+    )
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Retry-After"],
 )
 
 # Configure logging
@@ -195,7 +744,3 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
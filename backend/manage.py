@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Maintenance commands for the Idea Logger backend.
+
+Usage: python manage.py <command> [options]
+"""
+import asyncio
+import os
+from datetime import timedelta
+from pathlib import Path
+
+import typer
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from compression import configure as configure_compression
+from content import DERIVED_VERSION, start_pool, stop_pool
+from counters import rebuild_category_counters, reconcile
+from tags import rebuild_tag_counts
+from indexes import check_query_plans, ensure_indexes
+from migrations import (
+    DELETED_FLAG, DERIVED_CONTENT, backfill_deleted_flag, compress_content, content_storage_report, is_applied,
+    mark_applied, migrate_deleted_flag, rederive_content,
+)
+from queries import set_normalized
+from tiering import move_cold, purge_deleted
+
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+cli = typer.Typer(help="Idea Logger maintenance commands")
+
+
+def get_db(db_name=None):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    return client[db_name or os.environ['DB_NAME']]
+
+
+@cli.command("ensure-indexes")
+def ensure_indexes_command(db_name: str = typer.Option(None, "--db", help="Database name (defaults to DB_NAME)")):
+    """Create the indexes declared in indexes.py."""
+    asyncio.run(ensure_indexes(get_db(db_name)))
+    typer.echo("Indexes are up to date")
+
+
+@cli.command("explain-check")
+def explain_check_command(db_name: str = typer.Option(None, "--db", help="Database name (defaults to DB_NAME)")):
+    """Explain every route query and fail if any of them does a COLLSCAN."""
+    async def run():
+        db = get_db(db_name)
+        await ensure_indexes(db)
+        # Check the query shapes the routes use against this database
+        normalized = await is_applied(db, DELETED_FLAG)
+        set_normalized(normalized)
+        typer.echo(f"Soft-delete filter: {'equality (partial indexes)' if normalized else 'legacy $or'}")
+        return await check_query_plans(db)
+
+    failed = 0
+    for route, stages, ok in asyncio.run(run()):
+        typer.echo(f"{'OK  ' if ok else 'FAIL'} {route}: {' <- '.join(stages)}")
+        failed += not ok
+    if failed:
+        typer.echo(f"{failed} route queries fall back to COLLSCAN")
+        raise typer.Exit(code=1)
+    typer.echo("All route queries are served by an index")
+
+
+@cli.command("rederive")
+def rederive_command(
+    db_name: str = typer.Option(None, "--db", help="Database name (defaults to DB_NAME)"),
+    batch_size: int = typer.Option(500, help="Documents updated per bulk write"),
+    pause_ms: int = typer.Option(50, help="Pause between batches to leave room for live traffic"),
+    workers: int = typer.Option(os.cpu_count() or 1, help="Processes parsing HTML (0 parses inline)"),
+):
+    """Recompute plain text, excerpt, word count and links for ideas derived by an older version.
+
+    Safe to interrupt and run again; it resumes with the ideas not yet updated.
+    """
+    async def run():
+        start_pool(workers)
+        try:
+            db = get_db(db_name)
+            updated = await rederive_content(
+                db, batch_size, pause_ms / 1000,
+                progress=lambda updated: typer.echo(f"Re-derived {updated} ideas"),
+            )
+            # The API workers skip their background run from now on
+            await mark_applied(db, DERIVED_CONTENT)
+            return updated
+        finally:
+            stop_pool()
+
+    typer.echo(f"Done, {asyncio.run(run())} ideas updated to derived version {DERIVED_VERSION}")
+
+
+@cli.command("compress-content")
+def compress_content_command(
+    db_name: str = typer.Option(None, "--db", help="Database name (defaults to DB_NAME)"),
+    codec: str = typer.Option(os.environ.get('CONTENT_COMPRESSION') or "zlib", help="zlib or zstd"),
+    min_bytes: int = typer.Option(int(os.environ.get('CONTENT_COMPRESS_MIN_BYTES', '2048')),
+                                  help="Compress bodies of at least this many UTF-8 bytes"),
+    batch_size: int = typer.Option(500, help="Documents updated per bulk write"),
+    pause_ms: int = typer.Option(50, help="Pause between batches to leave room for live traffic"),
+):
+    """Store existing idea bodies compressed, as CONTENT_COMPRESSION does for new writes (see compression.py).
+
+    Safe to interrupt and run again. Use the same codec as the API, which must
+    be able to read it: zstd needs the zstandard package on every worker.
+    """
+    configure_compression(codec, min_bytes)
+    totals = asyncio.run(compress_content(
+        get_db(db_name), batch_size, pause_ms / 1000,
+        progress=lambda compressed: typer.echo(f"Compressed {compressed} ideas"),
+    ))
+    before, after = totals["bytes_before"], totals["bytes_after"]
+    saved = f", {(1 - after / before) * 100:.0f}% saved" if before else ""
+    typer.echo(f"Done, {totals['compressed']} ideas compressed with {codec}: {before} -> {after} content bytes{saved}")
+
+
+@cli.command("content-report")
+def content_report_command(db_name: str = typer.Option(None, "--db", help="Database name (defaults to DB_NAME)")):
+    """Report how much space idea bodies take as stored and as text, per tier."""
+    for row in asyncio.run(content_storage_report(get_db(db_name))):
+        stored = row["text_bytes"] + row["compressed_bytes"]
+        saved = f" ({(1 - stored / row['uncompressed_bytes']) * 100:.0f}% saved)" if row["uncompressed_bytes"] else ""
+        typer.echo(
+            f"{row['tier']}: {row['text_ideas']} text and {row['compressed_ideas']} compressed bodies, "
+            f"{stored} bytes stored for {row['uncompressed_bytes']} bytes of text{saved}; "
+            f"collection data {row['data_size']} bytes, {row['storage_size']} bytes on disk"
+        )
+
+
+@cli.command("reconcile-stats")
+def reconcile_stats_command(
+    db_name: str = typer.Option(None, "--db", help="Database name (defaults to DB_NAME)"),
+    check: bool = typer.Option(False, "--check", help="Only compare, exit 1 on mismatch"),
+):
+    """Recount the /api/stats counters and rebuild them if they drifted."""
+    stored, actual = asyncio.run(reconcile(get_db(db_name), fix=not check))
+    for field, value in actual.items():
+        current = stored.get(field) if stored else None
+        typer.echo(f"{'OK  ' if current == value else 'DIFF'} {field}: stored={current} actual={value}")
+    if stored != actual:
+        if check:
+            raise typer.Exit(code=1)
+        typer.echo("Counters rebuilt")
+
+
+@cli.command("rebuild-category-counts")
+def rebuild_category_counts_command(db_name: str = typer.Option(None, "--db", help="Database name (defaults to DB_NAME)")):
+    """Recount the per-category idea counts behind /api/categories?with_stats=true."""
+    categories = asyncio.run(rebuild_category_counters(get_db(db_name)))
+    typer.echo(f"Category counts rebuilt, {categories} categories with ideas")
+
+
+@cli.command("rebuild-tags")
+def rebuild_tags_command(db_name: str = typer.Option(None, "--db", help="Database name (defaults to DB_NAME)")):
+    """Recount the /api/tags facet buckets from the ideas collection."""
+    buckets = asyncio.run(rebuild_tag_counts(get_db(db_name)))
+    typer.echo(f"Tag counts rebuilt, {buckets} buckets")
+
+
+@cli.command("backfill-deleted")
+def backfill_deleted_command(
+    db_name: str = typer.Option(None, "--db", help="Database name (defaults to DB_NAME)"),
+    batch_size: int = typer.Option(1000, help="Documents updated per batch"),
+    pause_ms: int = typer.Option(50, help="Pause between batches to leave room for live traffic"),
+):
+    """Give every idea and category an explicit `deleted: false` and record the migration.
+
+    The API runs the same migration in the background on startup; this command
+    is for running it ahead of a deploy or resuming it by hand.
+    """
+    async def run():
+        db = get_db(db_name)
+        if await is_applied(db, DELETED_FLAG):
+            typer.echo("Already applied; checking for stragglers")
+            return await backfill_deleted_flag(db, batch_size, pause_ms / 1000)
+        await migrate_deleted_flag(db, batch_size, pause_ms / 1000)
+        return None
+
+    updated = asyncio.run(run())
+    typer.echo("Done" if updated is None else f"Done, {updated} documents updated")
+
+
+@cli.command("tier")
+def tier_command(
+    db_name: str = typer.Option(None, "--db", help="Database name (defaults to DB_NAME)"),
+    after_days: float = typer.Option(7, help="Move archived and deleted ideas not written for this many days"),
+    purge_days: float = typer.Option(0, help="Also purge ideas deleted this many days ago (0 keeps them)"),
+    batch_size: int = typer.Option(500, help="Ideas moved per batch"),
+    pause_ms: int = typer.Option(50, help="Pause between batches to leave room for live traffic"),
+):
+    """Run one hot/cold tiering pass now (see tiering.py), as TIERING_ENABLED does in the background."""
+    async def run():
+        db = get_db(db_name)
+        moved = await move_cold(
+            db, timedelta(days=after_days), batch_size, pause_ms / 1000,
+            progress=lambda moved: typer.echo(f"Moved {moved} ideas"),
+        )
+        purged = await purge_deleted(db, timedelta(days=purge_days)) if purge_days > 0 else 0
+        return moved, purged
+
+    moved, purged = asyncio.run(run())
+    typer.echo(f"Done, {moved} ideas moved to the cold tier, {purged} deleted ideas purged")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,174 @@
+"""In-process metrics exposed in the Prometheus text format at /metrics.
+
+Route latency and status counts are recorded by `MetricsMiddleware`; Mongo
+command timing comes from a pymongo `CommandListener` registered on the Motor
+client. Recording is a dict lookup and a few increments under a lock, cheap
+enough to leave on in production.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from pymongo import monitoring
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge:
+    """Value read from a callback at scrape time, e.g. a queue depth."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, collect: Callable[[], Dict[Tuple[str, ...], float]],
+                 labelnames: Iterable[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.collect = collect
+
+    def samples(self):
+        for labels, value in self.collect().items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._values.items()]
+        names = self.labelnames + ("le",)
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(names, labels + (str(bound),))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")))
+REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code", ("method", "route", "status")))
+MONGO_LATENCY = REGISTRY.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ("command", "collection")))
+MONGO_FAILURES = REGISTRY.register(Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands", ("command", "collection")))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency per route template (not raw path)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            REQUEST_LATENCY.observe(time.perf_counter() - started, scope["method"], path)
+            REQUESTS.inc(scope["method"], path, str(status))
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Per-command, per-collection timing for every command sent by the client."""
+
+    def __init__(self):
+        self._pending: Dict[Tuple, Tuple[str, str]] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.command.get("collection", "")  # getMore
+        self._pending[(event.connection_id, event.request_id)] = (event.command_name, collection)
+
+    def _finish(self, event):
+        return self._pending.pop((event.connection_id, event.request_id), (event.command_name, ""))
+
+    def succeeded(self, event):
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, *self._finish(event))
+
+    def failed(self, event):
+        labels = self._finish(event)
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, *labels)
+        MONGO_FAILURES.inc(*labels)
@@ -0,0 +1,218 @@
+"""Online data migrations.
+
+Each migration walks the collection in `_id` order in small batches, pausing
+between them so it can run while the API is serving traffic, and can be
+restarted at any point. Completion is recorded in the `migrations` collection.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from bson.binary import Binary
+from pymongo import UpdateOne
+
+from compression import pack, stored_size, unpack
+from content import DERIVED_VERSION, derive_many
+from counters import rebuild_category_counters
+from indexes import drop_obsolete_indexes
+from leases import LEASE, hold_lease
+from queries import set_normalized
+from tiering import TIERS
+
+
+logger = logging.getLogger(__name__)
+
+DELETED_FLAG = "deleted_flag"
+CATEGORY_UPDATED_AT = "category_updated_at"
+CATEGORY_COUNTS = "category_counts"
+# Recorded per DERIVED_VERSION, so bumping it reruns the migration
+DERIVED_CONTENT = f"derived_content_v{DERIVED_VERSION}"
+
+
+async def is_applied(db, name: str) -> bool:
+    return await db.migrations.find_one({"_id": name}) is not None
+
+
+async def mark_applied(db, name: str):
+    await db.migrations.update_one(
+        {"_id": name}, {"$setOnInsert": {"applied_at": datetime.utcnow()}}, upsert=True
+    )
+
+
+async def backfill_deleted_flag(db, batch_size: int = 1000, pause: float = 0.05, progress=None) -> int:
+    """Set an explicit `deleted: false` on ideas and categories that have no flag."""
+    updated = 0
+    for collection in (db.ideas, db.categories):
+        last_id = None
+        while True:
+            query = {"deleted": {"$exists": False}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            batch = await collection.find(query, {"_id": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+            last_id = batch[-1]["_id"]
+            result = await collection.update_many(
+                {"_id": {"$in": [doc["_id"] for doc in batch]}, "deleted": {"$exists": False}},
+                {"$set": {"deleted": False}},
+            )
+            updated += result.modified_count
+            if progress:
+                progress(collection.name, updated)
+            await asyncio.sleep(pause)
+    return updated
+
+
+async def migrate_category_updated_at(db):
+    """Stamp `updated_at` from `created_at` on categories written before they had one.
+
+    Categories are few, so this runs inline at startup; without it they would
+    be invisible to /sync and the change feed until their next write.
+    """
+    if await is_applied(db, CATEGORY_UPDATED_AT):
+        return
+    result = await db.categories.update_many(
+        {"updated_at": {"$exists": False}}, [{"$set": {"updated_at": "$created_at"}}]
+    )
+    await mark_applied(db, CATEGORY_UPDATED_AT)
+    logger.info("Stamped updated_at on %d categories", result.modified_count)
+
+
+async def migrate_category_counts(db):
+    """Build the per-category counters for a database that predates them.
+
+    One aggregation over the live ideas; write paths keep them current after that.
+    """
+    if await is_applied(db, CATEGORY_COUNTS):
+        return
+    categories = await rebuild_category_counters(db)
+    await mark_applied(db, CATEGORY_COUNTS)
+    logger.info("Counted ideas for %d categories", categories)
+
+
+async def rederive_content(db, batch_size: int = 500, pause: float = 0.05, progress=None) -> int:
+    """Recompute the derived content fields of ideas stored by an older `DERIVED_VERSION`, in both tiers.
+
+    Each update only applies if `content` is unchanged since it was read, so a
+    concurrent edit (which derives its own fields) is never overwritten. Done
+    documents carry the current version, so an interrupted run picks up where
+    it stopped.
+    """
+    updated = 0
+    for tier in TIERS:
+        collection = db[tier]
+        last_id = None
+        while True:
+            query = {"derived_version": {"$ne": DERIVED_VERSION}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            batch = await collection.find(query, {"_id": 1, "content": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+            last_id = batch[-1]["_id"]
+            contents = [unpack(doc.get("content", "")) for doc in batch]
+            result = await collection.bulk_write([
+                UpdateOne({"_id": doc["_id"], "content": doc.get("content")}, {"$set": derived})
+                for doc, derived in zip(batch, await derive_many(contents))
+            ], ordered=False)
+            updated += result.modified_count
+            if progress:
+                progress(updated)
+            await asyncio.sleep(pause)
+    return updated
+
+
+async def compress_content(db, batch_size: int = 500, pause: float = 0.05, progress=None) -> Dict[str, int]:
+    """Compress the text bodies in both tiers that `compression.pack` would compress today.
+
+    Like `rederive_content`, each update only applies if `content` is unchanged
+    since it was read. Returns how many ideas were compressed and the content
+    bytes of the batches before and after.
+    """
+    totals = {"compressed": 0, "bytes_before": 0, "bytes_after": 0}
+    for tier in TIERS:
+        collection = db[tier]
+        last_id = None
+        while True:
+            query = {"content": {"$type": "string"}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            batch = await collection.find(query, {"_id": 1, "content": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+            last_id = batch[-1]["_id"]
+            updates, sizes = [], []
+            for doc in batch:
+                packed = pack(doc["content"])
+                if isinstance(packed, Binary):
+                    updates.append(UpdateOne({"_id": doc["_id"], "content": doc["content"]}, {"$set": {"content": packed}}))
+                    sizes.append((stored_size(doc["content"]), len(packed)))
+            if updates:
+                result = await collection.bulk_write(updates, ordered=False)
+                # A body edited meanwhile is skipped; its sizes still count in the totals
+                totals["compressed"] += result.modified_count
+                totals["bytes_before"] += sum(before for before, _ in sizes)
+                totals["bytes_after"] += sum(after for _, after in sizes)
+                if progress:
+                    progress(totals["compressed"])
+            await asyncio.sleep(pause)
+    return totals
+
+
+async def content_storage_report(db) -> List[Dict[str, Any]]:
+    """Per tier: ideas with text and compressed bodies, content bytes as stored and
+    as text, and the collection's data and on-disk sizes.
+
+    Reads every compressed body once to measure its text, so it is a full scan.
+    """
+    report = []
+    for tier in TIERS:
+        collection = db[tier]
+        row = {"tier": tier, "text_ideas": 0, "text_bytes": 0, "compressed_ideas": 0, "compressed_bytes": 0}
+        async for group in collection.aggregate([
+            {"$match": {"content": {"$type": ["string", "binData"]}}},
+            {"$group": {"_id": {"$type": "$content"}, "ideas": {"$sum": 1}, "bytes": {"$sum": {"$binarySize": "$content"}}}},
+        ]):
+            kind = "text" if group["_id"] == "string" else "compressed"
+            row[f"{kind}_ideas"], row[f"{kind}_bytes"] = group["ideas"], group["bytes"]
+        row["uncompressed_bytes"] = row["text_bytes"]
+        async for doc in collection.find({"content": {"$type": "binData"}}, {"_id": 0, "content": 1}):
+            row["uncompressed_bytes"] += stored_size(unpack(doc["content"]))
+        stats = await db.command("collStats", tier)
+        row["data_size"], row["storage_size"] = stats.get("size", 0), stats.get("storageSize", 0)
+        report.append(row)
+    return report
+
+
+async def finish_deleted_flag(db):
+    """Switch this process to the equality filter and drop the indexes it replaces."""
+    set_normalized(True)
+    await drop_obsolete_indexes(db)
+
+
+async def migrate_deleted_flag(db, batch_size: int = 1000, pause: float = 0.05):
+    """Run the soft-delete backfill if needed; safe to run from several workers at once."""
+    if not await is_applied(db, DELETED_FLAG):
+        updated = await backfill_deleted_flag(db, batch_size, pause)
+        await mark_applied(db, DELETED_FLAG)
+        logger.info("Soft-delete flag backfilled on %d documents", updated)
+    await finish_deleted_flag(db)
+
+
+async def migrate_derived_content(db, batch_size: int = 500, pause: float = 0.05):
+    """Run `rederive_content` if needed, from whichever worker claims its lease.
+
+    The other workers wait, and take over if the lease expires before the
+    migration is recorded. Until it finishes, ideas stored by an older
+    version lack `excerpt` and `content_text` (or have stale ones) in summary
+    views and search snippets.
+    """
+    while not await is_applied(db, DERIVED_CONTENT):
+        async with hold_lease(db, DERIVED_CONTENT) as held:
+            if held:
+                updated = await rederive_content(db, batch_size, pause)
+                await mark_applied(db, DERIVED_CONTENT)
+                logger.info("Derived content fields recomputed on %d ideas", updated)
+                return
+        await asyncio.sleep(LEASE.total_seconds())
@@ -0,0 +1,101 @@
+"""Opaque keyset cursors over (created_at, id).
+
+A cursor points just past the last document of a page, so fetching the next
+page is an index range scan that costs the same no matter how deep it is.
+"""
+import asyncio
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import DESCENDING
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    payload = json.dumps([doc["created_at"].isoformat(), doc["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Raises ValueError for anything that was not produced by `encode_cursor`."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, idea_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), str(idea_id)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def keyset_filter(cursor: Optional[str], direction: int = DESCENDING) -> Optional[Dict[str, Any]]:
+    """Filter selecting documents after `cursor` in (created_at, id) order."""
+    if not cursor:
+        return None
+    created_at, last_id = decode_cursor(cursor)
+    op = "$lt" if direction == DESCENDING else "$gt"
+    return {"$or": [
+        {"created_at": {op: created_at}},
+        {"created_at": created_at, "id": {op: last_id}},
+    ]}
+
+
+def keyset_sort(direction: int = DESCENDING):
+    return [("created_at", direction), ("id", direction)]
+
+
+def _after(query, cursor, direction):
+    after = keyset_filter(cursor, direction)
+    if after:
+        return {**query, "$and": query.get("$and", []) + [after]}
+    return query
+
+
+def _trim(docs, limit):
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1])
+    return docs, None
+
+
+async def fetch_page(collection, query, limit, cursor=None, direction=DESCENDING, projection=None):
+    """Return (documents, next_cursor) for one page of `query`."""
+    query = _after(query, cursor, direction)
+    docs = await collection.find(query, projection).sort(keyset_sort(direction)).limit(limit + 1).to_list(limit + 1)
+    return _trim(docs, limit)
+
+
+async def fetch_page_across(collections, query, limit, cursor=None, direction=DESCENDING, projection=None):
+    """`fetch_page` over collections that split one set of documents between them
+    (see tiering.py). A document found in more than one is returned once."""
+    if len(collections) == 1:
+        return await fetch_page(collections[0], query, limit, cursor, direction, projection)
+    query = _after(query, cursor, direction)
+    pages = await asyncio.gather(*(
+        collection.find(query, projection).sort(keyset_sort(direction)).limit(limit + 1).to_list(limit + 1)
+        for collection in collections
+    ))
+    merged = sorted(
+        (doc for page in pages for doc in page),
+        key=lambda doc: (doc["created_at"], doc["id"]), reverse=direction == DESCENDING,
+    )
+    docs: List[Dict[str, Any]] = []
+    for doc in merged:
+        if not docs or docs[-1]["id"] != doc["id"]:
+            docs.append(doc)
+        if len(docs) > limit:
+            break
+    return _trim(docs, limit)
+
+
+async def aggregate_page(collection, query, limit, cursor=None, direction=DESCENDING, stages=()):
+    """Like `fetch_page`, but runs `stages` (lookups, projections) on the page's
+    documents in the same aggregation. The stages must keep `created_at` and `id`."""
+    pipeline = [
+        {"$match": _after(query, cursor, direction)}, {"$sort": dict(keyset_sort(direction))}, {"$limit": limit + 1},
+        *stages,
+    ]
+    docs = await collection.aggregate(pipeline).to_list(limit + 1)
+    return _trim(docs, limit)
@@ -0,0 +1,50 @@
+"""Shared read filters for ideas and categories.
+
+Routes build their queries here so the soft-delete condition is always part of
+the filter and cannot be dropped or overwritten by a later clause (search used
+to replace it).
+
+Documents written before the `deleted_flag` migration have no `deleted` field
+and need the legacy `$or` shape. Once the migration has been applied every
+document carries an explicit boolean, and the plain equality below is served by
+the partial indexes declared in indexes.py.
+"""
+from typing import Any, Dict, Optional
+
+
+LIVE = {"deleted": False}
+LEGACY_LIVE = {"$or": [{"deleted": {"$exists": False}}, {"deleted": False}]}
+
+_normalized = False
+
+
+def set_normalized(normalized: bool):
+    global _normalized
+    _normalized = normalized
+
+
+def is_normalized() -> bool:
+    return _normalized
+
+
+def live_filter(**conditions: Any) -> Dict[str, Any]:
+    """Filter for documents that are not soft-deleted, plus extra equality conditions."""
+    return {**(LIVE if _normalized else LEGACY_LIVE), **conditions}
+
+
+def idea_list_query(
+    archived: Optional[bool] = None,
+    category_id: Optional[str] = None,
+    search: Optional[str] = None,
+    tag: Optional[str] = None,
+) -> Dict[str, Any]:
+    query = live_filter()
+    if archived is not None:
+        query["is_archived"] = archived
+    if category_id:
+        query["category_id"] = category_id
+    if tag:
+        query["tags"] = tag
+    if search:
+        query["$text"] = {"$search": search}
+    return query
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Production entry point: runs the API across several worker processes.
+
+Each worker is a separate uvicorn process with its own event loop and its own
+Motor client (created in main.lifespan), so throughput scales with cores.
+
+Settings (environment):
+    PORT                  listen port (default 10000)
+    WEB_CONCURRENCY       worker processes (default: number of CPUs)
+    UVICORN_LOOP          event loop implementation (default uvloop)
+    UVICORN_HTTP          HTTP parser (default httptools)
+    KEEP_ALIVE_TIMEOUT    seconds to hold idle keep-alive connections (default 5)
+    BACKLOG               listen socket backlog (default 2048)
+    FORWARDED_ALLOW_IPS   comma-separated proxy addresses whose X-Forwarded-For
+                          is trusted, or "*" (default 127.0.0.1). Rate limiting
+                          is per client only if the proxy in front is listed.
+"""
+import os
+
+import uvicorn
+
+
+def main():
+    uvicorn.run(
+        "main:app",
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", "10000")),
+        workers=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop=os.environ.get("UVICORN_LOOP", "uvloop"),
+        http=os.environ.get("UVICORN_HTTP", "httptools"),
+        timeout_keep_alive=int(os.environ.get("KEEP_ALIVE_TIMEOUT", "5")),
+        backlog=int(os.environ.get("BACKLOG", "2048")),
+        proxy_headers=True,
+        forwarded_allow_ips=os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        access_log=os.environ.get("ACCESS_LOG", "false").lower() == "true",
+    )
+
+
+if __name__ == "__main__":
+    main()
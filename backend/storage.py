@@ -0,0 +1,269 @@
+"""Storage engines behind the core category and idea routes.
+
+`Store` is what main.py's create, read, update, delete, list, search and stats
+routes call. `MongoStore` is the production engine. `SqliteStore` (in
+storage_sqlite.py) keeps everything in one SQLite file, or in memory, with
+FTS5 search, for tests and small single-node deployments that have no mongod.
+STORAGE_ENGINE picks one.
+
+The rest of the API (change feed, /sync, tag facets, batch, import/export,
+jobs, tiering, group commit) is built on Mongo features such as change
+streams, aggregation and partial indexes and stays Mongo-only. Under SQLite
+those routes answer 501.
+
+Documents go in and come out as the dicts the routes build from the models,
+without `_id`. A read returns at least the requested `fields` plus `id` and
+`created_at`, which the page cursor is built from. Cursors are the ones from
+pagination.py, so the engines can be swapped under a client.
+
+Every write to an idea increments its `version` (ideas written before
+versions existed count as version 0). Writes given an `expected_version`
+apply only if the idea is still at that version and raise VersionConflict
+otherwise; this is how If-Match works.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, ReturnDocument
+
+from compression import pack_fields, unpack_fields
+from counters import CATEGORY_DOC_PREFIX, read_stats, record_category_change, record_idea_changes
+from ingest import IDEA_WRITER
+from jobs import create_job, start_job
+from pagination import aggregate_page, fetch_page, fetch_page_across
+from queries import idea_list_query, live_filter
+from tiering import find_idea, restore, tiers
+
+Doc = Dict[str, Any]
+Page = Tuple[List[Doc], Optional[str]]
+
+
+class VersionConflict(Exception):
+    """The idea is no longer at the version the write expected."""
+
+    def __init__(self, version: int):
+        super().__init__(f"Idea is at version {version}")
+        self.version = version
+
+
+class Store:
+    """Interface of a storage engine. Methods raise ValueError for a bad cursor."""
+
+    name = ""
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def insert_category(self, doc: Doc):
+        raise NotImplementedError
+
+    async def category_exists(self, category_id: str) -> bool:
+        raise NotImplementedError
+
+    async def list_categories(self, fields: List[str], limit: int, cursor: Optional[str], with_stats: bool) -> Page:
+        """Live categories oldest first; `with_stats` adds active_ideas, archived_ideas and idea_count."""
+        raise NotImplementedError
+
+    async def delete_category(self, category_id: str, reassign_to: Optional[str]) -> Optional[Doc]:
+        """Soft-delete a category and move its ideas to `reassign_to` (or none).
+
+        Returns None if there is no such category, else extra response fields.
+        """
+        raise NotImplementedError
+
+    async def insert_idea(self, doc: Doc):
+        raise NotImplementedError
+
+    async def list_ideas(
+        self, fields: List[str], limit: int, cursor: Optional[str],
+        archived: Optional[bool] = None, category_id: Optional[str] = None, tag: Optional[str] = None,
+    ) -> Page:
+        """Live ideas newest first."""
+        raise NotImplementedError
+
+    async def search_ideas(
+        self, search: str, fields: List[str], limit: int,
+        archived: Optional[bool] = None, category_id: Optional[str] = None, tag: Optional[str] = None,
+    ) -> List[Doc]:
+        """Top `limit` live ideas by relevance, each with `score` and `content_text`."""
+        raise NotImplementedError
+
+    async def get_idea(self, idea_id: str, fields: List[str]) -> Optional[Doc]:
+        raise NotImplementedError
+
+    async def update_idea(self, idea_id: str, changes: Doc, expected_version: Optional[int] = None) -> Optional[Doc]:
+        """Apply `changes` and return the full idea as it is now, or None."""
+        raise NotImplementedError
+
+    async def delete_idea(self, idea_id: str, expected_version: Optional[int] = None) -> bool:
+        raise NotImplementedError
+
+    async def toggle_archive(self, idea_id: str, expected_version: Optional[int] = None) -> Optional[Doc]:
+        """Flip `is_archived`; returns at least the new `is_archived` and `version`, or None."""
+        raise NotImplementedError
+
+    async def stats(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+
+def version_filter(expected_version: Optional[int]) -> Dict[str, Any]:
+    if expected_version is None:
+        return {}
+    # Version 0 is an idea written before versions existed
+    return {"version": expected_version or None}
+
+
+def next_version(idea: Doc) -> int:
+    return idea.get("version", 0) + 1
+
+
+def projection_for(fields: List[str]) -> Dict[str, int]:
+    projection = {field: 1 for field in fields + ["id", "created_at"]}
+    projection["_id"] = 0
+    return projection
+
+
+class MongoStore(Store):
+    """The Mongo engine: counters, tag facets and tiering are kept up to date by every write."""
+
+    name = "mongo"
+
+    def __init__(self, db, ingest_batching: bool = False):
+        self.db = db
+        self.ingest_batching = ingest_batching
+
+    async def insert_category(self, doc: Doc):
+        await self.db.categories.insert_one(dict(doc))
+        await record_category_change(self.db, 1)
+
+    async def category_exists(self, category_id: str) -> bool:
+        return await self.db.categories.find_one(live_filter(id=category_id), {"_id": 1}) is not None
+
+    async def list_categories(self, fields, limit, cursor, with_stats):
+        query, projection = live_filter(), projection_for(fields)
+        if with_stats:
+            return await aggregate_page(
+                self.db.categories, query, limit, cursor, ASCENDING, category_stats_stages(projection))
+        return await fetch_page(self.db.categories, query, limit, cursor, ASCENDING, projection)
+
+    async def delete_category(self, category_id, reassign_to):
+        category = await self.db.categories.find_one_and_update(
+            {"id": category_id},
+            {"$set": {"deleted": True, "updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.BEFORE
+        )
+        if category is None:
+            return None
+        if not category.get("deleted"):
+            await record_category_change(self.db, -1)
+        # The category's ideas are updated in batches in the background (see jobs.py)
+        job = await create_job(self.db, "category_cascade", {"category_id": category_id, "reassign_to": reassign_to})
+        start_job(self.db, job)
+        return {"job_id": job["_id"]}
+
+    async def insert_idea(self, doc):
+        doc = pack_fields(dict(doc))  # Copied: insert_one adds `_id`
+        if self.ingest_batching:
+            await IDEA_WRITER.insert(self.db, doc)
+        else:
+            await self.db.ideas.insert_one(doc)
+            await record_idea_changes(self.db, [(None, doc)])
+
+    async def list_ideas(self, fields, limit, cursor, archived=None, category_id=None, tag=None):
+        query = idea_list_query(archived, category_id, None, tag)
+        ideas, next_cursor = await fetch_page_across(
+            tiers(self.db, archived), query, limit, cursor, projection=projection_for(fields))
+        return [unpack_fields(idea) for idea in ideas], next_cursor
+
+    async def search_ideas(self, search, fields, limit, archived=None, category_id=None, tag=None):
+        query = idea_list_query(archived, category_id, search, tag)
+        score = {"$meta": "textScore"}
+        projection = {**projection_for(fields), "content_text": 1, "score": score}
+        ideas = []
+        for collection in tiers(self.db, archived):
+            ideas += await collection.find(query, projection).sort([("score", score), ("created_at", -1)]).to_list(limit)
+        # textScore does not depend on the collection, so hits of both tiers rank together
+        ideas = sorted(ideas, key=lambda idea: (idea["score"], idea["created_at"]), reverse=True)[:limit]
+        return [unpack_fields(idea) for idea in ideas]
+
+    async def get_idea(self, idea_id, fields):
+        return unpack_fields(await find_idea(self.db, live_filter(id=idea_id), projection_for(fields)))
+
+    async def _update_hot(self, idea_id: str, update, expected_version: Optional[int]) -> Optional[Doc]:
+        """`find_one_and_update` returning the idea as it was, moving it back from the cold tier first if it is there.
+
+        One round trip unless the idea is cold or the update did not apply.
+        """
+        ideas = self.db.ideas
+        query = {"id": idea_id, **version_filter(expected_version)}
+        idea = await ideas.find_one_and_update(query, update, return_document=ReturnDocument.BEFORE)
+        if idea is not None:
+            return idea
+        # A miss caused by the version filter is a conflict, not a cold idea
+        if expected_version is not None:
+            await self._raise_conflict_if_hot(idea_id)
+        if not await restore(self.db, [idea_id]):
+            return None
+        idea = await ideas.find_one_and_update(query, update, return_document=ReturnDocument.BEFORE)
+        if idea is None and expected_version is not None:
+            await self._raise_conflict_if_hot(idea_id)
+        return idea
+
+    async def _raise_conflict_if_hot(self, idea_id: str):
+        current = await self.db.ideas.find_one({"id": idea_id}, {"_id": 0, "version": 1})
+        if current is not None:
+            raise VersionConflict(current.get("version", 0))
+
+    async def update_idea(self, idea_id, changes, expected_version=None):
+        update = {"$set": pack_fields(changes), "$inc": {"version": 1}}
+        idea = await self._update_hot(idea_id, update, expected_version)
+        if idea is None:
+            return None
+        updated = {**unpack_fields(idea), **changes, "version": next_version(idea)}
+        await record_idea_changes(self.db, [(idea, updated)])
+        return updated
+
+    async def delete_idea(self, idea_id, expected_version=None):
+        update = {"$set": {"deleted": True, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}}
+        idea = await self._update_hot(idea_id, update, expected_version)
+        if idea is None:
+            return False
+        await record_idea_changes(self.db, [(idea, {**idea, "deleted": True})])
+        return True
+
+    async def toggle_archive(self, idea_id, expected_version=None):
+        # Flipped by the server in one update, so concurrent toggles are never lost
+        update = [{"$set": {
+            "is_archived": {"$eq": [{"$ifNull": ["$is_archived", False]}, False]},
+            "updated_at": datetime.utcnow(),
+            "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+        }}]
+        idea = await self._update_hot(idea_id, update, expected_version)
+        if idea is None:
+            return None
+        toggled = {**idea, "is_archived": not idea.get("is_archived", False), "version": next_version(idea)}
+        await record_idea_changes(self.db, [(idea, toggled)])
+        return toggled
+
+    async def stats(self):
+        return await read_stats(self.db)
+
+
+def category_stats_stages(projection: Dict[str, int]) -> List[dict]:
+    """Join each category to its `category:<id>` counters document (see counters.py)."""
+    return [
+        {"$addFields": {"counter_id": {"$concat": [CATEGORY_DOC_PREFIX, "$id"]}}},
+        {"$lookup": {"from": "counters", "localField": "counter_id", "foreignField": "_id", "as": "counts"}},
+        {"$set": {"counts": {"$ifNull": [{"$first": "$counts"}, {}]}}},
+        {"$project": {
+            **projection,
+            "active_ideas": {"$ifNull": ["$counts.active_ideas", 0]},
+            "archived_ideas": {"$ifNull": ["$counts.archived_ideas", 0]},
+            "idea_count": {"$add": [
+                {"$ifNull": ["$counts.active_ideas", 0]}, {"$ifNull": ["$counts.archived_ideas", 0]},
+            ]},
+        }},
+    ]
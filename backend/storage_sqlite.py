@@ -0,0 +1,398 @@
+"""Embedded storage engine: one SQLite database file, or `:memory:`.
+
+Meant for tests, demos and single-node installs without a mongod. All
+statements run on one dedicated thread, which owns the connection, so the
+event loop never blocks on disk. Writes are serialized there as well. That is
+plenty for one API worker. With several workers on one file, SQLite's own
+locking serializes the writers (WAL mode lets readers carry on meanwhile).
+
+Search uses an FTS5 table kept next to `ideas`. It has the same columns and
+weights as the Mongo text index (title 10, tags 5, content_text 1) and ranks
+with bm25. Like the Mongo index it stems only when SEARCH_LANGUAGE is
+English (porter); the default, "none", matches whole words. Matching then
+agrees with Mongo, ranking only roughly (bm25 is not Mongo's textScore).
+The stats and per-category counts are COUNT queries, not counters documents.
+
+Timestamps are stored as fixed-width ISO strings, so they sort as text. Lists
+are stored as JSON.
+"""
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, List, Optional
+
+from content import search_terms
+from counters import format_stats
+from indexes import SEARCH_LANGUAGE
+from pagination import decode_cursor, encode_cursor
+from storage import Doc, Store, VersionConflict
+
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    color TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS categories_live_created ON categories (deleted, created_at, id);
+
+CREATE TABLE IF NOT EXISTS ideas (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    content_text TEXT,
+    excerpt TEXT,
+    word_count INTEGER,
+    links TEXT,
+    derived_version INTEGER,
+    category_id TEXT,
+    tags TEXT NOT NULL DEFAULT '[]',
+    is_archived INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS ideas_live_created ON ideas (deleted, created_at, id);
+CREATE INDEX IF NOT EXISTS ideas_live_archived_created ON ideas (deleted, is_archived, created_at, id);
+CREATE INDEX IF NOT EXISTS ideas_category_created ON ideas (category_id, created_at, id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS ideas_fts USING fts5 (
+    title, tags, content_text, tokenize = '{tokenizer}'
+);
+"""
+# Copies live ideas into the search table
+INDEX_IDEAS = (
+    "INSERT INTO ideas_fts (rowid, title, tags, content_text)"
+    " SELECT rowid, title, (SELECT group_concat(value, ' ') FROM json_each(ideas.tags)), content_text"
+    " FROM ideas WHERE deleted = 0"
+)
+# Stemming as the Mongo text index does it for SEARCH_LANGUAGE (see indexes.py)
+FTS_TOKENIZER = "porter unicode61" if SEARCH_LANGUAGE in ("english", "en") else "unicode61"
+
+CATEGORY_COLUMNS = ("id", "name", "color", "created_at", "updated_at", "deleted")
+IDEA_COLUMNS = (
+    "id", "title", "content", "content_text", "excerpt", "word_count", "links", "derived_version",
+    "category_id", "tags", "is_archived", "created_at", "updated_at", "deleted", "version",
+)
+TIME_COLUMNS = {"created_at", "updated_at"}
+JSON_COLUMNS = {"tags", "links"}
+BOOL_COLUMNS = {"is_archived", "deleted"}
+
+# bm25 weights in `ideas_fts` column order, as in indexes.py's search_text
+SEARCH_WEIGHTS = "10.0, 5.0, 1.0"
+
+
+def _encode(column: str, value: Any) -> Any:
+    if value is None:
+        return None
+    if column in TIME_COLUMNS:
+        return value.strftime(TIME_FORMAT)
+    if column in JSON_COLUMNS:
+        return json.dumps(value)
+    if column in BOOL_COLUMNS:
+        return int(bool(value))
+    return value
+
+
+def _decode(row: sqlite3.Row) -> Doc:
+    doc = {}
+    for column in row.keys():
+        value = row[column]
+        if value is not None:
+            if column in TIME_COLUMNS:
+                value = datetime.strptime(value, TIME_FORMAT)
+            elif column in JSON_COLUMNS:
+                value = json.loads(value)
+            elif column in BOOL_COLUMNS:
+                value = bool(value)
+        doc[column] = value
+    return doc
+
+
+def _columns(fields: List[str], allowed, table: str) -> str:
+    """Column list for `fields` plus the cursor keys; anything else is ignored."""
+    wanted = [field for field in dict.fromkeys(fields + ["id", "created_at"]) if field in allowed]
+    return ", ".join(f"{table}.{column}" for column in wanted)
+
+
+def _keyset(cursor: Optional[str], descending: bool, table: str):
+    """SQL condition and parameters selecting rows after `cursor`, as pagination.keyset_filter."""
+    if not cursor:
+        return None, []
+    created_at, last_id = decode_cursor(cursor)
+    created_at = _encode("created_at", created_at)
+    op = "<" if descending else ">"
+    return (f"({table}.created_at {op} ? OR ({table}.created_at = ? AND {table}.id {op} ?))",
+            [created_at, created_at, last_id])
+
+
+def _page(docs: List[Doc], limit: int):
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1])
+    return docs, None
+
+
+def _idea_filters(archived, category_id, tag):
+    conditions, params = ["ideas.deleted = 0"], []
+    if archived is not None:
+        conditions.append("ideas.is_archived = ?")
+        params.append(int(archived))
+    if category_id:
+        conditions.append("ideas.category_id = ?")
+        params.append(category_id)
+    if tag:
+        conditions.append("EXISTS (SELECT 1 FROM json_each(ideas.tags) WHERE value = ?)")
+        params.append(tag)
+    return conditions, params
+
+
+def match_expression(search: str) -> Optional[str]:
+    """FTS5 query for a `$text`-style search string: any of the words, none of the `-words`."""
+    def quoted(words):
+        return " OR ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+    terms = search_terms(search)
+    if not terms:
+        return None
+    negated = search_terms(" ".join(chunk[1:] for chunk in search.split() if chunk.startswith("-")))
+    expression = f"({quoted(terms)})"
+    if negated:
+        expression += f" NOT ({quoted(negated)})"
+    return expression
+
+
+class SqliteStore(Store):
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        if self.path != ":memory:":
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        fts = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'ideas_fts'").fetchone()
+        retokenize = fts is not None and f"'{FTS_TOKENIZER}'" not in fts["sql"]
+        if retokenize:
+            # Built with another tokenizer (SEARCH_LANGUAGE changed): rebuilt from `ideas`
+            conn.execute("DROP TABLE ideas_fts")
+        conn.executescript(SCHEMA.format(tokenizer=FTS_TOKENIZER))
+        if retokenize:
+            with conn:
+                conn.execute(INDEX_IDEAS)
+        # Databases created before ideas had a version
+        if "version" not in {row["name"] for row in conn.execute("PRAGMA table_info(ideas)")}:
+            conn.execute("ALTER TABLE ideas ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        self._conn = conn
+
+    async def start(self):
+        await self._run(self._open)
+
+    async def close(self):
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
+
+    def _data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    async def watch_commits(self, callback, interval: float):
+        """Call `callback` whenever another connection, i.e. another worker, has committed to the file.
+
+        Checks every `interval` seconds; this connection's own commits are not reported.
+        """
+        version = await self._run(self._data_version)
+        while True:
+            await asyncio.sleep(interval)
+            current = await self._run(self._data_version)
+            if current != version:
+                version = current
+                callback()
+
+    def _query(self, sql: str, params=()) -> List[Doc]:
+        return [_decode(row) for row in self._conn.execute(sql, params)]
+
+    # Categories
+
+    def _insert_category(self, doc):
+        with self._conn:
+            self._conn.execute(
+                f"INSERT INTO categories ({', '.join(CATEGORY_COLUMNS)}) VALUES ({', '.join('?' * len(CATEGORY_COLUMNS))})",
+                [_encode(column, doc.get(column)) for column in CATEGORY_COLUMNS],
+            )
+
+    async def insert_category(self, doc):
+        await self._run(self._insert_category, doc)
+
+    def _category_exists(self, category_id):
+        sql = "SELECT 1 FROM categories WHERE id = ? AND deleted = 0"
+        return self._conn.execute(sql, (category_id,)).fetchone() is not None
+
+    async def category_exists(self, category_id):
+        return await self._run(self._category_exists, category_id)
+
+    def _list_categories(self, fields, limit, cursor, with_stats):
+        conditions, params = ["categories.deleted = 0"], []
+        after, after_params = _keyset(cursor, False, "categories")
+        if after:
+            conditions.append(after)
+            params += after_params
+        columns = _columns(fields, CATEGORY_COLUMNS, "categories")
+        join = ""
+        if with_stats:
+            columns += (", COALESCE(counts.active_ideas, 0) AS active_ideas"
+                        ", COALESCE(counts.archived_ideas, 0) AS archived_ideas"
+                        ", COALESCE(counts.active_ideas + counts.archived_ideas, 0) AS idea_count")
+            join = ("LEFT JOIN (SELECT category_id, SUM(is_archived = 0) AS active_ideas,"
+                    " SUM(is_archived = 1) AS archived_ideas FROM ideas WHERE deleted = 0 GROUP BY category_id)"
+                    " AS counts ON counts.category_id = categories.id")
+        sql = (f"SELECT {columns} FROM categories {join} WHERE {' AND '.join(conditions)}"
+               " ORDER BY categories.created_at, categories.id LIMIT ?")
+        return _page(self._query(sql, params + [limit + 1]), limit)
+
+    async def list_categories(self, fields, limit, cursor, with_stats):
+        return await self._run(self._list_categories, fields, limit, cursor, with_stats)
+
+    def _delete_category(self, category_id, reassign_to):
+        now = _encode("updated_at", datetime.utcnow())
+        with self._conn:
+            deleted = self._conn.execute(
+                "UPDATE categories SET deleted = 1, updated_at = ? WHERE id = ?", (now, category_id)).rowcount
+            if not deleted:
+                return None
+            # Soft-deleted ideas keep their old reference, as in the Mongo cascade job
+            self._conn.execute(
+                "UPDATE ideas SET category_id = ?, updated_at = ?, version = version + 1"
+                " WHERE category_id = ? AND deleted = 0",
+                (reassign_to, now, category_id),
+            )
+        return {}
+
+    async def delete_category(self, category_id, reassign_to):
+        return await self._run(self._delete_category, category_id, reassign_to)
+
+    # Ideas
+
+    def _index_idea(self, idea_id):
+        self._conn.execute("DELETE FROM ideas_fts WHERE rowid = (SELECT rowid FROM ideas WHERE id = ?)", (idea_id,))
+        self._conn.execute(INDEX_IDEAS + " AND id = ?", (idea_id,))
+
+    def _insert_idea(self, doc):
+        with self._conn:
+            self._conn.execute(
+                f"INSERT INTO ideas ({', '.join(IDEA_COLUMNS)}) VALUES ({', '.join('?' * len(IDEA_COLUMNS))})",
+                [_encode(column, doc.get(column)) for column in IDEA_COLUMNS],
+            )
+            self._index_idea(doc["id"])
+
+    async def insert_idea(self, doc):
+        await self._run(self._insert_idea, doc)
+
+    def _list_ideas(self, fields, limit, cursor, archived, category_id, tag):
+        conditions, params = _idea_filters(archived, category_id, tag)
+        after, after_params = _keyset(cursor, True, "ideas")
+        if after:
+            conditions.append(after)
+            params += after_params
+        sql = (f"SELECT {_columns(fields, IDEA_COLUMNS, 'ideas')} FROM ideas WHERE {' AND '.join(conditions)}"
+               " ORDER BY ideas.created_at DESC, ideas.id DESC LIMIT ?")
+        return _page(self._query(sql, params + [limit + 1]), limit)
+
+    async def list_ideas(self, fields, limit, cursor, archived=None, category_id=None, tag=None):
+        return await self._run(self._list_ideas, fields, limit, cursor, archived, category_id, tag)
+
+    def _search_ideas(self, search, fields, limit, archived, category_id, tag):
+        expression = match_expression(search)
+        if expression is None:
+            return []
+        conditions, params = _idea_filters(archived, category_id, tag)
+        columns = _columns(fields + ["content_text"], IDEA_COLUMNS, "ideas")
+        sql = (f"SELECT {columns}, -bm25(ideas_fts, {SEARCH_WEIGHTS}) AS score"
+               " FROM ideas_fts JOIN ideas ON ideas.rowid = ideas_fts.rowid"
+               f" WHERE ideas_fts MATCH ? AND {' AND '.join(conditions)}"
+               " ORDER BY score DESC, ideas.created_at DESC LIMIT ?")
+        return self._query(sql, [expression] + params + [limit])
+
+    async def search_ideas(self, search, fields, limit, archived=None, category_id=None, tag=None):
+        return await self._run(self._search_ideas, search, fields, limit, archived, category_id, tag)
+
+    def _get_idea(self, idea_id, fields):
+        sql = f"SELECT {_columns(fields, IDEA_COLUMNS, 'ideas')} FROM ideas WHERE id = ? AND deleted = 0"
+        ideas = self._query(sql, (idea_id,))
+        return ideas[0] if ideas else None
+
+    async def get_idea(self, idea_id, fields):
+        return await self._run(self._get_idea, idea_id, fields)
+
+    def _update_idea(self, idea_id, changes, expected_version):
+        changes = {column: value for column, value in changes.items() if column in IDEA_COLUMNS and column != "version"}
+        # Guarded in the UPDATE itself, as in _toggle_archive, so a write committed
+        # by another process sharing the file cannot slip in after a check
+        with self._conn:
+            rows = self._query(
+                f"UPDATE ideas SET {''.join(f'{column} = ?, ' for column in changes)}version = version + 1"
+                f" WHERE id = ? AND (? IS NULL OR version = ?) RETURNING {', '.join(IDEA_COLUMNS)}",
+                [_encode(column, value) for column, value in changes.items()]
+                + [idea_id, expected_version, expected_version],
+            )
+            if not rows:
+                if expected_version is not None:
+                    self._raise_conflict_if_exists(idea_id)
+                return None
+            self._index_idea(idea_id)
+        return rows[0]
+
+    def _raise_conflict_if_exists(self, idea_id):
+        current = self._conn.execute("SELECT version FROM ideas WHERE id = ?", (idea_id,)).fetchone()
+        if current is not None:
+            raise VersionConflict(current[0])
+
+    async def update_idea(self, idea_id, changes, expected_version=None):
+        return await self._run(self._update_idea, idea_id, changes, expected_version)
+
+    async def delete_idea(self, idea_id, expected_version=None):
+        changes = {"deleted": True, "updated_at": datetime.utcnow()}
+        return await self.update_idea(idea_id, changes, expected_version) is not None
+
+    def _toggle_archive(self, idea_id, expected_version):
+        with self._conn:
+            row = self._conn.execute(
+                "UPDATE ideas SET is_archived = NOT is_archived, updated_at = ?, version = version + 1"
+                " WHERE id = ? AND (? IS NULL OR version = ?) RETURNING is_archived, version",
+                (_encode("updated_at", datetime.utcnow()), idea_id, expected_version, expected_version),
+            ).fetchone()
+            if row is None and expected_version is not None:
+                self._raise_conflict_if_exists(idea_id)
+        return None if row is None else {"id": idea_id, "is_archived": bool(row[0]), "version": row[1]}
+
+    async def toggle_archive(self, idea_id, expected_version=None):
+        return await self._run(self._toggle_archive, idea_id, expected_version)
+
+    def _stats(self):
+        ideas = self._conn.execute(
+            "SELECT COALESCE(SUM(is_archived = 0), 0), COALESCE(SUM(is_archived = 1), 0) FROM ideas WHERE deleted = 0"
+        ).fetchone()
+        categories = self._conn.execute("SELECT COUNT(*) FROM categories WHERE deleted = 0").fetchone()
+        return format_stats({
+            "active_ideas": ideas[0], "archived_ideas": ideas[1], "total_categories": categories[0],
+        })
+
+    async def stats(self):
+        return await self._run(self._stats)
@@ -0,0 +1,155 @@
+"""Incremental sync over `updated_at`: what changed since a server-issued watermark.
+
+A watermark is an opaque token holding a keyset position in (updated_at, id)
+order for each synced collection. GET /api/sync returns the documents after
+it, with soft-deleted ones as tombstones, and a new watermark to send next
+time. Without a watermark it returns every live document, so the same loop
+serves a first load.
+
+`updated_at` is stamped by the API workers, so a write can commit after a
+later-stamped one. Once a collection is caught up its position moves to
+`SYNC_LAG` behind the current time; the changes inside that window are sent
+again on the next call, and applying them twice is harmless.
+
+A collection split across tiers (see tiering.py) is read from every tier.
+Once deleted documents are purged, a client that was last caught up longer
+ago than the retention age may have missed tombstones, and its watermark is
+refused with `WatermarkExpired`. That time is kept in the watermark next to
+the position: a position can lag far behind it while a client pages through
+old documents, and a caught-up position is the time itself.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING
+
+from compression import unpack_fields
+from queries import live_filter
+
+
+SYNC_LAG = timedelta(seconds=5)
+SYNC_SORT = [("updated_at", ASCENDING), ("id", ASCENDING)]
+
+Position = Tuple[datetime, str]
+
+
+class WatermarkExpired(ValueError):
+    """The watermark predates purged tombstones; the client has to reload everything."""
+
+
+def encode_watermark(positions: Dict[str, Position], synced: Optional[Dict[str, datetime]] = None) -> str:
+    """`synced` is when the client was last caught up per collection; it defaults to the position."""
+    payload = {}
+    for collection, (updated_at, last_id) in positions.items():
+        payload[collection] = [updated_at.isoformat(), last_id]
+        if synced and synced.get(collection, updated_at) != updated_at:
+            payload[collection].append(synced[collection].isoformat())
+    encoded = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(encoded.encode()).decode().rstrip("=")
+
+
+def _decode(token: str) -> Tuple[Dict[str, Position], Dict[str, datetime]]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        positions, synced = {}, {}
+        for collection, (updated_at, last_id, *rest) in json.loads(base64.urlsafe_b64decode(padded)).items():
+            positions[str(collection)] = (datetime.fromisoformat(updated_at), str(last_id))
+            synced[str(collection)] = datetime.fromisoformat(rest[0]) if rest else positions[str(collection)][0]
+        return positions, synced
+    except (AttributeError, TypeError, ValueError) as exc:
+        raise ValueError("Invalid watermark") from exc
+
+
+def decode_watermark(token: str) -> Dict[str, Position]:
+    """Raises ValueError for anything that was not produced by `encode_watermark`."""
+    return _decode(token)[0]
+
+
+def current_watermark(collections) -> str:
+    """Watermark for "now", e.g. for a client that has just loaded everything."""
+    floor = datetime.utcnow() - SYNC_LAG
+    return encode_watermark({collection: (floor, "") for collection in collections})
+
+
+def sync_after(position: Position) -> Dict[str, Any]:
+    updated_at, last_id = position
+    return {"$or": [
+        {"updated_at": {"$gt": updated_at}},
+        {"updated_at": updated_at, "id": {"$gt": last_id}},
+    ]}
+
+
+async def _read_changes(collections, query, projection, limit: int) -> List[Dict[str, Any]]:
+    pages = [
+        await collection.find(query, projection).sort(SYNC_SORT).limit(limit + 1).to_list(limit + 1)
+        for collection in collections
+    ]
+    if len(pages) == 1:
+        return pages[0]
+    docs: List[Dict[str, Any]] = []
+    for doc in sorted((doc for page in pages for doc in page), key=lambda doc: (doc["updated_at"], doc["id"])):
+        if not docs or docs[-1]["id"] != doc["id"]:
+            docs.append(doc)
+    return docs[:limit + 1]
+
+
+async def changes_since(
+    db,
+    since: Optional[str],
+    fields: Dict[str, List[str]],
+    limit: int,
+    tiers: Optional[Dict[str, List[str]]] = None,
+    max_age: Optional[timedelta] = None,
+) -> Dict[str, Any]:
+    """Up to `limit` changes per collection after the watermark `since`.
+
+    `tiers` maps a collection to the collections it is split across. With
+    `max_age`, a watermark whose client was last caught up longer ago than
+    that raises WatermarkExpired.
+    `has_more` is set when any collection was cut off; call again with the
+    returned watermark until it is false.
+    """
+    positions, synced = _decode(since) if since else ({}, {})
+    floor = datetime.utcnow() - SYNC_LAG
+    if max_age is not None and any(caught_up < floor - max_age for caught_up in synced.values()):
+        raise WatermarkExpired("Watermark expired")
+    result: Dict[str, Any] = {}
+    next_positions: Dict[str, Position] = {}
+    next_synced: Dict[str, datetime] = {}
+    has_more = False
+
+    for collection, output_fields in fields.items():
+        position = positions.get(collection)
+        # A first sync needs no tombstones for documents the client never had
+        query = live_filter() if position is None else sync_after(position)
+        projection = {field: 1 for field in output_fields + ["id", "updated_at", "deleted"]}
+        projection["_id"] = 0
+        sources = [db[name] for name in (tiers or {}).get(collection, [collection])]
+        docs = await _read_changes(sources, query, projection, limit)
+
+        if len(docs) > limit:
+            docs = docs[:limit]
+            has_more = True
+            next_positions[collection] = (docs[-1]["updated_at"], docs[-1]["id"])
+            # A first load counts from its first page
+            next_synced[collection] = synced.get(collection, floor)
+        else:
+            # Caught up: everything up to `floor` has been returned, so the
+            # position moves there even if the collection has not been written
+            # for longer than `max_age`
+            next_positions[collection] = (floor, "")
+            next_synced[collection] = floor
+
+        changed, deleted = [], []
+        for doc in docs:
+            if doc.get("deleted"):
+                deleted.append({"id": doc["id"], "updated_at": doc["updated_at"]})
+            else:
+                changed.append(unpack_fields({field: doc[field] for field in output_fields if field in doc}))
+        result[collection] = {"changed": changed, "deleted": deleted}
+
+    result["watermark"] = encode_watermark(next_positions, next_synced)
+    result["has_more"] = has_more
+    return result
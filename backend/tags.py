@@ -0,0 +1,130 @@
+"""Tag facets behind GET /api/tags, maintained incrementally on writes.
+
+`tag_counts` holds one document per (tag, category, archived) bucket with the
+number of live ideas in it. Write paths report (before, after) idea pairs
+through counters.record_idea_changes, and the bucket deltas are applied with
+one unordered bulk `$inc`. Listing tags, with or without a category or
+archived filter, sums the buckets; there are far fewer buckets than ideas.
+
+Each bucket also stores `key`, the lowercased tag, so a case-insensitive
+prefix query is an anchored regex served by the `key` index.
+"""
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from queries import live_filter
+from tiering import COLD
+
+
+Bucket = Tuple[str, Optional[str], bool]
+
+
+def idea_buckets(doc: Optional[Dict[str, Any]]) -> List[Bucket]:
+    """Buckets a live idea counts towards; none if it is missing or deleted."""
+    if not doc or doc.get("deleted"):
+        return []
+    category_id, archived = doc.get("category_id"), bool(doc.get("is_archived"))
+    return [(tag, category_id, archived) for tag in set(doc.get("tags") or [])]
+
+
+def tag_deltas(changes: Iterable[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]) -> Counter:
+    deltas = Counter()
+    for before, after in changes:
+        deltas.subtract(idea_buckets(before))
+        deltas.update(idea_buckets(after))
+    return deltas
+
+
+def bucket_id(tag: str, category_id: Optional[str], archived: bool) -> Dict[str, Any]:
+    # Field order matters for equality on an embedded _id document
+    return {"tag": tag, "category_id": category_id, "archived": archived}
+
+
+def bucket_update(bucket: Bucket, delta: int) -> UpdateOne:
+    tag, category_id, archived = bucket
+    return UpdateOne(
+        {"_id": bucket_id(tag, category_id, archived)},
+        {"$inc": {"count": delta},
+         "$setOnInsert": {"tag": tag, "key": tag.lower(), "category_id": category_id, "archived": archived}},
+        upsert=True,
+    )
+
+
+async def apply_tag_deltas(db, deltas: Dict[Bucket, int]):
+    requests = [bucket_update(bucket, delta) for bucket, delta in deltas.items() if delta]
+    if requests:
+        await db.tag_counts.bulk_write(requests, ordered=False)
+
+
+async def rebuild_tag_counts(db) -> int:
+    """Recount every bucket from the ideas collection; returns the number of buckets.
+
+    Like counters.reconcile, writes that land while it runs can leave counts
+    slightly off.
+    """
+    pipeline = [
+        {"$match": {**live_filter(), "tags.0": {"$exists": True}}},
+        {"$unionWith": {"coll": COLD, "pipeline": [{"$match": {**live_filter(), "tags.0": {"$exists": True}}}]}},
+        {"$project": {
+            "_id": 0,
+            "tags": {"$setUnion": ["$tags", []]},
+            "category_id": {"$ifNull": ["$category_id", None]},
+            "archived": {"$eq": ["$is_archived", True]},
+        }},
+        {"$unwind": "$tags"},
+        {"$group": {"_id": {"tag": "$tags", "category_id": "$category_id", "archived": "$archived"}, "count": {"$sum": 1}}},
+    ]
+    counts = {
+        (row["_id"]["tag"], row["_id"]["category_id"], row["_id"]["archived"]): row["count"]
+        async for row in db.ideas.aggregate(pipeline)
+    }
+    # Upserted and pruned rather than cleared and reinserted, so concurrent
+    # rebuilds (every worker runs ensure_tag_counts) and bucket upserts by
+    # writes meanwhile cannot collide on `_id`
+    ids = [bucket_id(*bucket) for bucket in counts]
+    if counts:
+        await db.tag_counts.bulk_write([
+            UpdateOne({"_id": _id}, {"$set": {
+                "tag": bucket[0], "key": bucket[0].lower(), "category_id": bucket[1],
+                "archived": bucket[2], "count": count,
+            }}, upsert=True)
+            for _id, (bucket, count) in zip(ids, counts.items())
+        ], ordered=False)
+    await db.tag_counts.delete_many({"_id": {"$nin": ids}})
+    return len(counts)
+
+
+async def ensure_tag_counts(db):
+    """Build the tag counts on startup for a database that predates them (see counters.ensure_counters)."""
+    if await db.tag_counts.find_one({}, {"_id": 1}) is not None:
+        return
+    if await db.ideas.find_one({"tags.0": {"$exists": True}}, {"_id": 1}):
+        await rebuild_tag_counts(db)
+
+
+async def tag_facets(
+    db,
+    category_id: Optional[str] = None,
+    archived: Optional[bool] = None,
+    prefix: Optional[str] = None,
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
+    """Tags with their live idea counts, most used first."""
+    match: Dict[str, Any] = {"count": {"$gt": 0}}
+    if prefix:
+        match["key"] = {"$regex": "^" + re.escape(prefix.lower())}
+    if category_id:
+        match["category_id"] = category_id
+    if archived is not None:
+        match["archived"] = archived
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": "$tag", "count": {"$sum": "$count"}}},
+        {"$sort": {"count": DESCENDING, "_id": ASCENDING}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "tag": "$_id", "count": 1}},
+    ]
+    return await db.tag_counts.aggregate(pipeline).to_list(limit)
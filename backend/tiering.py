@@ -0,0 +1,158 @@
+"""Hot/cold tiering of ideas.
+
+Archived and soft-deleted ideas are moved out of `ideas` into `ideas_archive`
+by `move_cold`, so the hot collection and its indexes hold little more than
+what the default (active) list reads. Both tiers hold the same documents and
+carry the same list indexes.
+
+- Reads that can return archived or deleted ideas (`archived` not false,
+  a single idea, /sync, export) query both tiers and merge.
+- Writes only go to `ideas`. A write whose idea is not there calls
+  `restore`, which moves the idea back, and retries; if the idea stays archived it is moved
+  out again later.
+- Counters and tag facets count both tiers, so moving an idea changes none
+  of them and is not a change-feed event.
+
+A document is copied into its new tier before it is removed from the old one,
+so for a moment it can be in both; reads drop the second copy by id. Removing
+it from `ideas` is guarded by `updated_at`, so a write that lands mid-move
+wins and the cold copy is dropped instead.
+
+`purge_deleted` hard-deletes ideas soft-deleted longer ago than the retention
+age from both tiers. A /sync watermark older than that has missed their
+tombstones, so /sync answers it with 410 and the client reloads.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING, DeleteOne, ReplaceOne, UpdateOne
+
+from leases import hold_lease
+
+
+logger = logging.getLogger(__name__)
+
+HOT = "ideas"
+COLD = "ideas_archive"
+TIERS = (HOT, COLD)
+# Hot ideas that belong in the cold tier, one query per partial index (see indexes.py)
+COLD_CANDIDATES = ({"is_archived": True}, {"deleted": True})
+TIERING_LEASE = "tiering"
+
+
+def tiers(db, archived: Optional[bool] = None) -> List[Any]:
+    """Collections a read of ideas with this `archived` filter has to query."""
+    if archived is False:
+        return [db[HOT]]
+    return [db[name] for name in TIERS]
+
+
+async def find_idea(db, query: Dict[str, Any], projection=None) -> Optional[Dict[str, Any]]:
+    """First idea matching `query`, looking in the hot tier first."""
+    for collection in tiers(db):
+        doc = await collection.find_one(query, projection)
+        if doc is not None:
+            return doc
+    return None
+
+
+async def stream_tiers(db, query: Dict[str, Any], projection=None, batch_size: int = 1000):
+    """Every idea matching `query` from both tiers, hot first.
+
+    An idea being moved at that moment can appear twice.
+    """
+    for collection in tiers(db):
+        async for doc in collection.find(query, projection).batch_size(batch_size):
+            yield doc
+
+
+async def restore(db, idea_ids: Iterable[str]) -> int:
+    """Move cold ideas back to the hot tier so they can be written; returns how many moved.
+
+    A hot copy that already exists is newer (only the hot tier is written), so
+    it is never overwritten. The cold copy is removed only if it is still the
+    one that was read, as in `_move_batch`.
+    """
+    docs = await db[COLD].find({"id": {"$in": list(idea_ids)}}).to_list(None)
+    if not docs:
+        return 0
+    await db[HOT].bulk_write([
+        UpdateOne({"_id": doc["_id"]}, {"$setOnInsert": doc}, upsert=True) for doc in docs
+    ], ordered=False)
+    await db[COLD].bulk_write([
+        DeleteOne({"_id": doc["_id"], "updated_at": doc.get("updated_at")}) for doc in docs
+    ], ordered=False)
+    return len(docs)
+
+
+async def _move_batch(db, docs: List[Dict[str, Any]]) -> int:
+    await db[COLD].bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs], ordered=False)
+    result = await db[HOT].bulk_write(
+        [DeleteOne({"_id": doc["_id"], "updated_at": doc["updated_at"]}) for doc in docs], ordered=False
+    )
+    if result.deleted_count < len(docs):
+        # Written while being moved: the hot copy is newer, drop the cold one
+        changed = await db[HOT].find({"_id": {"$in": [doc["_id"] for doc in docs]}}, {"_id": 1}).to_list(None)
+        if changed:
+            stale = {doc["_id"] for doc in changed}
+            await db[COLD].bulk_write([
+                DeleteOne({"_id": doc["_id"], "updated_at": doc["updated_at"]}) for doc in docs if doc["_id"] in stale
+            ], ordered=False)
+    return result.deleted_count
+
+
+async def move_cold(db, older_than: timedelta, batch_size: int = 500, pause: float = 0.05, progress=None) -> int:
+    """Move archived and deleted ideas not written for `older_than` to the cold tier."""
+    cutoff = datetime.utcnow() - older_than
+    moved = 0
+    for candidate in COLD_CANDIDATES:
+        query = {**candidate, "updated_at": {"$lt": cutoff}}
+        while True:
+            batch = await db[HOT].find(query).sort("updated_at", ASCENDING).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+            moved += await _move_batch(db, batch)
+            if progress:
+                progress(moved)
+            if len(batch) < batch_size:
+                break
+            await asyncio.sleep(pause)
+    return moved
+
+
+async def purge_deleted(db, older_than: timedelta) -> int:
+    """Hard-delete ideas soft-deleted more than `older_than` ago, from both tiers."""
+    query = {"deleted": True, "updated_at": {"$lt": datetime.utcnow() - older_than}}
+    purged = 0
+    for collection in tiers(db):
+        purged += (await collection.delete_many(query)).deleted_count
+    return purged
+
+
+async def _tiering_pass(db, tier_after: Optional[timedelta], purge_after: Optional[timedelta]):
+    if tier_after is not None:
+        moved = await move_cold(db, tier_after)
+        if moved:
+            logger.info("Moved %d ideas to the cold tier", moved)
+    if purge_after is not None:
+        purged = await purge_deleted(db, purge_after)
+        if purged:
+            logger.info("Purged %d deleted ideas", purged)
+
+
+async def run_tiering(db, tier_after: Optional[timedelta], purge_after: Optional[timedelta], interval: float = 300.0):
+    """Move and purge every `interval` seconds; either step is off when its age is None.
+
+    A pass runs under the TIERING_LEASE lease, so workers that start one
+    while another is running skip it instead of moving the same batches.
+    """
+    while True:
+        try:
+            async with hold_lease(db, TIERING_LEASE) as held:
+                if held:
+                    await _tiering_pass(db, tier_after, purge_after)
+        except Exception:
+            logger.exception("Tiering pass failed")
+        await asyncio.sleep(interval)
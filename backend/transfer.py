@@ -0,0 +1,184 @@
+"""Streaming NDJSON/CSV export and import.
+
+Exports walk a Motor cursor in batches and yield encoded chunks, so a
+StreamingResponse can send any number of documents in constant memory.
+Imports decode the request body incrementally and write it back with batched
+`insert_many` calls.
+"""
+import codecs
+import csv
+import io
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+import orjson
+from pymongo.errors import BulkWriteError
+
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+# CSV cells that hold JSON (lists) rather than plain text
+CSV_JSON_FIELDS = {"tags"}
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return orjson.dumps(value).decode()
+    return value
+
+
+async def export_stream(cursor, fmt: str, fields: List[str], chunk_docs: int = 500) -> AsyncIterator[bytes]:
+    """Encode the documents of `cursor` as NDJSON or CSV, `chunk_docs` per yielded chunk."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        pending = 0
+        async for doc in cursor:
+            writer.writerow([_csv_cell(doc.get(field)) for field in fields])
+            pending += 1
+            if pending >= chunk_docs:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        yield buffer.getvalue().encode()
+    else:
+        chunk = []
+        async for doc in cursor:
+            chunk.append(orjson.dumps(doc, option=orjson.OPT_APPEND_NEWLINE))
+            if len(chunk) >= chunk_docs:
+                yield b"".join(chunk)
+                chunk = []
+        if chunk:
+            yield b"".join(chunk)
+
+
+async def _lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in stream:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def read_records(stream: AsyncIterator[bytes], fmt: str, nullable: Iterable[str] = ()) -> AsyncIterator[Dict[str, Any]]:
+    """Parse NDJSON or CSV records from a byte stream as they arrive.
+
+    Raises ValueError with the record number for malformed input.
+    """
+    number = 0
+    if fmt == "csv":
+        header = None
+        record_lines = []
+        async for line in _lines(stream):
+            record_lines.append(line)
+            # A record is complete once its quotes balance; escaped quotes come in pairs
+            if sum(part.count('"') for part in record_lines) % 2:
+                continue
+            text = "\n".join(record_lines)
+            record_lines = []
+            if not text.strip():
+                continue
+            row = next(csv.reader([text]))
+            if header is None:
+                header = row
+                continue
+            number += 1
+            if len(row) != len(header):
+                raise ValueError(f"Record {number}: expected {len(header)} columns, got {len(row)}")
+            record = dict(zip(header, row))
+            for field in CSV_JSON_FIELDS & record.keys():
+                try:
+                    record[field] = orjson.loads(record[field]) if record[field] else []
+                except orjson.JSONDecodeError as exc:
+                    raise ValueError(f"Record {number}: invalid {field}") from exc
+            for field in nullable:
+                if record.get(field) == "":
+                    record[field] = None
+            yield record
+        if record_lines:
+            raise ValueError(f"Record {number + 1}: unterminated quoted field")
+    else:
+        async for line in _lines(stream):
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError as exc:
+                raise ValueError(f"Record {number}: invalid JSON") from exc
+            if not isinstance(record, dict):
+                raise ValueError(f"Record {number}: expected an object")
+            yield record
+
+
+async def import_records(
+    collection,
+    records: AsyncIterator[Dict[str, Any]],
+    to_document: Callable[[Dict[str, Any]], Dict[str, Any]],
+    batch_size: int = 1000,
+    on_inserted: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+    max_errors: int = 20,
+    prepare: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+) -> Dict[str, Any]:
+    """Insert records in unordered `insert_many` batches and return a summary.
+
+    `to_document` validates a record and returns the document to store; it may
+    raise ValueError to reject a single record. `prepare` is awaited with each
+    batch before it is written and may complete its documents in place.
+    `on_inserted` is awaited with the documents of each batch that were
+    actually written.
+    """
+    summary = {"inserted": 0, "failed": 0, "errors": []}
+
+    def fail(message):
+        summary["failed"] += 1
+        if len(summary["errors"]) < max_errors:
+            summary["errors"].append(message)
+
+    async def flush(batch):
+        if prepare:
+            await prepare(batch)
+        written = batch
+        try:
+            await collection.insert_many(batch, ordered=False)
+        except BulkWriteError as exc:
+            failed = {error["index"] for error in exc.details.get("writeErrors", [])}
+            for error in exc.details.get("writeErrors", []):
+                fail(f"{batch[error['index']].get('id')}: {error.get('errmsg')}")
+            written = [doc for i, doc in enumerate(batch) if i not in failed]
+        summary["inserted"] += len(written)
+        if on_inserted and written:
+            await on_inserted(written)
+
+    batch = []
+    number = 0
+    try:
+        async for record in records:
+            number += 1
+            try:
+                batch.append(to_document(record))
+            except ValueError as exc:
+                fail(f"Record {number}: {exc}")
+                continue
+            if len(batch) >= batch_size:
+                await flush(batch)
+                batch = []
+    except ValueError as exc:
+        # Malformed input stops the import; records before it are still written
+        summary["aborted"] = str(exc)
+    if batch:
+        await flush(batch)
+    return summary
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Batch API throughput benchmark for the Idea Logger backend.
+Creates, archives and deletes N ideas once by looping the single-item
+endpoints and once through POST /api/ideas/batch, and reports ideas/second.
+
+Usage: python benchmarks/batch_benchmark.py [--base-url http://localhost:8000/api] [--count 2000]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import requests
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def idea_payload(i):
+    return {"title": f"Benchmark idea {i}", "content": f"<p>Benchmark body {i}</p>", "tags": ["benchmark"]}
+
+
+def run_single(session, base_url, count):
+    ids = []
+
+    def create():
+        for i in range(count):
+            response = session.post(f"{base_url}/ideas", json=idea_payload(i))
+            response.raise_for_status()
+            ids.append(response.json()["id"])
+
+    def archive():
+        for idea_id in ids:
+            session.patch(f"{base_url}/ideas/{idea_id}/archive").raise_for_status()
+
+    def delete():
+        for idea_id in ids:
+            session.delete(f"{base_url}/ideas/{idea_id}").raise_for_status()
+
+    return {"create": timed(create), "archive": timed(archive), "delete": timed(delete)}
+
+
+def run_batch(session, base_url, count, batch_size):
+    ids = []
+
+    def send(operations):
+        response = session.post(f"{base_url}/ideas/batch", json={"operations": operations})
+        response.raise_for_status()
+        body = response.json()
+        if body["failed"]:
+            raise RuntimeError(f"{body['failed']} batch items failed")
+        return body["results"]
+
+    def in_batches(items):
+        for start in range(0, len(items), batch_size):
+            yield items[start:start + batch_size]
+
+    def create():
+        for chunk in in_batches(list(range(count))):
+            results = send([{"op": "create", "idea": idea_payload(i)} for i in chunk])
+            ids.extend(result["id"] for result in results)
+
+    def archive():
+        for chunk in in_batches(ids):
+            send([{"op": "archive", "id": idea_id} for idea_id in chunk])
+
+    def delete():
+        for chunk in in_batches(ids):
+            send([{"op": "delete", "id": idea_id} for idea_id in chunk])
+
+    return {"create": timed(create), "archive": timed(archive), "delete": timed(delete)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api")
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    session = requests.Session()
+    print(f"🚀 Batch benchmark against {args.base_url} with {args.count} ideas")
+    single = run_single(session, args.base_url, args.count)
+    batch = run_batch(session, args.base_url, args.count, args.batch_size)
+
+    results = []
+    for phase in ("create", "archive", "delete"):
+        row = {
+            "phase": phase,
+            "single_ideas_per_s": round(args.count / single[phase], 1),
+            "batch_ideas_per_s": round(args.count / batch[phase], 1),
+        }
+        row["speedup"] = round(row["batch_ideas_per_s"] / row["single_ideas_per_s"], 1)
+        results.append(row)
+        print(f"  {phase:<8} | single {row['single_ideas_per_s']:>9}/s | batch {row['batch_ideas_per_s']:>9}/s | x{row['speedup']}")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
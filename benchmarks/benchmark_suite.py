@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the Idea Logger backend: per-endpoint throughput and
+p50/p95/p99 latency under read-only, mixed and write-heavy workloads at
+several data sizes.
+
+For each size it starts backend/serve.py on localhost against a fresh
+database, seeds that many ideas across a few categories and tags, and runs
+every workload for --duration seconds. The database is MONGO_URL, or with
+--mongod a throwaway mongod on a temporary dbpath (under /dev/shm when it
+exists, so it lives in memory) that is removed afterwards. --engine sqlite
+runs the server with STORAGE_ENGINE=sqlite on a temporary SQLite file
+instead; the Mongo-only routes (batch, tag facets) are left out of the
+workloads and the seeding uses POST /api/ideas.
+
+--json writes the results as a baseline; --compare reads a previous one and
+reports per-endpoint changes, exiting 1 when an endpoint's throughput drops
+or its p95/p99 grows by more than --threshold.
+
+Usage:
+    python benchmarks/benchmark_suite.py --mongod --sizes 1000,10000 --json baseline.json
+    python benchmarks/benchmark_suite.py --mongod --sizes 1000,10000 --compare baseline.json
+    python benchmarks/benchmark_suite.py --engine sqlite --sizes 1000
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import requests
+from pymongo import MongoClient
+
+from load_test import create_ideas, start_server
+from loadgen import run_load
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+WORDS = (
+    "idea product market user growth design research learning platform community data "
+    "mobile service network energy health travel finance music video game garden city "
+    "school robot cloud privacy security search vector graph budget launch feedback"
+).split()
+TAGS = [f"tag{i}" for i in range(40)]
+CATEGORIES = 8
+SEED_BATCH = 1000
+# Share of write requests in each workload
+WORKLOADS = {"read": 0.0, "mixed": 0.1, "write-heavy": 0.5}
+# Distinct requests per workload; the load generator cycles through them
+TARGETS_PER_WORKLOAD = 500
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms")
+# Routes answered with 501 under STORAGE_ENGINE=sqlite
+MONGO_ONLY = {"GET /tags", "POST /ideas/batch"}
+
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def new_idea(rng, category_ids):
+    return {
+        "title": words(rng, 4).capitalize(),
+        "content": f"<p>{words(rng, 40)}</p><p>{words(rng, 40)}</p>",
+        "category_id": rng.choice(category_ids),
+        "tags": rng.sample(TAGS, 2),
+    }
+
+
+def seed(base_url, size, rng, engine):
+    """Create the categories and `size` ideas; returns (idea ids, category ids)."""
+    category_ids = [
+        requests.post(f"{base_url}/api/categories", json={"name": f"Category {i}"}).json()["id"]
+        for i in range(CATEGORIES)
+    ]
+    idea_ids = create_ideas(base_url, [new_idea(rng, category_ids) for _ in range(size)], SEED_BATCH)
+    # Archive a tenth so the archived filters have something to read
+    if engine == "sqlite":
+        for idea_id in idea_ids[::10]:
+            requests.patch(f"{base_url}/api/ideas/{idea_id}/archive").raise_for_status()
+        return idea_ids, category_ids
+    archive = [{"op": "archive", "id": idea_id} for idea_id in idea_ids[::10]]
+    for start in range(0, len(archive), SEED_BATCH):
+        requests.post(f"{base_url}/api/ideas/batch", json={"operations": archive[start:start + SEED_BATCH]})
+    return idea_ids, category_ids
+
+
+def served(targets, engine):
+    return [target for target in targets if engine == "mongo" or target[3] not in MONGO_ONLY]
+
+
+def read_target(rng, idea_ids, category_ids, engine):
+    return rng.choice(served([
+        ("GET", "/api/ideas?view=summary&limit=20&archived=false", None, "GET /ideas"),
+        ("GET", "/api/ideas?view=summary&limit=20&archived=true", None, "GET /ideas?archived=true"),
+        ("GET", f"/api/ideas?view=summary&limit=20&archived=false&category_id={rng.choice(category_ids)}", None,
+         "GET /ideas?category_id"),
+        ("GET", f"/api/ideas?view=summary&limit=20&tag={rng.choice(TAGS)}", None, "GET /ideas?tag"),
+        ("GET", f"/api/ideas?search={rng.choice(WORDS)}&limit=20", None, "GET /ideas?search"),
+        ("GET", f"/api/ideas/{rng.choice(idea_ids)}", None, "GET /ideas/{id}"),
+        ("GET", "/api/stats", None, "GET /stats"),
+        ("GET", "/api/categories?with_stats=true", None, "GET /categories"),
+        ("GET", f"/api/tags?prefix={rng.choice(TAGS)[:4]}", None, "GET /tags"),
+    ], engine))
+
+
+def write_target(rng, idea_ids, category_ids, engine):
+    return rng.choice(served([
+        ("POST", "/api/ideas", new_idea(rng, category_ids), "POST /ideas"),
+        ("PUT", f"/api/ideas/{rng.choice(idea_ids)}", {"title": words(rng, 4).capitalize()}, "PUT /ideas/{id}"),
+        ("PATCH", f"/api/ideas/{rng.choice(idea_ids)}/archive", None, "PATCH /ideas/{id}/archive"),
+        ("POST", "/api/ideas/batch",
+         {"operations": [{"op": "create", "idea": new_idea(rng, category_ids)} for _ in range(10)]},
+         "POST /ideas/batch"),
+    ], engine))
+
+
+def workload_targets(write_share, rng, idea_ids, category_ids, engine):
+    return [
+        (write_target if rng.random() < write_share else read_target)(rng, idea_ids, category_ids, engine)
+        for _ in range(TARGETS_PER_WORKLOAD)
+    ]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mongod(binary):
+    """Start a throwaway mongod; returns (process, url, dbpath)."""
+    path = shutil.which(binary) or binary
+    parent = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    dbpath = tempfile.mkdtemp(prefix="idea-bench-", dir=parent)
+    port = free_port()
+    process = subprocess.Popen(
+        [path, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"mongodb://127.0.0.1:{port}"
+    client = MongoClient(url, serverSelectionTimeoutMS=500)
+    for _ in range(60):
+        try:
+            client.admin.command("ping")
+            return process, url, dbpath
+        except Exception:
+            time.sleep(0.25)
+    process.terminate()
+    shutil.rmtree(dbpath, ignore_errors=True)
+    raise RuntimeError("mongod did not start")
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_size(args, size, mongo_url):
+    db_name = f"{args.db_prefix}_{size}"
+    if args.engine == "sqlite":
+        # A file, not :memory:, so that every worker sees the same database
+        sqlite_dir = tempfile.mkdtemp(prefix="idea-bench-")
+        env = {"STORAGE_ENGINE": "sqlite", "SQLITE_PATH": os.path.join(sqlite_dir, f"{db_name}.db")}
+    else:
+        MongoClient(mongo_url).drop_database(db_name)
+        env = {"MONGO_URL": mongo_url, "DB_NAME": db_name}
+    env.update(item.split("=", 1) for item in args.env)
+    process, base_url = start_server(args.workers, args.port, env)
+    results = []
+    try:
+        rng = random.Random(args.random_seed)
+        started = time.perf_counter()
+        idea_ids, category_ids = seed(base_url, size, rng, args.engine)
+        print(f"  seeded {size} ideas in {time.perf_counter() - started:.1f}s")
+        for workload in args.workloads.split(","):
+            targets = workload_targets(WORKLOADS[workload], rng, idea_ids, category_ids, args.engine)
+            summary = run_load(base_url, targets, args.concurrency, args.duration, args.load_processes, per_endpoint=True)
+            results.append({"size": size, "workload": workload, **summary})
+            print(f"  {workload:<12} | {summary['rps']:>9} req/s | p50 {summary['p50_ms']} ms"
+                  f" | p95 {summary['p95_ms']} ms | p99 {summary['p99_ms']} ms | errors {summary['errors']}")
+            for label, endpoint in summary["endpoints"].items():
+                print(f"      {label:<28} {endpoint['rps']:>9} req/s | p50 {endpoint['p50_ms']:>8} ms"
+                      f" | p95 {endpoint['p95_ms']:>8} ms | p99 {endpoint['p99_ms']:>8} ms")
+    finally:
+        process.terminate()
+        process.wait()
+        if not args.keep:
+            if args.engine == "sqlite":
+                shutil.rmtree(sqlite_dir, ignore_errors=True)
+            else:
+                MongoClient(mongo_url).drop_database(db_name)
+    return results
+
+
+def flatten(report):
+    """{(size, workload, endpoint): metrics}, with endpoint "*" for the whole workload."""
+    rows = {}
+    for result in report["results"]:
+        key = (result["size"], result["workload"])
+        rows[key + ("*",)] = result
+        for label, endpoint in result.get("endpoints", {}).items():
+            rows[key + (label,)] = endpoint
+    return rows
+
+
+def compare(baseline, current, threshold, min_ms):
+    """Print per-endpoint changes against `baseline`; returns the regressions."""
+    old_rows, new_rows = flatten(baseline), flatten(current)
+    regressions = []
+    print(f"\n📊 Compared with {baseline['meta'].get('revision') or 'baseline'} ({baseline['meta']['created_at']})")
+    for key in sorted(new_rows.keys() & old_rows.keys(), key=str):
+        old, new = old_rows[key], new_rows[key]
+        changes, flagged = [], []
+        for metric in METRICS:
+            before, after = old[metric], new[metric]
+            change = (after - before) / before if before else 0.0
+            changes.append(f"{metric} {before} -> {after} ({change:+.0%})")
+            worse = -change if metric == "rps" else change
+            noise = metric != "rps" and abs(after - before) < min_ms
+            if worse > threshold and not noise:
+                flagged.append(metric)
+        size, workload, endpoint = key
+        print(f"  {'❌' if flagged else '  '} {size:>7} {workload:<12} {endpoint:<28} " + " | ".join(changes))
+        if flagged:
+            regressions.append((key, flagged))
+    missing = old_rows.keys() - new_rows.keys()
+    if missing:
+        print(f"  ({len(missing)} baseline rows not measured this run)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000", help="Ideas to seed, one server run per size")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help=f"Any of {', '.join(WORKLOADS)}")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per workload")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--load-processes", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1, help="API worker processes")
+    parser.add_argument("--port", type=int, default=18200)
+    parser.add_argument("--engine", choices=("mongo", "sqlite"), default="mongo", help="Server STORAGE_ENGINE")
+    parser.add_argument("--mongod", action="store_true", help="Start a throwaway local mongod instead of MONGO_URL")
+    parser.add_argument("--mongod-bin", default="mongod")
+    parser.add_argument("--db-prefix", default="idea_bench")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded databases")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra server setting, e.g. --env CACHE_ENABLED=false (repeatable)")
+    parser.add_argument("--random-seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_path", help="Write results to this file (a baseline)")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="Ignore latency changes smaller than this")
+    args = parser.parse_args()
+
+    unknown = set(args.workloads.split(",")) - WORKLOADS.keys()
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+
+    mongod, mongo_url = None, None
+    if args.engine == "sqlite":
+        if args.mongod:
+            parser.error("--mongod needs --engine mongo")
+    elif args.mongod:
+        mongod, mongo_url, dbpath = start_mongod(args.mongod_bin)
+    elif os.environ.get("MONGO_URL"):
+        mongo_url = os.environ["MONGO_URL"]
+    else:
+        parser.error("set MONGO_URL or pass --mongod")
+
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "settings": {key: value for key, value in vars(args).items() if key not in ("json_path", "compare")},
+        },
+        "results": [],
+    }
+    print(f"🚀 Benchmark suite: {args.duration}s per workload, {args.load_processes}x{args.concurrency} clients,"
+          f" {args.workers} API worker(s), {args.engine}")
+    try:
+        for size in (int(n) for n in args.sizes.split(",")):
+            print(f"\n📦 {size} ideas")
+            report["results"] += run_size(args, size, mongo_url)
+    finally:
+        if mongod:
+            mongod.terminate()
+            mongod.wait()
+            shutil.rmtree(dbpath, ignore_errors=True)
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=2))
+        print(f"\n💾 Results written to {args.json_path}")
+
+    if args.compare:
+        regressions = compare(json.loads(Path(args.compare).read_text()), report, args.threshold, args.min_ms)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Read burst benchmark for single-flight coalescing in the Idea Logger backend.
+Starts backend/serve.py once with COALESCE_READS=false and once with it on,
+fires bursts of identical concurrent GETs (many tabs loading at once) and
+reports p50/p99 latency and the Mongo commands the server ran, read from
+/metrics. The response cache is off unless --with-cache is given, so every
+burst reaches the database.
+
+Usage: python benchmarks/burst_benchmark.py [--burst 100] [--rounds 30]
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+from load_test import seed, start_server
+from loadgen import summarize
+
+TARGETS = [
+    "/api/ideas?view=summary&limit=50&archived=false",
+    "/api/stats",
+    "/api/categories",
+]
+MONGO_COUNT_RE = re.compile(r'^mongo_command_duration_seconds_count\{command="(\w+)",collection="(\w*)"\} ([\d.]+)$', re.M)
+
+
+def mongo_commands(client):
+    text = client.get("/metrics").text
+    return sum(float(count) for command, collection, count in MONGO_COUNT_RE.findall(text)
+               if collection in ("ideas", "categories", "counters"))
+
+
+async def bursts(base_url, burst, rounds, pause):
+    latencies, statuses = [], Counter()
+    limits = httpx.Limits(max_connections=burst * len(TARGETS))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        async def one(path):
+            started = time.perf_counter()
+            try:
+                statuses[(await client.get(path)).status_code] += 1
+            except httpx.HTTPError:
+                statuses[0] += 1
+            latencies.append(time.perf_counter() - started)
+
+        # Open the connections first so the bursts measure queries, not handshakes
+        await asyncio.gather(*(client.get("/api/stats") for _ in range(burst)))
+        started = time.perf_counter()
+        for _ in range(rounds):
+            await asyncio.gather(*(one(path) for path in TARGETS for _ in range(burst)))
+            await asyncio.sleep(pause)
+        return latencies, statuses, time.perf_counter() - started
+
+
+def run(args, coalesce):
+    env = {"COALESCE_READS": str(coalesce).lower(), "CACHE_ENABLED": str(args.with_cache).lower()}
+    process, base_url = start_server(1, args.port, env)
+    try:
+        with httpx.Client(base_url=base_url) as client:
+            if args.seed:
+                seed(base_url, args.seed)
+            before = mongo_commands(client)
+            latencies, statuses, elapsed = asyncio.run(bursts(base_url, args.burst, args.rounds, args.pause))
+            # The warm-up requests and the /metrics scrape itself are not part of the bursts
+            commands = mongo_commands(client) - before
+    finally:
+        process.terminate()
+        process.wait()
+    summary = summarize(latencies, statuses, elapsed)
+    summary["coalesce"] = coalesce
+    summary["mongo_commands"] = int(commands)
+    summary["mongo_commands_per_request"] = round(commands / max(1, summary["requests"]), 3)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=100, help="Concurrent identical requests per route per burst")
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--pause", type=float, default=0.05, help="Seconds between bursts")
+    parser.add_argument("--port", type=int, default=18100)
+    parser.add_argument("--seed", type=int, default=200, help="Ideas to create before the first run (0 to skip)")
+    parser.add_argument("--with-cache", action="store_true", help="Leave the response cache on")
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    print(f"🚀 Read bursts: {args.rounds} rounds of {args.burst} x {len(TARGETS)} identical GETs, one worker")
+    results = []
+    for coalesce in (False, True):
+        summary = run(args, coalesce)
+        results.append(summary)
+        args.seed = 0  # Both runs share the database
+        print(f"  coalescing {'on ' if coalesce else 'off'} | p50 {summary['p50_ms']} ms | p99 {summary['p99_ms']} ms"
+              f" | {summary['mongo_commands']} Mongo commands ({summary['mongo_commands_per_request']}/request)"
+              f" | errors {summary['errors']}")
+    off, on = results
+    if on["mongo_commands"]:
+        print(f"✅ Mongo commands x{off['mongo_commands'] / on['mongo_commands']:.1f} fewer, "
+              f"p99 {off['p99_ms']} -> {on['p99_ms']} ms")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for idea writes in the Idea Logger backend.
+Starts backend/serve.py (or uses --base-url) and runs three checks:
+
+  toggle  --clients tasks each flip the archive flag of one shared idea
+          --rounds times. The final flag must match the parity of all the
+          toggles, the version must count every one of them and /api/stats
+          must agree with the final flag.
+  legacy  The same toggles done the way PATCH /archive worked before it was
+          atomic: read the flag, then write its negation, two round trips
+          with nothing guarding the gap. It runs for comparison and is
+          expected to lose toggles. Its latency is the baseline that the
+          single find_one_and_update above is compared against.
+  edit    --clients tasks each add --rounds tags of their own to one shared
+          idea by reading it, extending its tags and PUTting them back with
+          If-Match, retrying on 412. Every tag must survive. --no-if-match
+          sends blind PUTs instead, which shows the lost updates If-Match
+          prevents.
+
+Prints write latency p50/p99 and the 412 retries, and exits 1 if a guarded write loses an update.
+
+Usage: python benchmarks/concurrency_stress.py [--clients 32] [--rounds 20] [--no-if-match]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import httpx
+
+from load_test import start_server
+from loadgen import percentile
+
+
+def latency_summary(latencies):
+    latencies = sorted(latencies)
+    return {
+        "writes": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def create_idea(client, title):
+    response = await client.post("/api/ideas", json={"title": title, "content": "<p>Shared idea</p>", "tags": []})
+    response.raise_for_status()
+    return response.json()
+
+
+async def toggle_check(client, clients, rounds):
+    idea = await create_idea(client, "Toggle stress")
+    before = (await client.get("/api/stats")).json()
+    latencies, failures = [], 0
+
+    async def worker():
+        nonlocal failures
+        for _ in range(rounds):
+            started = time.perf_counter()
+            response = await client.patch(f"/api/ideas/{idea['id']}/archive")
+            latencies.append(time.perf_counter() - started)
+            failures += response.status_code != 200
+
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    toggles = clients * rounds - failures
+    final = (await client.get(f"/api/ideas/{idea['id']}")).json()
+    after = (await client.get("/api/stats")).json()
+    archived_delta = after["archived_ideas"] - before["archived_ideas"]
+    result = {
+        **latency_summary(latencies),
+        "failed": failures,
+        "expected_archived": toggles % 2 == 1,
+        "archived": final["is_archived"],
+        "expected_version": idea["version"] + toggles,
+        "version": final["version"],
+        "stats_archived_delta": archived_delta,
+    }
+    result["ok"] = (
+        result["archived"] == result["expected_archived"]
+        and result["version"] == result["expected_version"]
+        and archived_delta == int(final["is_archived"])
+    )
+    return result
+
+
+async def legacy_toggle_check(client, clients, rounds):
+    idea = await create_idea(client, "Legacy toggle stress")
+    url = f"/api/ideas/{idea['id']}"
+    latencies = []
+
+    async def worker():
+        for _ in range(rounds):
+            started = time.perf_counter()
+            current = (await client.get(url)).json()
+            response = await client.put(url, json={"is_archived": not current["is_archived"]})
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    final = (await client.get(url)).json()
+    # Every PUT applies, but two that read the same flag write the same value
+    return {
+        **latency_summary(latencies),
+        "expected_archived": clients * rounds % 2 == 1,
+        "archived": final["is_archived"],
+    }
+
+
+async def edit_check(client, clients, rounds, use_if_match):
+    idea = await create_idea(client, "Edit stress")
+    url = f"/api/ideas/{idea['id']}"
+    latencies, conflicts = [], 0
+
+    async def worker(n):
+        nonlocal conflicts
+        for i in range(rounds):
+            tag = f"c{n}-{i}"
+            while True:
+                response = await client.get(url)
+                current = response.json()
+                headers = {"If-Match": response.headers["etag"]} if use_if_match else {}
+                started = time.perf_counter()
+                response = await client.put(url, json={"tags": current["tags"] + [tag]}, headers=headers)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 412:
+                    response.raise_for_status()
+                    break
+                conflicts += 1
+
+    await asyncio.gather(*(worker(n) for n in range(clients)))
+    final = (await client.get(url)).json()
+    expected = clients * rounds
+    result = {
+        **latency_summary(latencies),
+        "if_match": use_if_match,
+        "conflicts_retried": conflicts,
+        "expected_tags": expected,
+        "tags": len(set(final["tags"])),
+        "lost_updates": expected - len(set(final["tags"])),
+    }
+    result["ok"] = result["lost_updates"] == 0
+    return result
+
+
+async def run_checks(base_url, args):
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        return {
+            "toggle": await toggle_check(client, args.clients, args.rounds),
+            "legacy_toggle": await legacy_toggle_check(client, args.clients, args.rounds),
+            "edit": await edit_check(client, args.clients, args.rounds, not args.no_if_match),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--no-if-match", action="store_true", help="Edit with blind PUTs to show lost updates")
+    parser.add_argument("--workers", type=int, default=2, help="API worker processes")
+    parser.add_argument("--port", type=int, default=18400)
+    parser.add_argument("--base-url", help="Test a running server instead of starting one")
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    process = None
+    base_url = args.base_url
+    if base_url is None:
+        process, base_url = start_server(args.workers, args.port)
+    try:
+        results = asyncio.run(run_checks(base_url, args))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    toggle, legacy, edit = results["toggle"], results["legacy_toggle"], results["edit"]
+    print(f"🔁 Toggle: {toggle['writes']} PATCH /archive | p50 {toggle['p50_ms']} ms | p99 {toggle['p99_ms']} ms"
+          f" | archived {toggle['archived']} (expected {toggle['expected_archived']})"
+          f" | version {toggle['version']} (expected {toggle['expected_version']})"
+          f" | stats delta {toggle['stats_archived_delta']} {'✅' if toggle['ok'] else '❌'}")
+    print(f"🐢 Legacy toggle: {legacy['writes']} GET + PUT | p50 {legacy['p50_ms']} ms | p99 {legacy['p99_ms']} ms"
+          f" | archived {legacy['archived']} (expected {legacy['expected_archived']})")
+    if toggle["p50_ms"]:
+        print(f"   PATCH /archive p50 is x{legacy['p50_ms'] / toggle['p50_ms']:.2f} faster than read-then-write")
+    print(f"✏️  Edit ({'If-Match' if edit['if_match'] else 'blind'}): {edit['writes']} PUT | p50 {edit['p50_ms']} ms"
+          f" | p99 {edit['p99_ms']} ms | {edit['conflicts_retried']} conflicts retried"
+          f" | {edit['tags']}/{edit['expected_tags']} tags kept, {edit['lost_updates']} lost"
+          f" {'✅' if edit['ok'] else '❌'}")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, indent=2))
+    if not (toggle["ok"] and (edit["ok"] or args.no_if_match)):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
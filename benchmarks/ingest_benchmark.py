@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Create-burst benchmark for group commit in the Idea Logger backend.
+Starts backend/serve.py once with INGEST_BATCHING=false and once with it on,
+drives concurrent POST /api/ideas for --duration seconds and reports
+throughput, p50/p99 latency and the Mongo insert commands the server ran,
+read from /metrics.
+
+Usage: python benchmarks/ingest_benchmark.py [--concurrency 64] [--max-batch 100] [--max-delay-ms 2]
+"""
+
+import argparse
+import json
+import re
+from pathlib import Path
+
+import httpx
+
+from load_test import start_server
+from loadgen import run_load
+
+INSERT_COUNT_RE = re.compile(r'^mongo_command_duration_seconds_count\{command="insert",collection="ideas"\} ([\d.]+)$', re.M)
+
+
+def insert_commands(base_url):
+    match = INSERT_COUNT_RE.search(httpx.get(f"{base_url}/metrics").text)
+    return float(match.group(1)) if match else 0.0
+
+
+def targets(count):
+    return [
+        ("POST", "/api/ideas", {"title": f"Captured idea {i}", "content": f"<p>Captured from an integration {i}</p>",
+                                "tags": ["ingest"]})
+        for i in range(count)
+    ]
+
+
+def run(args, batching):
+    env = {
+        "INGEST_BATCHING": str(batching).lower(),
+        "INGEST_MAX_BATCH": str(args.max_batch),
+        "INGEST_MAX_DELAY_MS": str(args.max_delay_ms),
+    }
+    process, base_url = start_server(args.workers, args.port, env)
+    try:
+        before = insert_commands(base_url)
+        summary = run_load(base_url, targets(1000), args.concurrency, args.duration, args.load_processes)
+        inserts = insert_commands(base_url) - before
+    finally:
+        process.terminate()
+        process.wait()
+    summary["batching"] = batching
+    summary["insert_commands"] = int(inserts)
+    summary["ideas_per_insert"] = round(summary["requests"] / inserts, 1) if inserts else None
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--load-processes", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1, help="API worker processes (metrics are per worker)")
+    parser.add_argument("--max-batch", type=int, default=100)
+    parser.add_argument("--max-delay-ms", type=float, default=2.0)
+    parser.add_argument("--port", type=int, default=18300)
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    print(f"🚀 Create bursts: {args.concurrency} concurrent POST /api/ideas for {args.duration}s")
+    results = []
+    for batching in (False, True):
+        summary = run(args, batching)
+        results.append(summary)
+        print(f"  batching {'on ' if batching else 'off'} | {summary['rps']:>8} req/s | p50 {summary['p50_ms']} ms"
+              f" | p99 {summary['p99_ms']} ms | {summary['insert_commands']} inserts"
+              f" ({summary['ideas_per_insert']} ideas each) | errors {summary['errors']}")
+    off, on = results
+    if off["rps"]:
+        print(f"✅ Throughput x{on['rps'] / off['rps']:.2f}, p99 {off['p99_ms']} -> {on['p99_ms']} ms")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Worker scaling load test for the Idea Logger backend.
+Starts backend/serve.py with 1..N workers against the configured storage engine
+(MongoDB unless STORAGE_ENGINE=sqlite, which needs a file SQLITE_PATH shared by
+the workers), seeds a few ideas, drives a read-heavy mix and reports
+requests/second per worker count.
+
+Usage: python benchmarks/load_test.py [--workers 1,2,4,8] [--duration 15]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+from loadgen import run_load
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+TARGETS = [
+    ("GET", "/api/ideas?view=summary&limit=20", None),
+    ("GET", "/api/ideas?view=summary&limit=20&archived=false", None),
+    ("GET", "/api/stats", None),
+    ("GET", "/api/categories", None),
+]
+
+
+def start_server(workers, port, extra_env=None):
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "PORT": str(port), "HOST": "127.0.0.1", **(extra_env or {})}
+    process = subprocess.Popen([sys.executable, "serve.py"], cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if requests.get(f"{base_url}/api/stats", timeout=1).status_code == 200:
+                return process, base_url
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server with {workers} workers did not start")
+
+
+def create_ideas(base_url, ideas, batch_size=1000):
+    """Create `ideas` and return their ids.
+
+    Uses POST /api/ideas/batch, or one POST /api/ideas per idea where batch
+    is Mongo-only (answered with 501 under STORAGE_ENGINE=sqlite).
+    """
+    ids = []
+    for start in range(0, len(ideas), batch_size):
+        chunk = ideas[start:start + batch_size]
+        response = requests.post(
+            f"{base_url}/api/ideas/batch", json={"operations": [{"op": "create", "idea": idea} for idea in chunk]})
+        if response.status_code == 501:
+            return ids + [create_idea(base_url, idea) for idea in ideas[start:]]
+        response.raise_for_status()
+        ids += [result["id"] for result in response.json()["results"]]
+    return ids
+
+
+def create_idea(base_url, idea):
+    response = requests.post(f"{base_url}/api/ideas", json=idea)
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+def seed(base_url, count):
+    create_ideas(base_url, [
+        {"title": f"Load idea {i}", "content": f"<p>Body {i}</p>", "tags": ["load"]} for i in range(count)
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=",".join(str(n) for n in (1, 2, 4, 8) if n <= (os.cpu_count() or 1)) or "1")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--load-processes", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--seed", type=int, default=200)
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"🚀 Worker scaling test, {args.duration}s per run, {args.load_processes}x{args.concurrency} clients")
+    for index, workers in enumerate(int(n) for n in args.workers.split(",")):
+        process, base_url = start_server(workers, args.port)
+        try:
+            if index == 0:
+                seed(base_url, args.seed)
+            summary = run_load(base_url, TARGETS, args.concurrency, args.duration, args.load_processes)
+        finally:
+            process.terminate()
+            process.wait()
+        summary["workers"] = workers
+        results.append(summary)
+        baseline = results[0]["rps"] or 1
+        print(f"  {workers:>2} workers | {summary['rps']:>9} req/s (x{summary['rps'] / baseline:.2f})"
+              f" | p50 {summary['p50_ms']} ms | p99 {summary['p99_ms']} ms | errors {summary['errors']}")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
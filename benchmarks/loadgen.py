@@ -0,0 +1,101 @@
+"""
+Closed-loop HTTP load generator shared by the load-test scripts.
+
+Each load process runs `concurrency` asyncio workers that send requests back to
+back for `duration` seconds; latencies from all processes are merged into one
+summary with throughput and p50/p95/p99, and optionally one per endpoint.
+"""
+
+import asyncio
+import multiprocessing
+import statistics
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, statuses, elapsed):
+    latencies = sorted(latencies)
+    total = len(latencies)
+    return {
+        "requests": total,
+        "rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "errors": sum(count for status, count in statuses.items() if status >= 400 or status == 0),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def target_label(target):
+    """A target's label: its optional 4th element, else "METHOD path"."""
+    return target[3] if len(target) > 3 else f"{target[0]} {target[1]}"
+
+
+async def _run(base_url, targets, concurrency, duration):
+    latencies, statuses = defaultdict(list), defaultdict(Counter)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(offset):
+            i = offset
+            while time.perf_counter() < deadline:
+                target = targets[i % len(targets)]
+                method, path, body = target[:3]
+                label = target_label(target)
+                i += 1
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    statuses[label][response.status_code] += 1
+                except httpx.HTTPError:
+                    statuses[label][0] += 1
+                latencies[label].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        return dict(latencies), dict(statuses), time.perf_counter() - started
+
+
+def _process_main(args):
+    return asyncio.run(_run(*args))
+
+
+def run_load(base_url, targets, concurrency=32, duration=10.0, processes=1, per_endpoint=False):
+    """Drive `targets` ((method, path, json_body[, label]) tuples, round robin) and summarize.
+
+    `concurrency` is per load process; use several processes when the server has
+    more cores than one Python client can saturate. With `per_endpoint` the
+    summary gets an "endpoints" entry with one summary per target label.
+    """
+    jobs = [(base_url, targets, concurrency, duration)] * processes
+    if processes == 1:
+        results = [_process_main(jobs[0])]
+    else:
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            results = pool.map(_process_main, jobs)
+
+    latencies, statuses = defaultdict(list), defaultdict(Counter)
+    for process_latencies, process_statuses, _ in results:
+        for label, values in process_latencies.items():
+            latencies[label].extend(values)
+        for label, counts in process_statuses.items():
+            statuses[label].update(counts)
+    elapsed = max(result[2] for result in results)
+    summary = summarize(
+        [value for values in latencies.values() for value in values], sum(statuses.values(), Counter()), elapsed
+    )
+    if per_endpoint:
+        summary["endpoints"] = {label: summarize(latencies[label], statuses[label], elapsed) for label in sorted(latencies)}
+    return summary
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Search benchmark for the Idea Logger backend.
+Compares the legacy unanchored $regex search with the $text index search
+at growing collection sizes against a local MongoDB.
+
+Usage: python benchmarks/search_benchmark.py [--sizes 10000,100000,1000000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from content import html_to_text  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+from queries import idea_list_query, set_normalized  # noqa: E402
+
+WORDS = (
+    "idea product market user growth design research learning platform community data "
+    "mobile service network energy health travel finance music video game garden city "
+    "school robot cloud privacy security search vector graph budget launch feedback"
+).split()
+QUERIES = ["garden", "machine learning", "privacy security", "launch", "xylophone"]
+
+
+def make_idea(created_at):
+    body = " ".join(random.choice(WORDS) for _ in range(60))
+    content = f"<h2>{random.choice(WORDS).title()}</h2><p>{body}</p><ul><li>{random.choice(WORDS)}</li></ul>"
+    return {
+        "id": str(uuid.uuid4()),
+        "title": " ".join(random.choice(WORDS) for _ in range(4)).title(),
+        "content": content,
+        "content_text": html_to_text(content),
+        "category_id": None,
+        "tags": random.sample(WORDS, 3),
+        "is_archived": random.random() < 0.2,
+        "deleted": False,
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+def seed(db, target):
+    current = db.ideas.estimated_document_count()
+    start = datetime.utcnow()
+    while current < target:
+        chunk = min(10000, target - current)
+        db.ideas.insert_many([make_idea(start - timedelta(seconds=current + i)) for i in range(chunk)], ordered=False)
+        current += chunk
+    print(f"📦 Collection seeded with {current} ideas")
+
+
+def regex_query(search):
+    return {"$or": [
+        {"title": {"$regex": search, "$options": "i"}},
+        {"content": {"$regex": search, "$options": "i"}},
+        {"tags": {"$regex": search, "$options": "i"}},
+    ]}
+
+
+def run_regex(db, search):
+    return list(db.ideas.find(regex_query(search)).sort("created_at", -1).limit(1000))
+
+
+def run_text(db, search):
+    score = {"$meta": "textScore"}
+    query = idea_list_query(search=search)
+    return list(db.ideas.find(query, {"score": score}).sort([("score", score), ("created_at", -1)]).limit(1000))
+
+
+def measure(fn, db, repeat):
+    timings, hits = [], 0
+    for search in QUERIES:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            hits = len(fn(db, search))
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 2),
+        "last_hits": hits,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="idea_logger_search_bench")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    set_normalized(True)  # Seeded documents carry an explicit deleted flag
+    client = MongoClient(args.mongo_url)
+    client.drop_database(args.db)
+    db = client[args.db]
+    asyncio.run(ensure_indexes(AsyncIOMotorClient(args.mongo_url)[args.db]))
+
+    results = []
+    print(f"🚀 Search benchmark against {args.mongo_url}/{args.db}")
+    for size in sorted(int(s) for s in args.sizes.split(",")):
+        seed(db, size)
+        row = {"size": size, "regex": measure(run_regex, db, args.repeat), "text": measure(run_text, db, args.repeat)}
+        results.append(row)
+        print(f"  {size:>9} ideas | regex p50 {row['regex']['p50_ms']:>9} ms p95 {row['regex']['p95_ms']:>9} ms"
+              f" | text p50 {row['text']['p50_ms']:>9} ms p95 {row['text']['p95_ms']:>9} ms")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, indent=2))
+    client.drop_database(args.db)
+
+
+if __name__ == "__main__":
+    main()
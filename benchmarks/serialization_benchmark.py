@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Serialization micro-benchmark for the Idea Logger backend.
+Measures per-request CPU time of the list response path before (Idea(**doc) plus
+response_model validation) and after (orjson straight from Mongo documents).
+No database is needed: both routes serve the same in-memory documents.
+
+Usage: python benchmarks/serialization_benchmark.py [--sizes 10,100,1000]
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from main import Idea, fast_json  # noqa: E402
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def make_docs(count):
+    now = datetime.utcnow().replace(microsecond=0)
+    content = "<h2>Idea</h2><p>" + "Some <strong>rich</strong> text about the idea. " * 20 + "</p>"
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "title": f"Idea number {i}",
+            "content": content,
+            "category_id": str(uuid.uuid4()),
+            "tags": ["product", "research", "q3"],
+            "is_archived": False,
+            "created_at": now,
+            "updated_at": now,
+            "version": 1,
+        }
+        for i in range(count)
+    ]
+
+
+def build_app(docs):
+    app = FastAPI()
+
+    @app.get("/before", response_model=List[Idea])
+    async def before():
+        return [Idea(**doc) for doc in docs]
+
+    @app.get("/after", response_model=List[Idea])
+    async def after():
+        return fast_json(docs)
+
+    return app
+
+
+def cpu_per_request(client, path, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.process_time()
+        response = client.get(path)
+        timings.append((time.process_time() - started) * 1000)
+        assert response.status_code == 200
+    return round(statistics.median(timings), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print("🚀 List serialization CPU time per request (median)")
+    for size in (int(s) for s in args.sizes.split(",")):
+        client = TestClient(build_app(make_docs(size)))
+        assert client.get("/before").json() == client.get("/after").json()
+        row = {
+            "size": size,
+            "before_ms": cpu_per_request(client, "/before", args.repeat),
+            "after_ms": cpu_per_request(client, "/after", args.repeat),
+        }
+        row["speedup"] = round(row["before_ms"] / row["after_ms"], 1) if row["after_ms"] else None
+        results.append(row)
+        print(f"  {size:>6} ideas | before {row['before_ms']:>8} ms | after {row['after_ms']:>8} ms | x{row['speedup']}")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
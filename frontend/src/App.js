@@ -1,9 +1,34 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import "./App.css";
 import axios from "axios";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const PAGE_SIZE = 50;
+
+// Writes carry the version of the idea the user saw; the server answers 412
+// instead of overwriting a change made elsewhere in the meantime
+const ifMatch = (version) => ({ headers: { 'If-Match': `"${version || 0}"` } });
+const isConflict = (error) => error.response && error.response.status === 412;
+
+const byCreatedDesc = (a, b) => (a.created_at === b.created_at
+  ? (a.id < b.id ? 1 : -1)
+  : (a.created_at < b.created_at ? 1 : -1));
+const byCreatedAsc = (a, b) => -byCreatedDesc(a, b);
+
+// Apply a change-feed event to a list kept sorted by `compare`. Entries that
+// no longer belong are dropped; new ones are inserted in order, unless they
+// sort past the end of a partially loaded list.
+const applyChange = (list, change, { belongs, compare, complete }) => {
+  const id = change.op === 'delete' ? change.id : change.doc.id;
+  const index = list.findIndex(item => item.id === id);
+  const rest = index === -1 ? list : [...list.slice(0, index), ...list.slice(index + 1)];
+  if (change.op === 'delete' || !belongs(change.doc)) return rest;
+  const doc = index === -1 ? change.doc : { ...list[index], ...change.doc };
+  const position = rest.findIndex(item => compare(doc, item) < 0);
+  if (position === -1) return complete ? [...rest, doc] : rest;
+  return [...rest.slice(0, position), doc, ...rest.slice(position)];
+};
 
 // Rich Text Editor Component
 const RichTextEditor = ({ value, onChange, placeholder }) => {
@@ -134,12 +159,12 @@ const IdeaCard = ({ idea, categories, onEdit, onArchive, onDelete }) => {
               <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M11 5H6a2 2 0 00-2 2v11a2 2 0 002 2h11a2 2 0 002-2v-5m-1.414-9.414a2 2 0 112.828 2.828L11.828 15H9v-2.828l8.586-8.586z" />
             </svg>
           </button>
-          <button onClick={() => onArchive(idea.id)} className="btn-icon" title={idea.is_archived ? "Разархивировать" : "Архивировать"}>
+          <button onClick={() => onArchive(idea)} className="btn-icon" title={idea.is_archived ? "Разархивировать" : "Архивировать"}>
             <svg className="w-4 h-4" fill="none" stroke="currentColor" viewBox="0 0 24 24">
               <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M5 8l6 6 6-6" />
             </svg>
           </button>
-          <button onClick={() => onDelete(idea.id)} className="btn-icon btn-danger" title="Удалить">
+          <button onClick={() => onDelete(idea)} className="btn-icon btn-danger" title="Удалить">
             <svg className="w-4 h-4" fill="none" stroke="currentColor" viewBox="0 0 24 24">
               <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M19 7l-.867 12.142A2 2 0 0116.138 21H7.862a2 2 0 01-1.995-1.858L5 7m5 4v6m4-6v6m1-10V4a1 1 0 00-1-1h-4a1 1 0 00-1 1v3M4 7h16" />
             </svg>
@@ -147,7 +172,11 @@ const IdeaCard = ({ idea, categories, onEdit, onArchive, onDelete }) => {
         </div>
       </div>
       
-      <div className="idea-content" dangerouslySetInnerHTML={{ __html: idea.content }} />
+      {idea.snippet ? (
+        <div className="idea-content idea-snippet" dangerouslySetInnerHTML={{ __html: idea.snippet }} />
+      ) : (
+        <div className="idea-content">{idea.excerpt}</div>
+      )}
       
       <div className="idea-meta">
         <div className="idea-tags">
@@ -176,6 +205,13 @@ function App() {
   const [searchTerm, setSearchTerm] = useState('');
   const [selectedCategory, setSelectedCategory] = useState('');
   const [showArchived, setShowArchived] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const loadingMore = useRef(false);
+  const sentinelRef = useRef(null);
+  // True while the change feed is connected; writes then wait for its events
+  // instead of refetching
+  const live = useRef(false);
+  const loaded = useRef(false);
   
   // Form states
   const [formData, setFormData] = useState({
@@ -189,17 +225,24 @@ function App() {
     color: '#6366f1'
   });
   const [tagInput, setTagInput] = useState('');
+  const [tagSuggestions, setTagSuggestions] = useState([]);
 
   // Fetch data
-  const fetchIdeas = async () => {
+  // Without a cursor the list is reloaded from the first page; with one the
+  // next page is appended (infinite scroll).
+  const fetchIdeas = async (cursor = null) => {
     try {
       const params = new URLSearchParams();
       if (searchTerm) params.append('search', searchTerm);
       if (selectedCategory) params.append('category_id', selectedCategory);
       if (showArchived !== null) params.append('archived', showArchived);
+      params.append('limit', PAGE_SIZE);
+      params.append('view', 'summary');
+      if (cursor) params.append('cursor', cursor);
       
       const response = await axios.get(`${API}/ideas?${params}`);
-      setIdeas(response.data);
+      setIdeas(prev => cursor ? [...prev, ...response.data] : response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Error fetching ideas:', error);
     }
@@ -207,8 +250,15 @@ function App() {
 
   const fetchCategories = async () => {
     try {
-      const response = await axios.get(`${API}/categories`);
-      setCategories(response.data);
+      let all = [];
+      let cursor = null;
+      do {
+        const params = cursor ? { limit: 1000, cursor, with_stats: true } : { limit: 1000, with_stats: true };
+        const response = await axios.get(`${API}/categories`, { params });
+        all = all.concat(response.data);
+        cursor = response.headers['x-next-cursor'];
+      } while (cursor);
+      setCategories(all);
     } catch (error) {
       console.error('Error fetching categories:', error);
     }
@@ -225,23 +275,143 @@ function App() {
 
   useEffect(() => {
     fetchIdeas();
-    fetchCategories();
-    fetchStats();
   }, [searchTerm, selectedCategory, showArchived]);
 
+  // The handlers below outlive renders, so they read the current filters and
+  // fetchers through a ref
+  const current = useRef({});
+  current.current = { searchTerm, selectedCategory, showArchived, nextCursor, fetchIdeas, fetchCategories, fetchStats };
+
+  const reloadAll = () => {
+    loaded.current = true;
+    current.current.fetchIdeas();
+    current.current.fetchCategories();
+    current.current.fetchStats();
+  };
+
+  // Live updates from /api/events, applied in place. `ready` arrives on every
+  // (re)connect and `resync` when events were dropped. The first `ready`
+  // loads everything; later ones only fetch what changed since the last
+  // watermark the feed sent, through /api/sync.
+  const watermark = useRef(null);
+
+  useEffect(() => {
+    const applyIdea = (change) => setIdeas(prev => {
+      const { searchTerm, selectedCategory, showArchived, nextCursor } = current.current;
+      if (searchTerm) {
+        // Relevance order comes from the server: update or drop hits, never add
+        if (change.op === 'delete') return prev.filter(idea => idea.id !== change.id);
+        return prev.map(idea => (idea.id === change.doc.id ? { ...idea, ...change.doc } : idea));
+      }
+      return applyChange(prev, change, {
+        belongs: (idea) => idea.is_archived === showArchived
+          && (!selectedCategory || idea.category_id === selectedCategory),
+        compare: byCreatedDesc,
+        complete: !nextCursor
+      });
+    });
+    const applyCategory = (change) => setCategories(prev => applyChange(prev, change, {
+      belongs: () => true, compare: byCreatedAsc, complete: true
+    }));
+
+    const catchUp = async () => {
+      try {
+        let since = watermark.current;
+        let page;
+        do {
+          const response = await axios.get(`${API}/sync`, { params: { since } });
+          page = response.data;
+          page.ideas.changed.forEach(doc => applyIdea({ op: 'upsert', doc }));
+          page.ideas.deleted.forEach(({ id }) => applyIdea({ op: 'delete', id }));
+          page.categories.changed.forEach(doc => applyCategory({ op: 'upsert', doc }));
+          page.categories.deleted.forEach(({ id }) => applyCategory({ op: 'delete', id }));
+          since = page.watermark;
+        } while (page.has_more);
+        watermark.current = since;
+        current.current.fetchStats();
+      } catch (error) {
+        console.error('Error syncing changes:', error);
+        reloadAll();
+      }
+    };
+
+    // Idea counts per category come from /categories; refetch them once a
+    // burst of idea changes has settled
+    let countsTimer = null;
+    const refreshCounts = () => {
+      clearTimeout(countsTimer);
+      countsTimer = setTimeout(() => current.current.fetchCategories(), 1000);
+    };
+
+    const source = new EventSource(`${API}/events`);
+    const on = (name, handler) => source.addEventListener(name, (e) => handler(JSON.parse(e.data)));
+
+    on('ready', (data) => {
+      live.current = true;
+      if (watermark.current) {
+        catchUp();
+      } else {
+        watermark.current = data.watermark;
+        reloadAll();
+      }
+    });
+    on('resync', () => (watermark.current ? catchUp() : reloadAll()));
+    on('watermark', (data) => { watermark.current = data.watermark; });
+    on('stats', setStats);
+    on('category', applyCategory);
+    on('idea', (change) => { applyIdea(change); refreshCounts(); });
+    source.onerror = () => {
+      live.current = false;
+      // No feed at all yet: load categories and stats the plain way
+      if (!loaded.current) reloadAll();
+    };
+    return () => {
+      clearTimeout(countsTimer);
+      source.close();
+    };
+  }, []);
+
+  // Load the next page when the sentinel below the grid scrolls into view
+  useEffect(() => {
+    const sentinel = sentinelRef.current;
+    if (!sentinel || !nextCursor) return;
+
+    const observer = new IntersectionObserver(async (entries) => {
+      if (!entries[0].isIntersecting || loadingMore.current) return;
+      loadingMore.current = true;
+      await fetchIdeas(nextCursor);
+      loadingMore.current = false;
+    }, { rootMargin: '400px' });
+
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [nextCursor]);
+
   // Form handlers
   const handleSubmit = async (e) => {
     e.preventDefault();
     try {
       if (editingIdea) {
-        await axios.put(`${API}/ideas/${editingIdea.id}`, formData);
+        const url = `${API}/ideas/${editingIdea.id}`;
+        try {
+          await axios.put(url, formData, ifMatch(editingIdea.version));
+        } catch (error) {
+          if (!isConflict(error)) throw error;
+          if (!window.confirm('Идею изменили в другом окне. Перезаписать её вашей версией? (Отмена загрузит текущую версию)')) {
+            await openEditModal(editingIdea);
+            return;
+          }
+          await axios.put(url, formData, ifMatch(error.response.data.version));
+        }
       } else {
         await axios.post(`${API}/ideas`, formData);
       }
       setShowModal(false);
       resetForm();
-      fetchIdeas();
-      fetchStats();
+      if (!live.current) {
+        fetchIdeas();
+        fetchStats();
+      }
     } catch (error) {
       console.error('Error saving idea:', error);
     }
@@ -253,8 +423,10 @@ function App() {
       await axios.post(`${API}/categories`, categoryForm);
       setShowCategoryModal(false);
       setCategoryForm({ name: '', color: '#6366f1' });
-      fetchCategories();
-      fetchStats();
+      if (!live.current) {
+        fetchCategories();
+        fetchStats();
+      }
     } catch (error) {
       console.error('Error creating category:', error);
     }
@@ -266,39 +438,82 @@ function App() {
     setTagInput('');
   };
 
-  const openEditModal = (idea) => {
-    setEditingIdea(idea);
-    setFormData({
-      title: idea.title,
-      content: idea.content,
-      category_id: idea.category_id || '',
-      tags: idea.tags || []
-    });
-    setShowModal(true);
+  // The list only carries summaries, so load the full body before editing
+  const openEditModal = async (summary) => {
+    try {
+      const response = await axios.get(`${API}/ideas/${summary.id}`);
+      const idea = response.data;
+      setEditingIdea(idea);
+      setFormData({
+        title: idea.title,
+        content: idea.content,
+        category_id: idea.category_id || '',
+        tags: idea.tags || []
+      });
+      setShowModal(true);
+    } catch (error) {
+      console.error('Error loading idea:', error);
+    }
   };
 
-  const handleArchive = async (ideaId) => {
+  const handleArchive = async (idea) => {
     try {
-      await axios.patch(`${API}/ideas/${ideaId}/archive`);
-      fetchIdeas();
-      fetchStats();
+      await axios.patch(`${API}/ideas/${idea.id}/archive`, null, ifMatch(idea.version));
+      if (!live.current) {
+        fetchIdeas();
+        fetchStats();
+      }
     } catch (error) {
+      if (isConflict(error)) {
+        window.alert('Идею изменили в другом окне, список обновлён.');
+        fetchIdeas();
+        return;
+      }
       console.error('Error archiving idea:', error);
     }
   };
 
-  const handleDelete = async (ideaId) => {
+  const handleDelete = async (idea) => {
     if (window.confirm('Вы уверены, что хотите удалить эту идею?')) {
       try {
-        await axios.delete(`${API}/ideas/${ideaId}`);
-        fetchIdeas();
-        fetchStats();
+        await axios.delete(`${API}/ideas/${idea.id}`, ifMatch(idea.version));
+        if (!live.current) {
+          fetchIdeas();
+          fetchStats();
+        }
       } catch (error) {
+        if (isConflict(error)) {
+          window.alert('Идею изменили в другом окне, список обновлён.');
+          fetchIdeas();
+          return;
+        }
         console.error('Error deleting idea:', error);
       }
     }
   };
 
+  // Autocomplete from the tag facets as the user types
+  useEffect(() => {
+    const prefix = tagInput.trim();
+    if (!prefix) {
+      setTagSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const response = await axios.get(`${API}/tags`, { params: { prefix, limit: 10 } });
+        if (!cancelled) setTagSuggestions(response.data.map(facet => facet.tag));
+      } catch (error) {
+        console.error('Error fetching tag suggestions:', error);
+      }
+    }, 150);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [tagInput]);
+
   const addTag = () => {
     if (tagInput.trim() && !formData.tags.includes(tagInput.trim())) {
       setFormData(prev => ({
@@ -383,6 +598,7 @@ function App() {
             {categories.map(category => (
               <option key={category.id} value={category.id}>
                 {category.name}
+                {category.idea_count !== undefined && ` (${showArchived ? category.archived_ideas : category.active_ideas})`}
               </option>
             ))}
           </select>
@@ -422,6 +638,7 @@ function App() {
             ))
           )}
         </div>
+        {nextCursor && <div ref={sentinelRef} className="scroll-sentinel" />}
       </main>
 
       {/* Idea Modal */}
@@ -491,7 +708,11 @@ function App() {
                       onKeyPress={(e) => e.key === 'Enter' && (e.preventDefault(), addTag())}
                       placeholder="Добавить тег"
                       className="tag-input"
+                      list="tag-suggestions"
                     />
+                    <datalist id="tag-suggestions">
+                      {tagSuggestions.map(tag => <option key={tag} value={tag} />)}
+                    </datalist>
                     <button type="button" onClick={addTag} className="btn btn-sm">
                       Добавить
                     </button>
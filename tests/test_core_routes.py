@@ -0,0 +1,188 @@
+"""Core idea routes against both storage engines.
+
+Every test runs once on SQLite in memory and once on MongoDB at MONGO_URL
+(default mongodb://localhost:27017), each with a fresh database. The Mongo
+runs are skipped when no server answers there.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import main  # noqa: E402
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+
+
+def mongo_available() -> bool:
+    from pymongo import MongoClient
+
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+        return True
+    except Exception:
+        return False
+    finally:
+        client.close()
+
+
+@pytest.fixture(params=["sqlite", "mongo"])
+def client(request, monkeypatch):
+    # main reads its settings at import; the lifespan picks the engine from these
+    monkeypatch.setattr(main, "STORAGE_ENGINE", request.param)
+    if request.param == "sqlite":
+        monkeypatch.setattr(main, "SQLITE_PATH", ":memory:")
+        with TestClient(main.app) as test_client:
+            yield test_client
+        return
+    if not mongo_available():
+        pytest.skip(f"no MongoDB server at {MONGO_URL}")
+    db_name = f"idea_test_{uuid.uuid4().hex[:12]}"
+    monkeypatch.setattr(main, "mongo_url", MONGO_URL)
+    monkeypatch.setenv("DB_NAME", db_name)
+    try:
+        with TestClient(main.app) as test_client:
+            yield test_client
+    finally:
+        from pymongo import MongoClient
+
+        MongoClient(MONGO_URL).drop_database(db_name)
+
+
+def create_idea(client, title, content="<p>Body</p>", **fields):
+    response = client.post("/api/ideas", json={"title": title, "content": content, **fields})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_create_and_get(client):
+    idea = create_idea(client, "First", "<p>Hello <b>world</b></p>", tags=["a", "b"])
+    assert idea["version"] == 1
+    assert idea["is_archived"] is False
+
+    response = client.get(f"/api/ideas/{idea['id']}")
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"1"'
+    body = response.json()
+    assert body["title"] == "First"
+    assert body["tags"] == ["a", "b"]
+    assert body["content"] == "<p>Hello <b>world</b></p>"
+    summary = client.get("/api/ideas", params={"view": "summary"}).json()
+    assert summary[0]["excerpt"] == "Hello world"
+
+    assert client.get("/api/ideas/missing").status_code == 404
+
+
+def test_list_newest_first_with_cursor(client):
+    ids = [create_idea(client, f"Idea {i}")["id"] for i in range(5)]
+
+    first = client.get("/api/ideas", params={"limit": 2, "view": "summary"})
+    assert first.status_code == 200
+    assert [idea["id"] for idea in first.json()] == ids[:-3:-1]
+    cursor = first.headers["x-next-cursor"]
+
+    second = client.get("/api/ideas", params={"limit": 2, "view": "summary", "cursor": cursor})
+    assert [idea["id"] for idea in second.json()] == ids[-3:-5:-1]
+
+    last = client.get("/api/ideas", params={"limit": 2, "view": "summary", "cursor": second.headers["x-next-cursor"]})
+    assert [idea["id"] for idea in last.json()] == ids[:1]
+    assert "x-next-cursor" not in last.headers
+
+    assert client.get("/api/ideas", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_list_filters(client):
+    category = client.post("/api/categories", json={"name": "Work"}).json()
+    in_category = create_idea(client, "Filed", category_id=category["id"], tags=["x"])
+    create_idea(client, "Loose", tags=["y"])
+
+    by_category = client.get("/api/ideas", params={"category_id": category["id"]}).json()
+    assert [idea["id"] for idea in by_category] == [in_category["id"]]
+    by_tag = client.get("/api/ideas", params={"tag": "x"}).json()
+    assert [idea["id"] for idea in by_tag] == [in_category["id"]]
+
+
+def test_search(client):
+    match = create_idea(client, "Garden robot", "<p>A robot that waters the garden</p>")
+    create_idea(client, "Budget", "<p>Quarterly numbers</p>")
+
+    results = client.get("/api/ideas", params={"search": "robot"}).json()
+    assert [idea["id"] for idea in results] == [match["id"]]
+    assert client.get("/api/ideas", params={"search": "spaceship"}).json() == []
+
+
+def test_update(client):
+    idea = create_idea(client, "Draft", tags=["a"])
+
+    response = client.put(f"/api/ideas/{idea['id']}", json={"title": "Final", "content": "<p>New body</p>"})
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"2"'
+    body = response.json()
+    assert body["title"] == "Final"
+    assert body["tags"] == ["a"]
+    assert body["version"] == 2
+
+    summary = client.get("/api/ideas", params={"view": "summary"}).json()
+    assert summary[0]["excerpt"] == "New body"
+    assert client.put("/api/ideas/missing", json={"title": "x"}).status_code == 404
+
+
+def test_if_match_conflict(client):
+    idea = create_idea(client, "Shared")
+    url = f"/api/ideas/{idea['id']}"
+
+    assert client.put(url, json={"title": "Mine"}, headers={"If-Match": '"1"'}).status_code == 200
+    stale = client.put(url, json={"title": "Theirs"}, headers={"If-Match": '"1"'})
+    assert stale.status_code == 412
+    assert stale.headers["etag"] == '"2"'
+    assert client.get(url).json()["title"] == "Mine"
+
+    assert client.patch(f"{url}/archive", headers={"If-Match": '"1"'}).status_code == 412
+    assert client.delete(url, headers={"If-Match": '"1"'}).status_code == 412
+    assert client.delete(url, headers={"If-Match": '"2"'}).status_code == 200
+
+
+def test_toggle_archive(client):
+    idea = create_idea(client, "Toggle")
+    url = f"/api/ideas/{idea['id']}/archive"
+
+    archived = client.patch(url).json()
+    assert archived["is_archived"] is True
+    assert archived["version"] == 2
+    assert client.patch(url).json()["is_archived"] is False
+
+    assert client.patch(url).json()["is_archived"] is True
+    listed = client.get("/api/ideas", params={"archived": "true"}).json()
+    assert [item["id"] for item in listed] == [idea["id"]]
+    assert client.get("/api/ideas", params={"archived": "false"}).json() == []
+    assert client.patch("/api/ideas/missing/archive").status_code == 404
+
+
+def test_delete(client):
+    idea = create_idea(client, "Doomed")
+    url = f"/api/ideas/{idea['id']}"
+
+    assert client.delete(url).status_code == 200
+    assert client.get(url).status_code == 404
+    assert client.get("/api/ideas").json() == []
+    assert client.delete("/api/ideas/missing").status_code == 404
+
+
+def test_stats(client):
+    ideas = [create_idea(client, f"Idea {i}") for i in range(3)]
+    client.post("/api/categories", json={"name": "Work"})
+    client.patch(f"/api/ideas/{ideas[0]['id']}/archive")
+    client.delete(f"/api/ideas/{ideas[1]['id']}")
+
+    assert client.get("/api/stats").json() == {
+        "total_ideas": 2, "active_ideas": 1, "archived_ideas": 1, "total_categories": 1,
+    }
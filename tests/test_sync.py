@@ -0,0 +1,76 @@
+"""changes_since and its watermarks, on an in-memory Mongo (mongomock-motor)."""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from sync import WatermarkExpired, changes_since, encode_watermark  # noqa: E402
+
+FIELDS = {"categories": ["id", "name"]}
+MAX_AGE = timedelta(days=30)
+
+
+def make_db(*categories):
+    db = mongomock_motor.AsyncMongoMockClient()["sync_test"]
+    for category in categories:
+        asyncio.run(db.categories.insert_one(dict(category)))
+    return db
+
+
+def category(category_id, age, **fields):
+    return {"id": category_id, "name": category_id, "deleted": False,
+            "updated_at": datetime.utcnow() - age, **fields}
+
+
+def sync(db, since=None, limit=100):
+    return asyncio.run(changes_since(db, since, FIELDS, limit, max_age=MAX_AGE))
+
+
+def test_idle_collection_keeps_a_valid_watermark():
+    db = make_db(category("old", timedelta(days=60)))
+
+    first = sync(db)
+    assert [doc["id"] for doc in first["categories"]["changed"]] == ["old"]
+
+    # The collection has not been written for longer than max_age
+    second = sync(db, first["watermark"])
+    assert second["categories"] == {"changed": [], "deleted": []}
+    assert sync(db, second["watermark"])["categories"] == {"changed": [], "deleted": []}
+
+
+def test_changes_after_the_watermark_are_returned():
+    db = make_db(category("old", timedelta(days=60)))
+    watermark = sync(db)["watermark"]
+
+    asyncio.run(db.categories.insert_one(category("new", timedelta(0))))
+    asyncio.run(db.categories.update_one(
+        {"id": "old"}, {"$set": {"deleted": True, "updated_at": datetime.utcnow()}}))
+
+    result = sync(db, watermark)
+    assert [doc["id"] for doc in result["categories"]["changed"]] == ["new"]
+    assert [doc["id"] for doc in result["categories"]["deleted"]] == ["old"]
+
+
+def test_paging_through_old_documents_does_not_expire():
+    db = make_db(*(category(f"c{i}", timedelta(days=40, minutes=i)) for i in range(3)))
+
+    first = sync(db, limit=2)
+    assert first["has_more"] is True
+    second = sync(db, first["watermark"], limit=2)
+    assert second["has_more"] is False
+    ids = [doc["id"] for page in (first, second) for doc in page["categories"]["changed"]]
+    assert ids == ["c2", "c1", "c0"]
+
+
+def test_watermark_older_than_max_age_expires():
+    db = make_db(category("old", timedelta(days=60)))
+    stale = encode_watermark({"categories": (datetime.utcnow() - timedelta(days=31), "")})
+
+    with pytest.raises(WatermarkExpired):
+        sync(db, stale)